@@ -1,6 +1,8 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from firebase_admin import auth as firebase_auth
+
+from app.config import settings
+from app.services.auth_service import get_token_verifier
 
 security = HTTPBearer()
 
@@ -9,10 +11,17 @@ async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
 ) -> str:
     try:
-        decoded_token = firebase_auth.verify_id_token(credentials.credentials)
+        decoded_token = await get_token_verifier().verify(credentials.credentials)
         return str(decoded_token["uid"])
     except Exception:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired authentication token",
         )
+
+
+async def require_admin(user_id: str = Depends(get_current_user)) -> str:
+    admins = {uid.strip() for uid in settings.ADMIN_UIDS.split(",") if uid.strip()}
+    if user_id not in admins:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return user_id
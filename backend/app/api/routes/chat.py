@@ -1,9 +1,12 @@
+import asyncio
 import json
+from contextlib import aclosing
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import StreamingResponse
 
 from app.api.dependencies import get_current_user
+from app.config import settings
 from app.models.schemas import (
     ChatHistoryResponse,
     ChatMessageResponse,
@@ -12,77 +15,140 @@ from app.models.schemas import (
     ChatSessionResponse,
     SourceChunk,
 )
+from app.services.answer_cache import CachedAnswer, get_answer_cache, get_corpus_versions
 from app.services.chat_service import (
     create_chat_session,
-    delete_chat_session,
     get_chat_messages,
+    get_recent_messages,
     list_chat_sessions,
     save_message,
 )
-from app.services.generation_service import generate_sse_stream
-from app.services.retrieval_service import build_context, retrieve_relevant_chunks
+from app.services.deletion_service import get_background_deleter
+from app.services.document_service import has_ready_documents
+from app.services.generation_service import GenerationResult, generate_sse_stream
+from app.services.retrieval_service import (
+    build_context,
+    embed_query,
+    is_keyword_lookup,
+    retrieve_relevant_chunks,
+    search_lexical,
+)
+from app.utils.pagination import InvalidPageTokenError
 
 router = APIRouter()
 
+NO_DOCUMENTS_MESSAGE = (
+    "I don't have any documents to reference. Please upload some documents first."
+)
+NO_MATCH_MESSAGE = (
+    "I couldn't find anything in your documents relevant to that question. "
+    "Try rephrasing it, or ask about a topic your documents cover."
+)
+
+
+def _chat_title(message: str) -> str:
+    return message[:50] + ("..." if len(message) > 50 else "")
+
 
 @router.post("/chat")
 async def chat(request: ChatRequest, user_id: str = Depends(get_current_user)):
+    # A first question doesn't depend on earlier turns, so a cached answer to a
+    # near-identical question over the same documents can be replayed. Keyword
+    # lookups skip it: retrieval answers them without embedding the query, and
+    # embedding it only for the cache would cost more than it saves.
+    # The BM25 hits that tell them apart are handed on to retrieval.
+    lexical = await search_lexical(user_id, request.message, request.document_ids)
+    cache_entry = None
+    if settings.ANSWER_CACHE_ENABLED and not request.chat_id and not is_keyword_lookup(lexical):
+        query_embedding, corpus_version = await asyncio.gather(
+            embed_query(request.message), get_corpus_versions().get(user_id)
+        )
+        cached = get_answer_cache().lookup(
+            user_id, corpus_version, request.document_ids, query_embedding
+        )
+        if cached is not None:
+            return StreamingResponse(
+                _cached_answer_stream(user_id, request.message, cached),
+                media_type="text/event-stream",
+            )
+        cache_entry = (corpus_version, query_embedding)
+
     # Retrieve relevant chunks
     chunks = await retrieve_relevant_chunks(
         user_id=user_id,
         query=request.message,
         document_ids=request.document_ids,
+        lexical=lexical,
     )
 
     if not chunks:
+        # Either there is nothing to search, or nothing cleared RETRIEVAL_MIN_SCORE
+        has_documents = await has_ready_documents(user_id)
         return StreamingResponse(
-            _no_context_stream(),
+            _no_context_stream(NO_MATCH_MESSAGE if has_documents else NO_DOCUMENTS_MESSAGE),
             media_type="text/event-stream",
         )
 
-    # Build context from retrieved chunks
+    # Pack retrieved chunks into the prompt budget; sources follow its [Source N] labels
     context = build_context(chunks)
 
     # Create or use existing chat session
     chat_id = request.chat_id
+    history: list[dict] = []
     if not chat_id:
-        title = request.message[:50] + ("..." if len(request.message) > 50 else "")
-        chat_id = await create_chat_session(user_id, title)
-
-    # Save user message
-    await save_message(user_id, chat_id, "user", request.message)
-
-    # Get chat history for context
-    history = await get_chat_messages(user_id, chat_id)
-    chat_history = [{"role": m["role"], "content": m["content"]} for m in history[:-1]]
+        chat_id = await create_chat_session(user_id, _chat_title(request.message))
+        await save_message(user_id, chat_id, "user", request.message)
+    else:
+        # Only the last few turns go into the prompt, so only those are read.
+        # The read may or may not see the message saved alongside it.
+        history, msg_id = await asyncio.gather(
+            get_recent_messages(user_id, chat_id, settings.CHAT_HISTORY_MESSAGES + 1),
+            save_message(user_id, chat_id, "user", request.message),
+        )
+        history = [m for m in history if m["id"] != msg_id][-settings.CHAT_HISTORY_MESSAGES :]
+    chat_history = [{"role": m["role"], "content": m["content"]} for m in history]
 
     # Prepare source data for SSE
     source_data = [
         {
-            "chunk_id": c["chunk_id"],
-            "document_id": c["document_id"],
-            "document_name": c["document_name"],
-            "content": c["content"][:200],
-            "score": 0.0,
+            "chunk_id": s["chunk_id"],
+            "document_id": s["document_id"],
+            "document_name": s["document_name"],
+            "content": s["content"][:200],
+            "score": round(s["score"], 4),
         }
-        for c in chunks
+        for s in context.sources
     ]
 
+    result = GenerationResult()
+
     async def stream_and_save():
-        full_response = ""
-        async for event in generate_sse_stream(
+        # A client disconnect cancels this generator (and with it the upstream
+        # generation), so nothing after the loop runs for an abandoned answer
+        events = generate_sse_stream(
             query=request.message,
-            context=context,
+            context=context.text,
             sources=source_data,
             chat_history=chat_history,
-        ):
-            if '"type": "done"' in event:
-                data = json.loads(event.replace("data: ", "").strip())
-                full_response = data.get("full_response", "")
-            yield event
+            result=result,
+        )
+        async with aclosing(events):
+            async for event in events:
+                yield event
 
         # Save assistant response after streaming completes
-        await save_message(user_id, chat_id, "assistant", full_response, source_data)
+        await save_message(user_id, chat_id, "assistant", result.text, source_data)
+        if cache_entry is not None and result.finish_reason == "STOP":
+            corpus_version, query_embedding = cache_entry
+            get_answer_cache().store(
+                user_id,
+                corpus_version,
+                request.document_ids,
+                query_embedding,
+                request.message,
+                result.text,
+                source_data,
+            )
 
         # Send chat_id to frontend
         yield f"data: {json.dumps({'type': 'metadata', 'chat_id': chat_id})}\n\n"
@@ -90,17 +156,36 @@ async def chat(request: ChatRequest, user_id: str = Depends(get_current_user)):
     return StreamingResponse(stream_and_save(), media_type="text/event-stream")
 
 
-async def _no_context_stream():
-    msg = "I don't have any documents to reference. Please upload some documents first."
+async def _cached_answer_stream(user_id: str, message: str, cached: CachedAnswer):
+    # Same events as a generated answer, with the whole text in one content event
+    yield f"data: {json.dumps({'type': 'content', 'content': cached.answer})}\n\n"
+    yield f"data: {json.dumps({'type': 'sources', 'sources': cached.sources})}\n\n"
+    yield f"data: {json.dumps({'type': 'done', 'full_response': cached.answer})}\n\n"
+
+    chat_id = await create_chat_session(user_id, _chat_title(message))
+    await save_message(user_id, chat_id, "user", message)
+    await save_message(user_id, chat_id, "assistant", cached.answer, cached.sources)
+    yield f"data: {json.dumps({'type': 'metadata', 'chat_id': chat_id})}\n\n"
+
+
+async def _no_context_stream(msg: str):
     yield f"data: {json.dumps({'type': 'content', 'content': msg})}\n\n"
     yield f"data: {json.dumps({'type': 'sources', 'sources': []})}\n\n"
     yield f"data: {json.dumps({'type': 'done', 'full_response': msg})}\n\n"
 
 
 @router.get("/chat/history", response_model=ChatHistoryResponse)
-async def chat_history(user_id: str = Depends(get_current_user)):
-    sessions = await list_chat_sessions(user_id)
+async def chat_history(
+    limit: int = Query(settings.LIST_PAGE_SIZE, ge=1, le=settings.LIST_MAX_PAGE_SIZE),
+    page_token: str | None = None,
+    user_id: str = Depends(get_current_user),
+):
+    try:
+        page = await list_chat_sessions(user_id, limit, page_token)
+    except InvalidPageTokenError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return ChatHistoryResponse(
+        next_page_token=page.next_page_token,
         sessions=[
             ChatSessionResponse(
                 id=s["id"],
@@ -108,15 +193,25 @@ async def chat_history(user_id: str = Depends(get_current_user)):
                 created_at=s["created_at"],
                 updated_at=s["updated_at"],
             )
-            for s in sessions
-        ]
+            for s in page.items
+        ],
     )
 
 
 @router.get("/chat/{chat_id}/messages", response_model=ChatMessagesResponse)
-async def get_messages(chat_id: str, user_id: str = Depends(get_current_user)):
-    messages = await get_chat_messages(user_id, chat_id)
+async def get_messages(
+    chat_id: str,
+    limit: int = Query(settings.LIST_PAGE_SIZE, ge=1, le=settings.LIST_MAX_PAGE_SIZE),
+    page_token: str | None = None,
+    newest_first: bool = False,
+    user_id: str = Depends(get_current_user),
+):
+    try:
+        page = await get_chat_messages(user_id, chat_id, limit, page_token, newest_first)
+    except InvalidPageTokenError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return ChatMessagesResponse(
+        next_page_token=page.next_page_token,
         messages=[
             ChatMessageResponse(
                 id=m["id"],
@@ -125,13 +220,14 @@ async def get_messages(chat_id: str, user_id: str = Depends(get_current_user)):
                 sources=[SourceChunk(**s) for s in m.get("sources", [])],
                 created_at=m["created_at"],
             )
-            for m in messages
-        ]
+            for m in page.items
+        ],
     )
 
 
 @router.delete("/chat/{chat_id}", status_code=204)
 async def delete_chat(chat_id: str, user_id: str = Depends(get_current_user)):
-    deleted = await delete_chat_session(user_id, chat_id)
+    # Messages are removed in the background
+    deleted = await get_background_deleter().delete_chat(user_id, chat_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Chat session not found")
@@ -1,46 +1,91 @@
-import asyncio
-
-from fastapi import APIRouter, Depends, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 
 from app.api.dependencies import get_current_user
 from app.config import settings
 from app.models.schemas import DocumentListResponse, DocumentResponse
+from app.services.deletion_service import get_background_deleter
 from app.services.document_service import (
-    delete_document,
+    FileTooLargeError,
     get_document,
     list_documents,
     upload_document,
 )
-from app.services.ingestion_service import ingest_document
+from app.services.ingestion_worker import enqueue_ingestion
+from app.services.job_queue import get_job_queue
+from app.utils.multipart_upload import MultipartFileReader
+from app.utils.pagination import InvalidPageTokenError
 
 router = APIRouter()
 
-
-@router.post("/documents/upload", response_model=DocumentResponse, status_code=201)
+# Allowance for the multipart framing (boundaries, part headers) around the file
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+
+_UPLOAD_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                    "required": ["file"],
+                }
+            }
+        },
+    }
+}
+
+
+@router.post(
+    "/documents/upload",
+    response_model=DocumentResponse,
+    status_code=201,
+    openapi_extra=_UPLOAD_BODY,
+)
 async def upload(
-    file: UploadFile,
+    request: Request,
     user_id: str = Depends(get_current_user),
 ):
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="No filename provided")
-
-    file_bytes = await file.read()
-    file_size = len(file_bytes)
-
+    # The body is parsed here rather than declared as an UploadFile parameter:
+    # FastAPI (like ``request.form()``) would receive and spool the whole body
+    # first, so an oversized file could only be refused after arriving.
     max_size = settings.MAX_FILE_SIZE_MB * 1024 * 1024
-    if file_size > max_size:
+    too_large = HTTPException(
+        status_code=413,
+        detail=f"File too large. Maximum size is {settings.MAX_FILE_SIZE_MB}MB",
+    )
+    try:
+        content_length = int(request.headers["content-length"])
+    except KeyError:
+        raise HTTPException(status_code=411, detail="Content-Length required")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Content-Length")
+    if content_length > max_size + MULTIPART_OVERHEAD_BYTES:
+        raise too_large
+
+    # Per user, so one bulk upload doesn't turn everyone else's uploads away
+    pending = await get_job_queue().pending_count(user_id)
+    if pending >= settings.INGESTION_QUEUE_MAX_PENDING_PER_USER:
         raise HTTPException(
-            status_code=413,
-            detail=f"File too large. Maximum size is {settings.MAX_FILE_SIZE_MB}MB",
+            status_code=429,
+            detail="Too many of your documents are being processed. Please try again shortly.",
+            headers={"Retry-After": "30"},
         )
 
+    # The file part is copied to storage as it arrives, and reading stops at the limit
     try:
-        doc = await upload_document(user_id, file.filename, file_bytes, file_size)
+        file = MultipartFileReader(request.headers.get("content-type", ""), request.stream())
+        filename = await file.open()
+        if not filename:
+            raise HTTPException(status_code=400, detail="No file provided")
+        doc = await upload_document(user_id, filename, file, max_size)
+    except FileTooLargeError:
+        raise too_large
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    # Trigger ingestion in background
-    asyncio.create_task(ingest_document(user_id, doc["id"]))
+    # Queue ingestion for the worker pool
+    await enqueue_ingestion(user_id, doc["id"])
 
     return DocumentResponse(
         id=doc["id"],
@@ -54,9 +99,17 @@ async def upload(
 
 
 @router.get("/documents", response_model=DocumentListResponse)
-async def list_docs(user_id: str = Depends(get_current_user)):
-    docs = await list_documents(user_id)
+async def list_docs(
+    limit: int = Query(settings.LIST_PAGE_SIZE, ge=1, le=settings.LIST_MAX_PAGE_SIZE),
+    page_token: str | None = None,
+    user_id: str = Depends(get_current_user),
+):
+    try:
+        page = await list_documents(user_id, limit, page_token)
+    except InvalidPageTokenError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return DocumentListResponse(
+        next_page_token=page.next_page_token,
         documents=[
             DocumentResponse(
                 id=d["id"],
@@ -67,8 +120,8 @@ async def list_docs(user_id: str = Depends(get_current_user)):
                 chunk_count=d.get("chunk_count", 0),
                 created_at=d["created_at"],
             )
-            for d in docs
-        ]
+            for d in page.items
+        ],
     )
 
 
@@ -90,6 +143,7 @@ async def get_doc(doc_id: str, user_id: str = Depends(get_current_user)):
 
 @router.delete("/documents/{doc_id}", status_code=204)
 async def delete_doc(doc_id: str, user_id: str = Depends(get_current_user)):
-    deleted = await delete_document(user_id, doc_id)
+    # Chunks and the stored file are removed in the background
+    deleted = await get_background_deleter().delete_document(user_id, doc_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Document not found")
@@ -1,4 +1,10 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+
+from app.api.dependencies import require_admin
+from app.config import settings
+from app.core import metrics
+from app.services.warmup import get_warmup
 
 router = APIRouter()
 
@@ -6,3 +12,20 @@ router = APIRouter()
 @router.get("/api/health")
 async def health_check():
     return {"status": "healthy"}
+
+
+@router.get("/api/ready")
+async def readiness_check():
+    """503 until the startup warmup has finished; ``/api/health`` only says the process is up."""
+    if not settings.WARMUP_ENABLED:
+        return {"status": "ready"}
+    warmup = get_warmup()
+    if not warmup.finished:
+        return JSONResponse({"status": "starting"}, status_code=503)
+    return {"status": "warm" if warmup.ok else "degraded", "steps": warmup.results}
+
+
+@router.get("/api/metrics", dependencies=[Depends(require_admin)])
+async def get_metrics():
+    """Internal counters and cache stats; the service is public, so admins only."""
+    return metrics.snapshot()
@@ -9,20 +9,145 @@ class Settings(BaseSettings):
     FIRESTORE_DATABASE: str = "rag-chatbot-prod"
     ENVIRONMENT: str = "development"
     ALLOWED_ORIGINS: str = "http://localhost:5173"
+    # Comma-separated Firebase uids allowed to read /api/metrics
+    ADMIN_UIDS: str = ""
 
     # RAG settings
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
     TOP_K_RESULTS: int = 5
+    # Estimated-token budget for the retrieved context in each prompt
+    CONTEXT_MAX_TOKENS: int = 4000
     GENERATION_TEMPERATURE: float = 0.3
+    # Earlier messages sent with each question (3 exchanges)
+    CHAT_HISTORY_MESSAGES: int = 6
     MAX_OUTPUT_TOKENS: int = 2048
     MAX_FILE_SIZE_MB: int = 20
+    # Must be a multiple of 256 KiB (GCS resumable upload chunk granularity)
+    UPLOAD_CHUNK_SIZE_BYTES: int = 1024 * 1024
+
+    # Parser settings
+    # Worker processes per document being parsed
+    PARSER_WORKERS: int = 2
+    PARSER_PAGES_PER_TASK: int = 16
+    PARSER_MAX_PAGES: int = 2000
+    PARSER_TIMEOUT_SECONDS: float = 300.0
 
     # Model settings
     GENERATION_MODEL: str = "gemini-2.0-flash"
     EMBEDDING_MODEL: str = "text-embedding-004"
     EMBEDDING_DIMENSION: int = 768
 
+    # Embedding request limits (text-embedding-004: 250 inputs / 20k tokens)
+    EMBEDDING_MAX_BATCH_SIZE: int = 250
+    EMBEDDING_MAX_BATCH_TOKENS: int = 20000
+    EMBEDDING_MAX_CONCURRENCY: int = 4
+    EMBEDDING_MAX_RETRIES: int = 5
+    EMBEDDING_RETRY_BASE_DELAY: float = 1.0
+    EMBEDDING_RETRY_MAX_DELAY: float = 30.0
+    # Concurrent query embeddings are coalesced into one call per window
+    QUERY_EMBEDDING_BATCH_MAX_SIZE: int = 32
+    QUERY_EMBEDDING_BATCH_MAX_WAIT_MS: float = 5.0
+
+    # Vector store settings ("firestore" or "memory")
+    VECTOR_STORE_BACKEND: str = "firestore"
+    IVF_N_LISTS: int = 0  # 0 = sqrt(chunk count)
+    IVF_N_PROBE: int = 8
+    # Memory indexes follow the corpus version; this only forces a full rebuild
+    VECTOR_INDEX_MAX_AGE_SECONDS: int = 3600
+    # float32, float16 or int8: how the memory backend's index holds vectors.
+    # Quantized indexes shrink the scanned vectors; with a rescore multiplier
+    # above 1 they also keep float32 copies for re-ranking the top candidates
+    # (memory-mapped from the snapshot where there is one, otherwise in RAM).
+    # Firestore always stores the full vector.
+    EMBEDDING_STORAGE_FORMAT: str = "float32"
+    VECTOR_RESCORE_MULTIPLIER: int = 4
+    # Memory backend: per-user index snapshots, memory-mapped from local disk
+    # and shared between instances through GCS. On Cloud Run /tmp is in-memory,
+    # so snapshot files count against the instance's memory limit (see README).
+    INDEX_SNAPSHOTS_ENABLED: bool = True
+    INDEX_SNAPSHOT_DIR: str = "/tmp/index-snapshots"
+
+    # Hybrid retrieval: BM25 and vector results fused with reciprocal-rank fusion
+    HYBRID_SEARCH_ENABLED: bool = True
+    HYBRID_RRF_K: int = 60
+    # Loaded BM25 indexes check for corpus changes (in the background) this often
+    LEXICAL_INDEX_MAX_AGE_SECONDS: int = 300
+    LEXICAL_INDEX_MAX_USERS: int = 1000
+    # Short keyword queries with a strong BM25 match skip the embedding call
+    LEXICAL_FAST_PATH_ENABLED: bool = True
+    LEXICAL_FAST_PATH_MAX_TERMS: int = 3
+    LEXICAL_FAST_PATH_MIN_CONFIDENCE: float = 0.6
+
+    # Results under this cosine similarity are dropped unless BM25 matched them
+    RETRIEVAL_MIN_SCORE: float = 0.3
+    # Maximal marginal relevance reranking over TOP_K_RESULTS * multiplier candidates
+    MMR_ENABLED: bool = True
+    MMR_LAMBDA: float = 0.5
+    MMR_FETCH_MULTIPLIER: int = 3
+
+    # Semantic answer cache for first questions, invalidated by the user's corpus version
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = 0.95
+    ANSWER_CACHE_MAX_ENTRIES: int = 5000
+    ANSWER_CACHE_TTL_SECONDS: int = 86400
+    CORPUS_VERSION_CACHE_TTL_SECONDS: float = 5.0
+
+    # Cache settings
+    QUERY_EMBEDDING_CACHE_SIZE: int = 2048
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS: int = 3600
+    CHUNK_EMBEDDING_CACHE_ENABLED: bool = True
+    # Stored chunk embeddings are removed by a Firestore TTL policy on ``expires_at``
+    CHUNK_EMBEDDING_CACHE_TTL_SECONDS: int = 30 * 86400
+
+    # List endpoints (documents, chat sessions, messages)
+    LIST_PAGE_SIZE: int = 50
+    LIST_MAX_PAGE_SIZE: int = 200
+
+    # Verified ID tokens are cached until they expire; revocation is re-checked
+    # at this interval (0 disables the check)
+    AUTH_TOKEN_CACHE_SIZE: int = 10000
+    AUTH_REVOCATION_CHECK_SECONDS: int = 300
+
+    # Startup: clients and models are created and pinged in the background;
+    # /api/ready reports when that is done
+    WARMUP_ENABLED: bool = True
+    WARMUP_TIMEOUT_SECONDS: float = 60.0
+
+    # Concurrency settings
+    BLOCKING_IO_WORKERS: int = 16
+
+    # Firestore bulk writes
+    FIRESTORE_WRITE_CONCURRENCY: int = 4
+    FIRESTORE_WRITE_MAX_RETRIES: int = 5
+    FIRESTORE_WRITE_RETRY_BASE_DELAY: float = 0.5
+    FIRESTORE_WRITE_RETRY_MAX_DELAY: float = 30.0
+
+    # Background deletes
+    DELETION_CONCURRENCY: int = 4
+    DELETION_STATUS_CACHE_TTL_SECONDS: float = 5.0
+
+    # Ingestion job queue ("firestore" or "sqlite")
+    JOB_QUEUE_BACKEND: str = "firestore"
+    JOB_QUEUE_SQLITE_PATH: str = "ingestion_jobs.db"
+    # Run the worker pool inside the API process. For local development only:
+    # ingestion then shares the event loop with chat requests. Deployments run
+    # ``python -m app.services.ingestion_worker`` as a separate service.
+    INGESTION_WORKERS_ENABLED: bool = False
+    INGESTION_CONCURRENCY: int = 2
+    INGESTION_MAX_ATTEMPTS: int = 4
+    INGESTION_RETRY_BASE_DELAY: float = 5.0
+    INGESTION_RETRY_MAX_DELAY: float = 300.0
+    INGESTION_POLL_INTERVAL_SECONDS: float = 5.0
+    INGESTION_LEASE_SECONDS: int = 600
+    # Uploads are refused while a user has this many documents queued or ingesting
+    INGESTION_QUEUE_MAX_PENDING_PER_USER: int = 20
+    # Chunks flow parse -> embed -> write in batches through bounded queues
+    INGESTION_PIPELINE_BATCH_SIZE: int = 64
+    INGESTION_PIPELINE_QUEUE_SIZE: int = 4
+    INGESTION_EMBED_WORKERS: int = 2
+    INGESTION_WRITE_WORKERS: int = 2
+
     model_config = {"env_file": ".env", "extra": "ignore"}
 
 
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import time
+from collections.abc import Mapping, Sequence
+from types import TracebackType
+from typing import Any
+
+from google.api_core import exceptions as gexc
+
+from app.config import settings
+from app.core import metrics
+from app.core.firestore_client import get_firestore_client
+from app.utils.retry import TRANSIENT_ERRORS, retry_async
+
+logger = logging.getLogger(__name__)
+
+# Firestore commits take at most 500 writes and 10 MiB; leave headroom for framing
+FIRESTORE_BATCH_LIMIT = 500
+FIRESTORE_MAX_REQUEST_BYTES = 9 * 1024 * 1024
+# Non-transactional commits can still abort on contention with a transaction
+RETRYABLE_WRITE_ERRORS: tuple[type[Exception], ...] = (*TRANSIENT_ERRORS, gexc.Aborted)
+
+# (kind, document reference, data); kind is "set", "update" or "delete"
+_Op = tuple[str, Any, Mapping[str, Any] | None]
+
+
+def _value_size(value: Any) -> int:
+    if isinstance(value, str):
+        return len(value.encode("utf-8")) + 1
+    if isinstance(value, bytes):
+        return len(value) + 1
+    if isinstance(value, Mapping):
+        return 32 + sum(len(k) + 1 + _value_size(v) for k, v in value.items())
+    if isinstance(value, Sequence):
+        return 16 + sum(_value_size(v) for v in value)
+    return 8
+
+
+def estimate_write_size(path: str, data: Mapping[str, Any] | None) -> int:
+    """Approximate encoded size of one write, following Firestore's storage size rules."""
+    return len(path.encode("utf-8")) + 32 + (_value_size(data) if data is not None else 0)
+
+
+class BulkWriter:
+    """Buffers writes and commits them as batches, several in flight at once.
+
+    A batch is sent once adding the next write would exceed ``max_ops``
+    writes or ``max_bytes`` estimated bytes. At most ``max_in_flight``
+    commits run concurrently; writes wait for a free slot, which bounds
+    buffered memory. Each commit is atomic, so a failed batch is retried
+    whole with backoff while the batches that succeeded stay committed. The
+    first error that outlasts its retries is raised from ``flush`` (and from
+    any later ``set``/``update``/``delete``).
+
+    Use as ``async with BulkWriter() as writer:``; leaving the block flushes.
+    """
+
+    def __init__(
+        self,
+        db=None,
+        max_ops: int = FIRESTORE_BATCH_LIMIT,
+        max_bytes: int = FIRESTORE_MAX_REQUEST_BYTES,
+        max_in_flight: int | None = None,
+        max_retries: int | None = None,
+    ):
+        self._db = db if db is not None else get_firestore_client()
+        self.max_ops = max_ops
+        self.max_bytes = max_bytes
+        self.max_retries = (
+            max_retries if max_retries is not None else settings.FIRESTORE_WRITE_MAX_RETRIES
+        )
+        self._slots = asyncio.Semaphore(max_in_flight or settings.FIRESTORE_WRITE_CONCURRENCY)
+        self._ops: list[_Op] = []
+        self._bytes = 0
+        self._tasks: set[asyncio.Task] = set()
+        self._error: Exception | None = None
+        self.committed = 0
+
+    async def set(self, ref, data: Mapping[str, Any]) -> None:
+        await self._add("set", ref, data)
+
+    async def update(self, ref, data: Mapping[str, Any]) -> None:
+        """Change only the given fields; the batch fails if the document is gone."""
+        await self._add("update", ref, data)
+
+    async def delete(self, ref) -> None:
+        await self._add("delete", ref, None)
+
+    async def flush(self) -> None:
+        """Send anything buffered and wait for every commit to finish."""
+        if self._ops:
+            await self._dispatch()
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
+        self._raise_if_failed()
+
+    async def __aenter__(self) -> "BulkWriter":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        if exc_type is None:
+            await self.flush()
+        elif self._tasks:
+            # Don't mask the original error; just let commits already sent settle
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _add(self, kind: str, ref, data: Mapping[str, Any] | None) -> None:
+        self._raise_if_failed()
+        size = estimate_write_size(ref.path, data)
+        if self._ops and (len(self._ops) >= self.max_ops or self._bytes + size > self.max_bytes):
+            await self._dispatch()
+        self._ops.append((kind, ref, data))
+        self._bytes += size
+
+    async def _dispatch(self) -> None:
+        ops, self._ops, self._bytes = self._ops, [], 0
+        await self._slots.acquire()
+        task = asyncio.create_task(self._commit(ops))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _commit(self, ops: list[_Op]) -> None:
+        async def commit() -> None:
+            # Rebuilt on every attempt so a retry never reuses a half-sent batch
+            batch = self._db.batch()
+            for kind, ref, data in ops:
+                if kind == "delete":
+                    batch.delete(ref)
+                elif kind == "update":
+                    batch.update(ref, data)
+                else:
+                    batch.set(ref, data)
+            await batch.commit()
+
+        start = time.perf_counter()
+        try:
+            await retry_async(
+                commit,
+                max_attempts=self.max_retries + 1,
+                base_delay=settings.FIRESTORE_WRITE_RETRY_BASE_DELAY,
+                max_delay=settings.FIRESTORE_WRITE_RETRY_MAX_DELAY,
+                retry_on=RETRYABLE_WRITE_ERRORS,
+            )
+        except Exception as e:
+            logger.error(f"Bulk write of {len(ops)} operations failed: {e}")
+            metrics.increment("firestore.bulk_write_failures")
+            if self._error is None:
+                self._error = e
+        else:
+            self.committed += len(ops)
+            metrics.observe("firestore.bulk_commit_seconds", time.perf_counter() - start)
+            metrics.observe("firestore.bulk_commit_size", len(ops))
+        finally:
+            self._slots.release()
+
+    def _raise_if_failed(self) -> None:
+        if self._error is not None:
+            raise self._error
@@ -2,13 +2,13 @@ from google.cloud import firestore  # type: ignore[attr-defined]
 
 from app.config import settings
 
-_db: firestore.Client | None = None
+_db: firestore.AsyncClient | None = None
 
 
-def get_firestore_client() -> firestore.Client:
+def get_firestore_client() -> firestore.AsyncClient:
     global _db
     if _db is None:
-        _db = firestore.Client(
+        _db = firestore.AsyncClient(
             project=settings.GCP_PROJECT_ID,
             database=settings.FIRESTORE_DATABASE,
         )
@@ -0,0 +1,62 @@
+import threading
+from collections import deque
+from collections.abc import Callable
+
+import numpy as np
+
+HISTOGRAM_WINDOW = 2048
+
+_lock = threading.Lock()
+_counters: dict[str, float] = {}
+_histograms: dict[str, deque[float]] = {}
+_collectors: dict[str, Callable[[], dict]] = {}
+
+
+def increment(name: str, value: float = 1) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def observe(name: str, value: float) -> None:
+    """Record a sample; summaries cover the most recent ``HISTOGRAM_WINDOW`` samples."""
+    with _lock:
+        samples = _histograms.get(name)
+        if samples is None:
+            samples = _histograms[name] = deque(maxlen=HISTOGRAM_WINDOW)
+        samples.append(value)
+
+
+def register_collector(name: str, collector: Callable[[], dict]) -> None:
+    """Include ``collector()`` under ``name`` in every snapshot."""
+    with _lock:
+        _collectors[name] = collector
+
+
+def _summarize(samples: list[float]) -> dict:
+    arr = np.asarray(samples)
+    return {
+        "count": len(arr),
+        "mean": float(arr.mean()),
+        "p50": float(np.percentile(arr, 50)),
+        "p90": float(np.percentile(arr, 90)),
+        "p99": float(np.percentile(arr, 99)),
+        "max": float(arr.max()),
+    }
+
+
+def snapshot() -> dict:
+    with _lock:
+        counters = dict(_counters)
+        histograms = {name: list(samples) for name, samples in _histograms.items() if samples}
+        collectors = dict(_collectors)
+    return {
+        "counters": counters,
+        "histograms": {name: _summarize(samples) for name, samples in histograms.items()},
+        **{name: collector() for name, collector in collectors.items()},
+    }
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
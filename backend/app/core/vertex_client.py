@@ -1,32 +1,44 @@
-import vertexai
-from vertexai.generative_models import GenerativeModel
-from vertexai.language_models import TextEmbeddingModel
+from typing import TYPE_CHECKING
 
 from app.config import settings
 
+# The Vertex SDK takes seconds to import, so it is loaded on first use (or by
+# the startup warmup) rather than when the routers are imported
+if TYPE_CHECKING:
+    from vertexai.generative_models import GenerativeModel
+    from vertexai.language_models import TextEmbeddingModel
+
 _initialized = False
-_generation_model: GenerativeModel | None = None
-_embedding_model: TextEmbeddingModel | None = None
+_generation_models: dict[str | None, "GenerativeModel"] = {}
+_embedding_model: "TextEmbeddingModel | None" = None
 
 
 def _init_vertex() -> None:
     global _initialized
     if not _initialized:
+        import vertexai
+
         vertexai.init(project=settings.GCP_PROJECT_ID, location=settings.GCP_REGION)
         _initialized = True
 
 
-def get_generation_model() -> GenerativeModel:
-    global _generation_model
+def get_generation_model(system_instruction: str | None = None) -> "GenerativeModel":
+    """Shared model instance per system instruction; built once, reused by every request."""
     _init_vertex()
-    if _generation_model is None:
-        _generation_model = GenerativeModel(settings.GENERATION_MODEL)
-    return _generation_model
+    model = _generation_models.get(system_instruction)
+    if model is None:
+        from vertexai.generative_models import GenerativeModel
 
+        model = GenerativeModel(settings.GENERATION_MODEL, system_instruction=system_instruction)
+        _generation_models[system_instruction] = model
+    return model
 
-def get_embedding_model() -> TextEmbeddingModel:
+
+def get_embedding_model() -> "TextEmbeddingModel":
     global _embedding_model
     _init_vertex()
     if _embedding_model is None:
+        from vertexai.language_models import TextEmbeddingModel
+
         _embedding_model = TextEmbeddingModel.from_pretrained(settings.EMBEDDING_MODEL)
     return _embedding_model
@@ -1,14 +1,45 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.routes import chat, documents, health
 from app.config import settings
+from app.core.executor import shutdown_executor
 from app.core.firebase_client import initialize_firebase
+from app.services.deletion_service import get_background_deleter
+from app.services.ingestion_worker import get_worker_pool
+from app.services.warmup import get_warmup
+from app.utils.document_parsers import shutdown_parsers
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    initialize_firebase()
+    warmup = get_warmup() if settings.WARMUP_ENABLED else None
+    if warmup is not None:
+        await warmup.start()
+    pool = get_worker_pool() if settings.INGESTION_WORKERS_ENABLED else None
+    if pool is not None:
+        await pool.start()
+    deleter = get_background_deleter()
+    await deleter.start()
+    yield
+    if warmup is not None:
+        await warmup.stop()
+    if pool is not None:
+        await pool.stop()
+    await deleter.stop()
+    shutdown_parsers()
+    shutdown_executor()
+
 
 app = FastAPI(
     title="RAG API",
     description="Retrieval-Augmented Generation API powered by Vertex AI Gemini",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -19,8 +50,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-initialize_firebase()
-
 app.include_router(health.router, tags=["Health"])
 app.include_router(documents.router, prefix="/api", tags=["Documents"])
 app.include_router(chat.router, prefix="/api", tags=["Chat"])
@@ -2,6 +2,13 @@ from datetime import datetime
 
 from pydantic import BaseModel, Field
 
+# Document status values. A deleting document is hidden everywhere while its
+# chunks and file are purged in the background.
+PROCESSING = "processing"
+READY = "ready"
+ERROR = "error"
+DELETING = "deleting"
+
 
 # Document schemas
 class DocumentResponse(BaseModel):
@@ -16,6 +23,7 @@ class DocumentResponse(BaseModel):
 
 class DocumentListResponse(BaseModel):
     documents: list[DocumentResponse]
+    next_page_token: str | None = None
 
 
 # Chat schemas
@@ -50,7 +58,9 @@ class ChatSessionResponse(BaseModel):
 
 class ChatHistoryResponse(BaseModel):
     sessions: list[ChatSessionResponse]
+    next_page_token: str | None = None
 
 
 class ChatMessagesResponse(BaseModel):
     messages: list[ChatMessageResponse]
+    next_page_token: str | None = None
@@ -0,0 +1,195 @@
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+import numpy as np
+from google.cloud.firestore_v1.transforms import Increment
+
+from app.config import settings
+from app.core import metrics
+from app.core.firestore_client import get_firestore_client
+from app.utils.cache import CacheStats, LRUCache
+
+# (user id, corpus version, sorted document ids or None for the whole corpus)
+BucketKey = tuple[str, int, tuple[str, ...] | None]
+
+
+@dataclass
+class CachedAnswer:
+    query: str
+    answer: str
+    sources: list[dict]
+    created_at: float
+
+
+@dataclass
+class _Bucket:
+    ids: list[int] = field(default_factory=list)
+    matrix: np.ndarray | None = None  # rows follow ``ids``; rebuilt when None
+
+
+class SemanticAnswerCache:
+    """Generated answers looked up by query embedding.
+
+    A lookup hits when a cached query from the same user, over the same
+    ``document_ids`` and at the same corpus version, has cosine similarity
+    of at least ``threshold`` to the new query. Ingests and deletes bump the
+    corpus version, so stale answers are never matched again and age out.
+    At most ``max_entries`` answers are kept, least recently used out first.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        threshold: float,
+        ttl_seconds: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self._clock = clock
+        self._entries: OrderedDict[int, tuple[BucketKey, np.ndarray, CachedAnswer]] = OrderedDict()
+        self._buckets: dict[BucketKey, _Bucket] = {}
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(
+        self,
+        user_id: str,
+        version: int,
+        document_ids: list[str] | None,
+        embedding: list[float],
+    ) -> CachedAnswer | None:
+        bucket = self._buckets.get(_bucket_key(user_id, version, document_ids))
+        if bucket is None or not bucket.ids:
+            self.stats.misses += 1
+            return None
+        if bucket.matrix is None:
+            bucket.matrix = np.stack([self._entries[i][1] for i in bucket.ids])
+        similarities = bucket.matrix @ _unit(embedding)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            self.stats.misses += 1
+            return None
+
+        entry_id = bucket.ids[best]
+        answer = self._entries[entry_id][2]
+        if self.ttl_seconds and self._clock() - answer.created_at >= self.ttl_seconds:
+            self._remove(entry_id)
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+        self._entries.move_to_end(entry_id)
+        self.stats.hits += 1
+        return answer
+
+    def store(
+        self,
+        user_id: str,
+        version: int,
+        document_ids: list[str] | None,
+        embedding: list[float],
+        query: str,
+        answer: str,
+        sources: list[dict],
+    ) -> None:
+        key = _bucket_key(user_id, version, document_ids)
+        entry_id = self._next_id
+        self._next_id += 1
+        cached = CachedAnswer(query, answer, sources, self._clock())
+        self._entries[entry_id] = (key, _unit(embedding), cached)
+        bucket = self._buckets.setdefault(key, _Bucket())
+        bucket.ids.append(entry_id)
+        bucket.matrix = None
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.stats.evictions += 1
+
+    def invalidate_user(self, user_id: str) -> None:
+        """Drop a user's answers now rather than waiting for them to age out."""
+        for key in [key for key in self._buckets if key[0] == user_id]:
+            for entry_id in self._buckets.pop(key).ids:
+                self._entries.pop(entry_id, None)
+
+    def _remove(self, entry_id: int) -> None:
+        key, _, _ = self._entries.pop(entry_id)
+        bucket = self._buckets[key]
+        bucket.ids.remove(entry_id)
+        bucket.matrix = None
+        if not bucket.ids:
+            del self._buckets[key]
+
+
+def _bucket_key(user_id: str, version: int, document_ids: list[str] | None) -> BucketKey:
+    return (user_id, version, tuple(sorted(set(document_ids))) if document_ids else None)
+
+
+def _unit(embedding: list[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+class CorpusVersions:
+    """Per-user counter on ``users/{uid}``, bumped whenever the user's corpus changes.
+
+    Reads are cached for ``ttl_seconds``, which bounds how long another
+    instance can serve answers from before a change; bumps made here are
+    seen immediately.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self._versions = LRUCache(max_size=10000, ttl_seconds=ttl_seconds)
+
+    async def get(self, user_id: str) -> int:
+        version = await self._versions.get(user_id)
+        if version is None:
+            snapshot = await _get_user_ref(user_id).get()
+            version = (snapshot.to_dict() or {}).get("corpus_version", 0)
+            await self._versions.set(user_id, version)
+        return int(version)
+
+    async def bump(self, user_id: str) -> None:
+        await _get_user_ref(user_id).set({"corpus_version": Increment(1)}, merge=True)
+        await self._versions.delete(user_id)
+
+
+def _get_user_ref(user_id: str):
+    return get_firestore_client().collection("users").document(user_id)
+
+
+_answer_cache: SemanticAnswerCache | None = None
+_corpus_versions: CorpusVersions | None = None
+
+
+def get_answer_cache() -> SemanticAnswerCache:
+    global _answer_cache
+    if _answer_cache is None:
+        _answer_cache = SemanticAnswerCache(
+            max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+            threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+            ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+        )
+        cache = _answer_cache
+        metrics.register_collector(
+            "answer_cache", lambda: {**cache.stats.as_dict(), "size": len(cache)}
+        )
+    return _answer_cache
+
+
+def get_corpus_versions() -> CorpusVersions:
+    global _corpus_versions
+    if _corpus_versions is None:
+        _corpus_versions = CorpusVersions(ttl_seconds=settings.CORPUS_VERSION_CACHE_TTL_SECONDS)
+    return _corpus_versions
+
+
+async def bump_corpus_version(user_id: str) -> None:
+    """Invalidate the user's cached answers after an ingest or delete."""
+    await get_corpus_versions().bump(user_id)
+    get_answer_cache().invalidate_user(user_id)
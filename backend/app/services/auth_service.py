@@ -1,8 +1,20 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+
 from firebase_admin import auth as firebase_auth
 
+from app.config import settings
+from app.core import metrics
+from app.core.executor import run_blocking
+from app.utils.cache import CacheStats
+
 
-def verify_token(token: str) -> dict:  # type: ignore[type-arg]
-    return firebase_auth.verify_id_token(token)  # type: ignore[no-any-return]
+def verify_token(token: str, check_revoked: bool = False) -> dict:  # type: ignore[type-arg]
+    return firebase_auth.verify_id_token(token, check_revoked=check_revoked)  # type: ignore[no-any-return]
 
 
 def get_user_info(uid: str) -> dict:
@@ -12,3 +24,114 @@ def get_user_info(uid: str) -> dict:
         "email": user.email,
         "display_name": user.display_name,
     }
+
+
+@dataclass
+class _VerifiedToken:
+    claims: dict
+    expires_at: float  # the token's ``exp``, wall-clock seconds
+    checked_at: float  # last full verification, monotonic
+
+
+class TokenVerifier:
+    """Verifies Firebase ID tokens, caching the result until each token expires.
+
+    Entries are keyed by a SHA-256 of the token, so raw tokens are never
+    held. Verification, including any fetch of Google's public keys, runs on
+    the blocking-IO pool. When ``revocation_check_seconds`` is set, tokens
+    are also checked for revocation, and cached ones again at that interval.
+    Concurrent requests with the same unseen token share one verification.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        revocation_check_seconds: float = 0,
+        clock: Callable[[], float] = time.monotonic,
+        wall_clock: Callable[[], float] = time.time,
+    ):
+        self.max_size = max_size
+        self.revocation_check_seconds = revocation_check_seconds
+        self.stats = CacheStats()
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._entries: OrderedDict[str, _VerifiedToken] = OrderedDict()
+        self._pending: dict[str, asyncio.Task[dict]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def verify(self, token: str) -> dict:
+        """Decoded claims for ``token``; raises if it is invalid, expired or revoked."""
+        key = hashlib.sha256(token.encode()).hexdigest()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if self._wall_clock() >= entry.expires_at:
+                del self._entries[key]
+                self.stats.expirations += 1
+            elif not self._revocation_check_due(entry):
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                return entry.claims
+        self.stats.misses += 1
+
+        # The verification is a task of its own, so a caller that is cancelled
+        # (client disconnect) doesn't leave the others waiting on it forever
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = asyncio.create_task(self._verify_and_store(key, token))
+            self._pending[key] = pending
+            pending.add_done_callback(lambda task: self._finished(key, task))
+        return await asyncio.shield(pending)
+
+    async def _verify_and_store(self, key: str, token: str) -> dict:
+        try:
+            claims = await self._verify_remote(token, bool(self.revocation_check_seconds))
+        except Exception:
+            self._entries.pop(key, None)
+            raise
+        self._store(key, claims)
+        return claims
+
+    def _finished(self, key: str, task: asyncio.Task[dict]) -> None:
+        if self._pending.get(key) is task:
+            del self._pending[key]
+        if not task.cancelled():
+            # Retrieved here so a failure nobody awaited isn't reported as unhandled
+            task.exception()
+
+    async def _verify_remote(self, token: str, check_revoked: bool) -> dict:
+        start = time.perf_counter()
+        try:
+            return await run_blocking(verify_token, token, check_revoked)
+        finally:
+            metrics.observe("auth.verify_seconds", time.perf_counter() - start)
+
+    def _revocation_check_due(self, entry: _VerifiedToken) -> bool:
+        return bool(self.revocation_check_seconds) and (
+            self._clock() - entry.checked_at >= self.revocation_check_seconds
+        )
+
+    def _store(self, key: str, claims: dict) -> None:
+        self._entries[key] = _VerifiedToken(claims, float(claims["exp"]), self._clock())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+
+_token_verifier: TokenVerifier | None = None
+
+
+def get_token_verifier() -> TokenVerifier:
+    global _token_verifier
+    if _token_verifier is None:
+        _token_verifier = TokenVerifier(
+            max_size=settings.AUTH_TOKEN_CACHE_SIZE,
+            revocation_check_seconds=settings.AUTH_REVOCATION_CHECK_SECONDS,
+        )
+        verifier = _token_verifier
+        metrics.register_collector(
+            "auth_token_cache", lambda: {**verifier.stats.as_dict(), "size": len(verifier)}
+        )
+    return _token_verifier
@@ -1,7 +1,11 @@
 import uuid
 from datetime import datetime, timezone
 
+from app.core.bulk_writer import BulkWriter
 from app.core.firestore_client import get_firestore_client
+from app.utils.pagination import Page, fetch_page
+
+DELETING = "deleting"
 
 
 def _get_chats_ref(user_id: str):
@@ -9,11 +13,15 @@ def _get_chats_ref(user_id: str):
     return db.collection("users").document(user_id).collection("chats")
 
 
+def _get_messages_ref(user_id: str, chat_id: str):
+    return _get_chats_ref(user_id).document(chat_id).collection("messages")
+
+
 async def create_chat_session(user_id: str, title: str) -> str:
     chat_id = str(uuid.uuid4())
     chats_ref = _get_chats_ref(user_id)
     now = datetime.now(timezone.utc)
-    chats_ref.document(chat_id).set(
+    await chats_ref.document(chat_id).set(
         {
             "title": title,
             "created_at": now,
@@ -23,10 +31,17 @@ async def create_chat_session(user_id: str, title: str) -> str:
     return chat_id
 
 
-async def list_chat_sessions(user_id: str) -> list[dict]:
-    chats_ref = _get_chats_ref(user_id)
-    docs = chats_ref.order_by("updated_at", direction="DESCENDING").stream()
-    return [{"id": doc.id, **doc.to_dict()} for doc in docs]
+async def list_chat_sessions(user_id: str, limit: int, page_token: str | None = None) -> Page:
+    """A page of chat sessions, most recently active first."""
+    query = _get_chats_ref(user_id).select(["title", "created_at", "updated_at", "status"])
+    return await fetch_page(
+        query,
+        "updated_at",
+        "DESCENDING",
+        limit,
+        page_token,
+        include=lambda data: data.get("status") != DELETING,
+    )
 
 
 async def save_message(
@@ -52,40 +67,66 @@ async def save_message(
         "sources": sources or [],
         "created_at": datetime.now(timezone.utc),
     }
-    messages_ref.document(msg_id).set(msg_data)
+    await messages_ref.document(msg_id).set(msg_data)
 
     # Update chat session timestamp
     chats_ref = _get_chats_ref(user_id)
-    chats_ref.document(chat_id).update({"updated_at": datetime.now(timezone.utc)})
+    await chats_ref.document(chat_id).update({"updated_at": datetime.now(timezone.utc)})
 
     return msg_id
 
 
-async def get_chat_messages(user_id: str, chat_id: str) -> list[dict]:
-    db = get_firestore_client()
-    messages_ref = (
-        db.collection("users")
-        .document(user_id)
-        .collection("chats")
-        .document(chat_id)
-        .collection("messages")
-    )
-    docs = messages_ref.order_by("created_at").stream()
-    return [{"id": doc.id, **doc.to_dict()} for doc in docs]
+async def get_recent_messages(user_id: str, chat_id: str, limit: int) -> list[dict]:
+    """The last ``limit`` messages of a chat, oldest first.
 
+    Reads at most ``limit`` documents however long the conversation is.
+    """
+    messages_ref = _get_messages_ref(user_id, chat_id)
+    query = messages_ref.order_by("created_at", direction="DESCENDING").limit(limit)
+    messages = [{"id": doc.id, **doc.to_dict()} async for doc in query.stream()]
+    messages.reverse()
+    return messages
 
-async def delete_chat_session(user_id: str, chat_id: str) -> bool:
-    chats_ref = _get_chats_ref(user_id)
-    chat_doc = chats_ref.document(chat_id).get()
 
+async def get_chat_messages(
+    user_id: str,
+    chat_id: str,
+    limit: int,
+    page_token: str | None = None,
+    newest_first: bool = False,
+) -> Page:
+    """A page of a chat's messages, oldest first within the page.
+
+    With ``newest_first`` the first page holds the latest messages and each
+    following page the ones before it, so a client can show the end of a
+    long conversation and load earlier messages on demand.
+    """
+    query = _get_messages_ref(user_id, chat_id).select(["role", "content", "sources", "created_at"])
+    if not newest_first:
+        return await fetch_page(query, "created_at", "ASCENDING", limit, page_token)
+    page = await fetch_page(query, "created_at", "DESCENDING", limit, page_token)
+    page.items.reverse()
+    return page
+
+
+async def mark_chat_deleting(user_id: str, chat_id: str) -> bool:
+    """Flag a chat session for background deletion; ``False`` if it doesn't exist."""
+    chat_ref = _get_chats_ref(user_id).document(chat_id)
+    chat_doc = await chat_ref.get()
     if not chat_doc.exists:
         return False
+    if chat_doc.to_dict().get("status") != DELETING:
+        await chat_ref.update({"status": DELETING})
+    return True
 
-    # Delete all messages
-    messages_ref = chats_ref.document(chat_id).collection("messages")
-    for msg in messages_ref.stream():
-        msg.reference.delete()
 
-    # Delete chat session
-    chats_ref.document(chat_id).delete()
-    return True
+async def purge_chat_session(user_id: str, chat_id: str) -> None:
+    """Delete a chat session and all its messages. Safe to repeat after a crash."""
+    chat_ref = _get_chats_ref(user_id).document(chat_id)
+    messages = chat_ref.collection("messages").select([]).stream()
+    async with BulkWriter() as writer:
+        async for msg in messages:
+            await writer.delete(msg.reference)
+
+    # Delete chat session last, so a crash above leaves it flagged for resume
+    await chat_ref.delete()
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import time
+
+from google.cloud.firestore_v1 import FieldFilter
+
+from app.config import settings
+from app.core import metrics
+from app.core.firestore_client import get_firestore_client
+from app.models.schemas import DELETING
+from app.services.chat_service import mark_chat_deleting, purge_chat_session
+from app.services.document_service import (
+    list_deleting_document_ids,
+    mark_document_deleting,
+    purge_document,
+)
+from app.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT = "document"
+CHAT = "chat"
+# Parent collection group scanned on startup for each kind of delete
+_COLLECTION_GROUPS = {DOCUMENT: "documents", CHAT: "chats"}
+
+
+class BackgroundDeleter:
+    """Finishes document and chat session deletes off the request path.
+
+    ``delete_document``/``delete_chat`` flag the parent ``deleting`` and
+    return; the chunks or messages are then removed in bulk here and the
+    parent last. Anything still flagged at startup was interrupted by a
+    crash or redeploy and is resumed by ``start``.
+    """
+
+    def __init__(self, concurrency: int = 4, status_ttl_seconds: float = 5.0):
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks: set[asyncio.Task] = set()
+        self._active: set[tuple[str, str, str]] = set()
+        self._documents: dict[str, set[str]] = {}
+        # Other instances' deletes, seen through the documents' status
+        self._deleting_by_user = LRUCache(max_size=10000, ttl_seconds=status_ttl_seconds)
+
+    async def delete_document(self, user_id: str, doc_id: str) -> bool:
+        if not await mark_document_deleting(user_id, doc_id):
+            return False
+        self._schedule(DOCUMENT, user_id, doc_id)
+        return True
+
+    async def delete_chat(self, user_id: str, chat_id: str) -> bool:
+        if not await mark_chat_deleting(user_id, chat_id):
+            return False
+        self._schedule(CHAT, user_id, chat_id)
+        return True
+
+    async def excluded_documents(self, user_id: str) -> set[str]:
+        """Ids of the user's documents that retrieval must skip."""
+        deleting = await self._deleting_by_user.get(user_id)
+        if deleting is None:
+            deleting = await list_deleting_document_ids(user_id)
+            await self._deleting_by_user.set(user_id, deleting)
+        return deleting | self._documents.get(user_id, set())
+
+    async def start(self) -> None:
+        task = asyncio.create_task(self._resume())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        # The resume scan spawns purges of its own, so wait until nothing is left.
+        # Unfinished deletes stay flagged and are resumed on the next start.
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self._tasks and (remaining := deadline - loop.time()) > 0:
+            await asyncio.wait(set(self._tasks), timeout=remaining)
+
+    async def _resume(self) -> None:
+        db = get_firestore_client()
+        resumed = 0
+        try:
+            for kind, group in _COLLECTION_GROUPS.items():
+                query = db.collection_group(group).where(
+                    filter=FieldFilter("status", "==", DELETING)
+                )
+                async for snapshot in query.select([]).stream():
+                    user_id = snapshot.reference.parent.parent.id
+                    self._schedule(kind, user_id, snapshot.id)
+                    resumed += 1
+        except Exception as e:
+            logger.error(f"Scanning for interrupted deletes failed: {e}")
+        if resumed:
+            logger.info(f"Resumed {resumed} interrupted deletes")
+
+    def _schedule(self, kind: str, user_id: str, item_id: str) -> None:
+        key = (kind, user_id, item_id)
+        if key in self._active:
+            return
+        self._active.add(key)
+        if kind == DOCUMENT:
+            self._documents.setdefault(user_id, set()).add(item_id)
+        task = asyncio.create_task(self._purge(kind, user_id, item_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _purge(self, kind: str, user_id: str, item_id: str) -> None:
+        try:
+            async with self._semaphore:
+                start = time.perf_counter()
+                if kind == DOCUMENT:
+                    await purge_document(user_id, item_id)
+                else:
+                    await purge_chat_session(user_id, item_id)
+            elapsed = time.perf_counter() - start
+            metrics.increment(f"deletion.{kind}s_purged")
+            metrics.observe("deletion.purge_seconds", elapsed)
+            logger.info(f"Deleted {kind} {item_id} for user {user_id} in {elapsed:.2f}s")
+        except Exception as e:
+            # Still flagged as deleting, so the next startup picks it up again
+            metrics.increment("deletion.failures")
+            logger.error(f"Deleting {kind} {item_id} failed: {e}")
+        finally:
+            self._active.discard((kind, user_id, item_id))
+            if kind == DOCUMENT:
+                in_progress = self._documents.get(user_id, set())
+                in_progress.discard(item_id)
+                if not in_progress:
+                    self._documents.pop(user_id, None)
+                # A failed purge must be picked up from the status on the next lookup
+                await self._deleting_by_user.delete(user_id)
+
+
+_background_deleter: BackgroundDeleter | None = None
+
+
+def get_background_deleter() -> BackgroundDeleter:
+    global _background_deleter
+    if _background_deleter is None:
+        _background_deleter = BackgroundDeleter(
+            concurrency=settings.DELETION_CONCURRENCY,
+            status_ttl_seconds=settings.DELETION_STATUS_CACHE_TTL_SECONDS,
+        )
+    return _background_deleter
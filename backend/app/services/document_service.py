@@ -1,12 +1,32 @@
+import asyncio
+import hashlib
+import logging
 import os
 import uuid
 from datetime import datetime, timezone
+from typing import Protocol
 
 from google.cloud.firestore_v1 import FieldFilter
 
+from app.config import settings
+from app.core.executor import run_blocking
 from app.core.firestore_client import get_firestore_client
 from app.core.gcs_client import get_bucket
+from app.models.schemas import DELETING, PROCESSING, READY
+from app.services.answer_cache import bump_corpus_version
+from app.services.embedding_store import get_embedding_store
+from app.services.job_queue import RUNNING, get_job_queue
+from app.services.lexical_index import get_lexical_index
+from app.services.vector_store import get_vector_store
 from app.utils.document_parsers import ALLOWED_EXTENSIONS, EXTENSION_TO_CONTENT_TYPE
+from app.utils.pagination import Page, fetch_page
+
+logger = logging.getLogger(__name__)
+
+# How often a purge checks whether a running ingestion of the document has stopped
+INGESTION_STOP_POLL_SECONDS = 1.0
+# Fields shown in document listings
+LIST_FIELDS = ["filename", "file_type", "file_size", "status", "chunk_count", "created_at"]
 
 
 def _get_docs_ref(user_id: str):
@@ -14,7 +34,36 @@ def _get_docs_ref(user_id: str):
     return db.collection("users").document(user_id).collection("documents")
 
 
-async def upload_document(user_id: str, filename: str, file_bytes: bytes, file_size: int) -> dict:
+class FileTooLargeError(Exception):
+    pass
+
+
+class AsyncReader(Protocol):
+    async def read(self, size: int = -1) -> bytes: ...
+
+
+def _abort_upload(writer) -> None:
+    """Cancel a blob writer's resumable session, dropping the parts it already sent."""
+    # BlobWriter has no abort; a DELETE on the session URI is how GCS cancels one.
+    # Until its first chunk is sent the writer has no session and nothing to drop.
+    session = getattr(writer, "_upload_and_transport", None)
+    if session is None:
+        return
+    upload, transport = session
+    try:
+        transport.delete(upload.resumable_url)
+    except Exception as e:
+        # The uncommitted session expires on its own; nothing is left readable meanwhile
+        logger.warning(f"Could not cancel resumable upload: {e}")
+
+
+async def upload_document(user_id: str, filename: str, stream: AsyncReader, max_size: int) -> dict:
+    """Stream an upload into a GCS resumable upload, one chunk in memory at a time.
+
+    Raises ``FileTooLargeError`` as soon as more than ``max_size`` bytes have
+    been read. On that or any other failure the resumable session is
+    cancelled, so the parts already sent are discarded.
+    """
     ext = os.path.splitext(filename)[1].lower()
     if ext not in ALLOWED_EXTENSIONS:
         raise ValueError(f"Unsupported file type: {ext}. Allowed: {ALLOWED_EXTENSIONS}")
@@ -26,7 +75,21 @@ async def upload_document(user_id: str, filename: str, file_bytes: bytes, file_s
     # Upload to Cloud Storage
     bucket = get_bucket()
     blob = bucket.blob(gcs_path)
-    blob.upload_from_string(file_bytes, content_type=content_type)
+    chunk_size = settings.UPLOAD_CHUNK_SIZE_BYTES
+    writer = await run_blocking(blob.open, "wb", chunk_size=chunk_size, content_type=content_type)
+    hasher = hashlib.sha256()
+    file_size = 0
+    try:
+        while chunk := await stream.read(chunk_size):
+            file_size += len(chunk)
+            if file_size > max_size:
+                raise FileTooLargeError(f"File exceeds {max_size} bytes")
+            hasher.update(chunk)
+            await run_blocking(writer.write, chunk)
+    except BaseException:
+        await run_blocking(_abort_upload, writer)
+        raise
+    await run_blocking(writer.close)
 
     # Create Firestore document record
     doc_data = {
@@ -34,65 +97,125 @@ async def upload_document(user_id: str, filename: str, file_bytes: bytes, file_s
         "file_type": ext,
         "content_type": content_type,
         "file_size": file_size,
+        "content_hash": hasher.hexdigest(),
         "gcs_uri": f"gs://{bucket.name}/{gcs_path}",
         "gcs_path": gcs_path,
-        "status": "processing",
+        "status": PROCESSING,
         "chunk_count": 0,
         "created_at": datetime.now(timezone.utc),
     }
 
     docs_ref = _get_docs_ref(user_id)
-    docs_ref.document(doc_id).set(doc_data)
+    await docs_ref.document(doc_id).set(doc_data)
 
     return {"id": doc_id, **doc_data}
 
 
-async def list_documents(user_id: str) -> list[dict]:
-    docs_ref = _get_docs_ref(user_id)
-    docs = docs_ref.order_by("created_at", direction="DESCENDING").stream()
-    return [{"id": doc.id, **doc.to_dict()} for doc in docs]
+async def list_documents(user_id: str, limit: int, page_token: str | None = None) -> Page:
+    """A page of the user's documents, newest first, with only the listed fields."""
+    query = _get_docs_ref(user_id).select(LIST_FIELDS)
+    # Documents being deleted are gone as far as the user is concerned
+    return await fetch_page(
+        query,
+        "created_at",
+        "DESCENDING",
+        limit,
+        page_token,
+        include=lambda data: data["status"] != DELETING,
+    )
 
 
 async def get_document(user_id: str, doc_id: str) -> dict | None:
     docs_ref = _get_docs_ref(user_id)
-    doc = docs_ref.document(doc_id).get()
-    if not doc.exists:
+    doc = await docs_ref.document(doc_id).get()
+    if not doc.exists or doc.get("status") == DELETING:
         return None
     return {"id": doc.id, **doc.to_dict()}
 
 
-async def delete_document(user_id: str, doc_id: str) -> bool:
-    db = get_firestore_client()
-    docs_ref = _get_docs_ref(user_id)
-    doc = docs_ref.document(doc_id).get()
+async def has_ready_documents(user_id: str) -> bool:
+    query = _get_docs_ref(user_id).where(filter=FieldFilter("status", "==", READY))
+    return bool(await query.select([]).limit(1).get())
+
 
+async def mark_document_deleting(user_id: str, doc_id: str) -> bool:
+    """Flag a document for background deletion; ``False`` if it doesn't exist."""
+    doc_ref = _get_docs_ref(user_id).document(doc_id)
+    doc = await doc_ref.get()
     if not doc.exists:
         return False
+    if doc.get("status") != DELETING:
+        await doc_ref.update({"status": DELETING, "deleting_at": datetime.now(timezone.utc)})
+        # Retrieval skips the document from now on, so cached answers citing it are stale
+        await bump_corpus_version(user_id)
+    return True
 
-    doc_data = doc.to_dict()
+
+async def list_deleting_document_ids(user_id: str) -> set[str]:
+    query = _get_docs_ref(user_id).where(filter=FieldFilter("status", "==", DELETING))
+    return {doc.id async for doc in query.select([]).stream()}
+
+
+async def purge_document(user_id: str, doc_id: str) -> None:
+    """Delete a document's file, chunks and record. Safe to repeat after a crash."""
+    docs_ref = _get_docs_ref(user_id)
+    doc = await docs_ref.document(doc_id).get()
+    if not doc.exists:
+        return
 
     # Delete from Cloud Storage
     bucket = get_bucket()
-    blob = bucket.blob(doc_data["gcs_path"])
-    if blob.exists():
-        blob.delete()
+    blob = bucket.blob(doc.get("gcs_path"))
+    if await run_blocking(blob.exists):
+        await run_blocking(blob.delete)
 
     # Delete associated chunks
-    chunks_ref = db.collection("users").document(user_id).collection("chunks")
-    chunk_docs = chunks_ref.where(filter=FieldFilter("document_id", "==", doc_id)).stream()
-    for chunk_doc in chunk_docs:
-        chunk_doc.reference.delete()
+    await _delete_chunks(user_id, doc_id)
+    # A running ingestion stops at its next write batch once it sees the flag;
+    # whatever it wrote in the meantime goes in a second pass
+    if await _wait_for_ingestion_to_stop(doc_id):
+        await _delete_chunks(user_id, doc_id)
+    await get_job_queue().delete(doc_id)
+    await get_embedding_store().delete_document(user_id, doc_id)
+
+    # Delete document record last, so a crash above leaves it flagged for resume
+    await docs_ref.document(doc_id).delete()
 
-    # Delete document record
-    docs_ref.document(doc_id).delete()
-    return True
+
+async def _delete_chunks(user_id: str, doc_id: str) -> None:
+    await get_vector_store().delete_document(user_id, doc_id)
+    await get_lexical_index().delete_document(user_id, doc_id)
+
+
+async def _wait_for_ingestion_to_stop(doc_id: str) -> bool:
+    """Wait while the document's ingestion job runs; ``True`` if it was running.
+
+    A worker that died mid-job holds its lease until it expires, so give up
+    after ``INGESTION_LEASE_SECONDS``; the purge then fails and is retried.
+    """
+    queue = get_job_queue()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.INGESTION_LEASE_SECONDS
+    was_running = False
+    while (job := await queue.get(doc_id)) is not None and job.status == RUNNING:
+        if loop.time() > deadline:
+            raise TimeoutError(f"Ingestion of document {doc_id} is still running")
+        was_running = True
+        await asyncio.sleep(INGESTION_STOP_POLL_SECONDS)
+    return was_running
 
 
 async def update_document_status(
     user_id: str, doc_id: str, status: str, chunk_count: int = 0
-) -> None:
-    docs_ref = _get_docs_ref(user_id)
+) -> bool:
+    """Set the status of a document; ``False`` if it was deleted in the meantime."""
+    doc_ref = _get_docs_ref(user_id).document(doc_id)
+    doc = await doc_ref.get()
+    # Overwriting the flag would hide the delete from the resume scan
+    if not doc.exists or doc.get("status") == DELETING:
+        return False
     update_data: dict[str, str | int] = {"status": status}
     if chunk_count > 0:
         update_data["chunk_count"] = chunk_count
-    docs_ref.document(doc_id).update(update_data)
+    await doc_ref.update(update_data)
+    return True
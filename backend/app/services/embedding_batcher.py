@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import time
+
+from app.config import settings
+from app.core import metrics
+from app.core.executor import run_blocking
+from app.core.vertex_client import get_embedding_model
+from app.utils.retry import retry_async
+from app.utils.text_processing import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def pack_batches(texts: list[str], max_items: int, max_tokens: int) -> list[list[int]]:
+    """Group text indices into consecutive batches within the per-request limits.
+
+    A single text over ``max_tokens`` still gets a batch of its own; the API
+    truncates oversized inputs rather than rejecting them.
+    """
+    batches: list[list[int]] = []
+    current: list[int] = []
+    current_tokens = 0
+    for idx, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= max_items or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(idx)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def embed_batch(texts: list[str], task_type: str) -> list[list[float]]:
+    """One ``get_embeddings`` call, retried on throttling and transient errors."""
+    from vertexai.language_models import TextEmbeddingInput
+
+    model = await run_blocking(get_embedding_model)
+    inputs = [TextEmbeddingInput(text=text, task_type=task_type) for text in texts]
+
+    async def call():
+        return await run_blocking(model.get_embeddings, inputs)
+
+    embeddings = await retry_async(
+        call,
+        max_attempts=settings.EMBEDDING_MAX_RETRIES + 1,
+        base_delay=settings.EMBEDDING_RETRY_BASE_DELAY,
+        max_delay=settings.EMBEDDING_RETRY_MAX_DELAY,
+    )
+    return [list(e.values) for e in embeddings]
+
+
+async def embed_texts(texts: list[str], task_type: str) -> list[list[float]]:
+    """Embed ``texts`` in token-packed batches, several in flight, preserving order."""
+    batches = pack_batches(
+        texts, settings.EMBEDDING_MAX_BATCH_SIZE, settings.EMBEDDING_MAX_BATCH_TOKENS
+    )
+    results: list[list[float]] = [[] for _ in texts]
+    semaphore = asyncio.Semaphore(settings.EMBEDDING_MAX_CONCURRENCY)
+
+    async def run(batch_no: int, indices: list[int]) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            embeddings = await embed_batch([texts[i] for i in indices], task_type)
+            latency = time.perf_counter() - start
+        for idx, embedding in zip(indices, embeddings):
+            results[idx] = embedding
+        metrics.observe("embedding.batch_latency_seconds", latency)
+        metrics.observe("embedding.batch_size", len(indices))
+        logger.debug(
+            f"Embedding batch {batch_no + 1}/{len(batches)}: "
+            f"{len(indices)} texts in {latency * 1000:.0f}ms"
+        )
+
+    try:
+        async with asyncio.TaskGroup() as group:
+            for batch_no, indices in enumerate(batches):
+                group.create_task(run(batch_no, indices))
+    except ExceptionGroup as e:
+        # Remaining batches were cancelled; surface the error that caused it
+        raise e.exceptions[0] from None
+    return results
+
+
+class EmbeddingCoalescer:
+    """Merges concurrent single-text embedding requests into batched calls.
+
+    Requests queue until ``max_batch_size`` are waiting or ``max_wait_seconds``
+    has passed since the first one, then go out as one ``embed_batch`` call.
+    Identical texts in a batch are embedded once.
+    """
+
+    def __init__(self, task_type: str, max_batch_size: int, max_wait_seconds: float):
+        self.task_type = task_type
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self._pending: list[tuple[str, asyncio.Future[list[float]]]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def embed(self, text: str) -> list[float]:
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[list[float]] = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_seconds, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if pending:
+            task = asyncio.get_running_loop().create_task(self._send(pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, pending: list[tuple[str, asyncio.Future[list[float]]]]) -> None:
+        texts = list(dict.fromkeys(text for text, _ in pending))
+        metrics.observe("query_embedding.coalesced_requests", len(pending))
+        metrics.observe("query_embedding.batch_size", len(texts))
+        try:
+            embeddings = dict(zip(texts, await embed_batch(texts, self.task_type)))
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for text, future in pending:
+            # Waiters whose request was cancelled (client gone) are skipped
+            if not future.done():
+                future.set_result(embeddings[text])
@@ -0,0 +1,92 @@
+import hashlib
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+
+from google.cloud.firestore_v1 import FieldFilter
+from google.cloud.firestore_v1.vector import Vector
+
+from app.config import settings
+from app.core.bulk_writer import BulkWriter
+from app.core.firestore_client import get_firestore_client
+
+GET_ALL_BATCH_SIZE = 300
+
+
+def embedding_key(text: str, task_type: str) -> str:
+    """Content address of an embedding: the text, model and task type hashed together."""
+    raw = f"{settings.EMBEDDING_MODEL}\x00{task_type}\x00{text}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore(ABC):
+    """Persistent map from ``embedding_key`` to a previously computed embedding."""
+
+    @abstractmethod
+    async def get_many(self, user_id: str, keys: list[str]) -> dict[str, list[float]]:
+        """Return the stored embeddings for whichever ``keys`` are present."""
+
+    @abstractmethod
+    async def put_many(self, user_id: str, doc_id: str, embeddings: dict[str, list[float]]) -> None:
+        """Store embeddings computed while ingesting document ``doc_id``."""
+
+    @abstractmethod
+    async def delete_document(self, user_id: str, doc_id: str) -> None:
+        """Drop the embeddings stored for ``doc_id``, e.g. when it is deleted."""
+
+
+class FirestoreEmbeddingStore(EmbeddingStore):
+    """Embeddings kept in ``users/{uid}/embedding_cache/{key}``.
+
+    Scoped per user so one account's uploads can never be probed by another's.
+    Entries carry an ``expires_at`` for the Firestore TTL policy and the id
+    of the document that stored them, so deleting a document drops them too.
+    Another document that reused an entry then only pays for a re-embed.
+    """
+
+    def _get_cache_ref(self, user_id: str):
+        db = get_firestore_client()
+        return db.collection("users").document(user_id).collection("embedding_cache")
+
+    async def get_many(self, user_id: str, keys: list[str]) -> dict[str, list[float]]:
+        db = get_firestore_client()
+        cache_ref = self._get_cache_ref(user_id)
+        found: dict[str, list[float]] = {}
+        for i in range(0, len(keys), GET_ALL_BATCH_SIZE):
+            refs = [cache_ref.document(key) for key in keys[i : i + GET_ALL_BATCH_SIZE]]
+            async for snapshot in db.get_all(refs, field_paths=["embedding"]):
+                if snapshot.exists:
+                    found[snapshot.id] = list(snapshot.get("embedding"))
+        return found
+
+    async def put_many(self, user_id: str, doc_id: str, embeddings: dict[str, list[float]]) -> None:
+        cache_ref = self._get_cache_ref(user_id)
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(seconds=settings.CHUNK_EMBEDDING_CACHE_TTL_SECONDS)
+        async with BulkWriter() as writer:
+            for key, values in embeddings.items():
+                await writer.set(
+                    cache_ref.document(key),
+                    {
+                        "embedding": Vector(values),
+                        "model": settings.EMBEDDING_MODEL,
+                        "document_id": doc_id,
+                        "created_at": now,
+                        "expires_at": expires_at,
+                    },
+                )
+
+    async def delete_document(self, user_id: str, doc_id: str) -> None:
+        query = self._get_cache_ref(user_id).where(filter=FieldFilter("document_id", "==", doc_id))
+        async with BulkWriter() as writer:
+            async for snapshot in query.select([]).stream():
+                await writer.delete(snapshot.reference)
+
+
+_embedding_store: EmbeddingStore | None = None
+
+
+def get_embedding_store() -> EmbeddingStore:
+    global _embedding_store
+    if _embedding_store is None:
+        _embedding_store = FirestoreEmbeddingStore()
+    return _embedding_store
@@ -1,9 +1,13 @@
+import asyncio
 import json
+import time
 from collections.abc import AsyncGenerator
-
-from vertexai.generative_models import GenerationConfig
+from contextlib import aclosing
+from dataclasses import dataclass
 
 from app.config import settings
+from app.core import metrics
+from app.core.vertex_client import get_generation_model
 
 SYSTEM_PROMPT = """You are a helpful assistant that answers questions based on the provided context.
 Use ONLY the information from the context below to answer the question.
@@ -19,49 +23,116 @@ Question: {query}
 Answer based on the context above, citing sources with [Source N]:"""
 
 
+@dataclass
+class GenerationResult:
+    """Outcome of one streamed generation, filled in while the stream runs.
+
+    ``finish_reason`` is the model's reason for ending (``"STOP"``,
+    ``"MAX_TOKENS"``, ``"SAFETY"``...). ``cancelled`` means the consumer
+    stopped early, e.g. the client disconnected, and ``text`` is partial.
+    """
+
+    text: str = ""
+    finish_reason: str | None = None
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    cancelled: bool = False
+
+
+def _response_text(response) -> str:
+    try:
+        text: str = response.text
+    except ValueError:
+        # Chunks with no text part, e.g. the last one carrying only the finish reason
+        return ""
+    return text
+
+
+def _record_metadata(response, result: GenerationResult) -> None:
+    candidates = getattr(response, "candidates", None)
+    if candidates and candidates[0].finish_reason:
+        result.finish_reason = candidates[0].finish_reason.name
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        result.prompt_tokens = usage.prompt_token_count or result.prompt_tokens
+        result.output_tokens = usage.candidates_token_count or result.output_tokens
+
+
 async def generate_stream(
-    query: str, context: str, chat_history: list[dict] | None = None
+    query: str,
+    context: str,
+    chat_history: list[dict] | None = None,
+    result: GenerationResult | None = None,
 ) -> AsyncGenerator[str, None]:
-    from vertexai.generative_models import GenerativeModel
+    """Stream answer text from Gemini over the SDK's async API.
 
-    model = GenerativeModel(
-        settings.GENERATION_MODEL,
-        system_instruction=SYSTEM_PROMPT,
-    )
+    Progress is recorded on ``result``. If the consumer stops early (closes
+    or cancels this generator) the upstream stream is closed, which cancels
+    the gRPC call instead of letting the model generate for nobody.
+    """
+    if result is None:
+        result = GenerationResult()
+    model = get_generation_model(SYSTEM_PROMPT)
 
     prompt = RAG_PROMPT_TEMPLATE.format(context=context, query=query)
 
     # Build conversation history
     contents = []
     if chat_history:
-        for msg in chat_history[-6:]:  # Last 3 exchanges for context
+        for msg in chat_history[-settings.CHAT_HISTORY_MESSAGES :]:
             contents.append({"role": msg["role"], "parts": [{"text": msg["content"]}]})
     contents.append({"role": "user", "parts": [{"text": prompt}]})
 
+    from vertexai.generative_models import GenerationConfig
+
     generation_config = GenerationConfig(
         temperature=settings.GENERATION_TEMPERATURE,
         max_output_tokens=settings.MAX_OUTPUT_TOKENS,
     )
 
-    response = model.generate_content(
+    start = time.perf_counter()
+    responses = await model.generate_content_async(
         contents,
         generation_config=generation_config,
         stream=True,
     )
-
-    for chunk in response:
-        if chunk.text:
-            yield chunk.text
+    try:
+        async for response in responses:
+            _record_metadata(response, result)
+            text = _response_text(response)
+            if text:
+                if not result.text:
+                    metrics.observe(
+                        "generation.time_to_first_token_seconds", time.perf_counter() - start
+                    )
+                result.text += text
+                yield text
+    except (asyncio.CancelledError, GeneratorExit):
+        result.cancelled = True
+        metrics.increment("generation.cancelled")
+        raise
+    finally:
+        aclose = getattr(responses, "aclose", None)
+        if aclose is not None:
+            await aclose()
+        metrics.observe("generation.seconds", time.perf_counter() - start)
+        if result.output_tokens:
+            metrics.observe("generation.output_tokens", result.output_tokens)
 
 
 async def generate_sse_stream(
-    query: str, context: str, sources: list[dict], chat_history: list[dict] | None = None
+    query: str,
+    context: str,
+    sources: list[dict],
+    chat_history: list[dict] | None = None,
+    result: GenerationResult | None = None,
 ) -> AsyncGenerator[str, None]:
-    full_response = ""
-    async for text_chunk in generate_stream(query, context, chat_history):
-        full_response += text_chunk
-        yield f"data: {json.dumps({'type': 'content', 'content': text_chunk})}\n\n"
+    if result is None:
+        result = GenerationResult()
+    async with aclosing(generate_stream(query, context, chat_history, result)) as stream:
+        async for text_chunk in stream:
+            yield f"data: {json.dumps({'type': 'content', 'content': text_chunk})}\n\n"
 
     # Send sources at the end
     yield f"data: {json.dumps({'type': 'sources', 'sources': sources})}\n\n"
-    yield f"data: {json.dumps({'type': 'done', 'full_response': full_response})}\n\n"
+    yield f"data: {json.dumps({'type': 'done', 'full_response': result.text})}\n\n"
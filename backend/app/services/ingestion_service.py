@@ -1,102 +1,281 @@
+import asyncio
+import contextlib
 import logging
-import uuid
-from datetime import datetime, timezone
-
-from google.cloud.firestore_v1.vector import Vector
-from vertexai.language_models import TextEmbeddingInput
+import os
+import tempfile
+import time
+from dataclasses import dataclass
 
+from app.config import settings
+from app.core import metrics
+from app.core.executor import run_blocking
 from app.core.firestore_client import get_firestore_client
 from app.core.gcs_client import get_bucket
-from app.core.vertex_client import get_embedding_model
-from app.services.document_service import update_document_status
-from app.utils.document_parsers import parse_document
-from app.utils.text_processing import chunk_text
+from app.models.schemas import DELETING, ERROR, READY
+from app.services.answer_cache import bump_corpus_version
+from app.services.document_service import get_document, update_document_status
+from app.services.embedding_batcher import embed_texts
+from app.services.embedding_store import embedding_key, get_embedding_store
+from app.services.lexical_index import get_lexical_index
+from app.services.vector_store import get_vector_store
+from app.utils.document_parsers import DocumentParseError, stream_document
+from app.utils.text_processing import IncrementalChunker
 
 logger = logging.getLogger(__name__)
 
-EMBEDDING_BATCH_SIZE = 20
+DOCUMENT_TASK_TYPE = "RETRIEVAL_DOCUMENT"
+
+# Running mean of Vertex latency per embedded chunk, used to estimate time saved
+_seconds_per_embedding: float | None = None
+
+
+class DocumentDeletedError(Exception):
+    """The document was deleted while it was being ingested."""
+
+
+async def _ensure_not_deleted(user_id: str, doc_id: str) -> None:
+    if await get_document(user_id, doc_id) is None:
+        raise DocumentDeletedError(doc_id)
+
+
+async def _embed_chunks(
+    user_id: str, doc_id: str, texts: list[str]
+) -> tuple[list[list[float]], int]:
+    """Embed chunks, reusing stored embeddings of identical text (same model).
+
+    Returns the embeddings and how many of them came from the store.
+    """
+    global _seconds_per_embedding
+    if not settings.CHUNK_EMBEDDING_CACHE_ENABLED:
+        return await embed_texts(texts, DOCUMENT_TASK_TYPE), 0
+
+    keys = [embedding_key(text, DOCUMENT_TASK_TYPE) for text in texts]
+    unique_keys = list(dict.fromkeys(keys))
+    store = get_embedding_store()
+    embeddings = await store.get_many(user_id, unique_keys)
+
+    text_by_key = dict(zip(keys, texts))
+    missing = [key for key in unique_keys if key not in embeddings]
+    if missing:
+        start = time.perf_counter()
+        computed = await embed_texts([text_by_key[key] for key in missing], DOCUMENT_TASK_TYPE)
+        per_embedding = (time.perf_counter() - start) / len(missing)
+        _seconds_per_embedding = (
+            per_embedding
+            if _seconds_per_embedding is None
+            else 0.8 * _seconds_per_embedding + 0.2 * per_embedding
+        )
+        new_embeddings = dict(zip(missing, computed))
+        await store.put_many(user_id, doc_id, new_embeddings)
+        embeddings.update(new_embeddings)
+
+    hits = len(keys) - len(missing)
+    metrics.increment("chunk_embedding_cache.hits", hits)
+    metrics.increment("chunk_embedding_cache.misses", len(missing))
+    return [embeddings[key] for key in keys], hits
+
+
+@dataclass
+class _StageStats:
+    """Items handled by one pipeline stage and the time it spent working on them."""
+
+    name: str
+    items: int = 0
+    busy_seconds: float = 0.0
+
+    def record(self, items: int, seconds: float) -> None:
+        self.items += items
+        self.busy_seconds += seconds
+
+    @property
+    def rate(self) -> float:
+        return self.items / self.busy_seconds if self.busy_seconds else 0.0
+
+    def __str__(self) -> str:
+        return f"{self.name} {self.items} in {self.busy_seconds:.2f}s ({self.rate:.0f}/s)"
+
 
+async def _run_pipeline(user_id: str, doc_id: str, doc_data: dict, source: str) -> int:
+    """Parse, chunk, embed and write a document as a pipeline; return the chunk count.
 
-def _batch_embed(texts: list[str]) -> list[list[float]]:
-    model = get_embedding_model()
-    all_embeddings = []
+    Chunks are handed on in batches of ``INGESTION_PIPELINE_BATCH_SIZE``
+    through queues holding at most ``INGESTION_PIPELINE_QUEUE_SIZE`` batches,
+    so the first chunks are searchable while later pages are still being
+    parsed, and memory stays bounded whatever the document size.
+    """
+    batch_size = settings.INGESTION_PIPELINE_BATCH_SIZE
+    embed_workers = settings.INGESTION_EMBED_WORKERS
+    write_workers = settings.INGESTION_WRITE_WORKERS
+    chunk_queue: asyncio.Queue[list[tuple[int, str]] | None] = asyncio.Queue(
+        settings.INGESTION_PIPELINE_QUEUE_SIZE
+    )
+    write_queue: asyncio.Queue[list[dict] | None] = asyncio.Queue(
+        settings.INGESTION_PIPELINE_QUEUE_SIZE
+    )
+    parse_stats = _StageStats("parsed")
+    embed_stats = _StageStats("embedded")
+    write_stats = _StageStats("written")
+    start = time.perf_counter()
+    chunk_count = 0
+    cache_hits = 0
+    first_chunk_seconds: float | None = None
 
-    for i in range(0, len(texts), EMBEDDING_BATCH_SIZE):
-        batch = texts[i : i + EMBEDDING_BATCH_SIZE]
-        inputs = [TextEmbeddingInput(text=text, task_type="RETRIEVAL_DOCUMENT") for text in batch]
-        embeddings = model.get_embeddings(inputs)
-        all_embeddings.extend([e.values for e in embeddings])
+    async def parse() -> None:
+        nonlocal chunk_count
+        chunker = IncrementalChunker()
+        batch: list[tuple[int, str]] = []
 
-    return all_embeddings
+        async def emit(chunks: list[str], final: bool = False) -> None:
+            nonlocal chunk_count, batch
+            for chunk in chunks:
+                batch.append((chunk_count, chunk))
+                chunk_count += 1
+                if len(batch) >= batch_size:
+                    await chunk_queue.put(batch)
+                    batch = []
+            if final and batch:
+                await chunk_queue.put(batch)
+
+        document = stream_document(source, doc_data["content_type"])
+        async with contextlib.aclosing(document) as sections:
+            while True:
+                t = time.perf_counter()
+                section = await anext(sections, None)
+                # Splitting (and the splitter's first import) stays off the event loop
+                if section is None:
+                    chunks = await run_blocking(chunker.finish)
+                else:
+                    chunks = await run_blocking(chunker.feed, section)
+                parse_stats.record(len(chunks), time.perf_counter() - t)
+                # Time spent blocked on a full queue is the embedder's, not the parser's
+                await emit(chunks, final=section is None)
+                if section is None:
+                    break
+        for _ in range(embed_workers):
+            await chunk_queue.put(None)
+
+    async def embed() -> None:
+        nonlocal cache_hits
+        while (batch := await chunk_queue.get()) is not None:
+            t = time.perf_counter()
+            embeddings, hits = await _embed_chunks(user_id, doc_id, [text for _, text in batch])
+            embed_stats.record(len(batch), time.perf_counter() - t)
+            cache_hits += hits
+            await write_queue.put(
+                [
+                    {
+                        # Deterministic ids make a retried ingestion overwrite, not duplicate
+                        "chunk_id": f"{doc_id}_{idx}",
+                        "document_id": doc_id,
+                        "document_name": doc_data["filename"],
+                        "content": text,
+                        "embedding": embedding,
+                        "chunk_index": idx,
+                    }
+                    for (idx, text), embedding in zip(batch, embeddings)
+                ]
+            )
+
+    async def embed_all() -> None:
+        async with asyncio.TaskGroup() as group:
+            for _ in range(embed_workers):
+                group.create_task(embed())
+        for _ in range(write_workers):
+            await write_queue.put(None)
+
+    async def write() -> None:
+        nonlocal first_chunk_seconds
+        vector_store = get_vector_store()
+        while (rows := await write_queue.get()) is not None:
+            t = time.perf_counter()
+            # Stop writing chunks the purge of a deleted document would have to chase
+            await _ensure_not_deleted(user_id, doc_id)
+            await vector_store.add_chunks(user_id, rows)
+            await get_lexical_index().add_chunks(user_id, rows)
+            write_stats.record(len(rows), time.perf_counter() - t)
+            if first_chunk_seconds is None:
+                first_chunk_seconds = time.perf_counter() - start
+                metrics.observe("ingestion.time_to_first_chunk_seconds", first_chunk_seconds)
+
+    try:
+        async with asyncio.TaskGroup() as group:
+            group.create_task(parse())
+            group.create_task(embed_all())
+            for _ in range(write_workers):
+                group.create_task(write())
+    except ExceptionGroup as e:
+        # The other stages were cancelled; surface the error that caused it
+        first = e.exceptions[0]
+        while isinstance(first, ExceptionGroup):
+            first = first.exceptions[0]
+        raise first from None
+
+    total = time.perf_counter() - start
+    for stats in (parse_stats, embed_stats, write_stats):
+        metrics.observe(f"ingestion.{stats.name}_chunks_per_second", stats.rate)
+    metrics.observe("ingestion.document_seconds", total)
+    saved = cache_hits * (_seconds_per_embedding or 0.0)
+    logger.info(
+        f"Pipeline for document {doc_id} in {total:.2f}s, first chunk searchable after "
+        f"{first_chunk_seconds or 0.0:.2f}s: {parse_stats}; {embed_stats} "
+        f"({cache_hits} reused, ~{saved:.2f}s saved); {write_stats}"
+    )
+    return chunk_count
 
 
 async def ingest_document(user_id: str, doc_id: str) -> None:
+    temp_path = None
     try:
         db = get_firestore_client()
         doc_ref = db.collection("users").document(user_id).collection("documents").document(doc_id)
-        doc_snapshot = doc_ref.get()
+        doc_snapshot = await doc_ref.get()
 
         if not doc_snapshot.exists:
             logger.error(f"Document {doc_id} not found for user {user_id}")
             return
 
         doc_data = doc_snapshot.to_dict()
+        if doc_data.get("status") == DELETING:
+            logger.info(f"Skipping ingestion of document {doc_id}: it is being deleted")
+            return
 
-        # Download file from GCS
+        # Download file from GCS to local disk so parsing never holds it in memory
         bucket = get_bucket()
         blob = bucket.blob(doc_data["gcs_path"])
-        file_bytes = blob.download_as_bytes()
-
-        # Parse document to text
-        text = parse_document(file_bytes, doc_data["content_type"])
+        fd, temp_path = tempfile.mkstemp(suffix=os.path.splitext(doc_data["filename"])[1])
+        os.close(fd)
+        await run_blocking(blob.download_to_filename, temp_path)
 
-        if not text.strip():
-            await update_document_status(user_id, doc_id, "error")
-            logger.error(f"No text extracted from document {doc_id}")
+        # Parse, chunk, embed and store
+        try:
+            chunk_count = await _run_pipeline(user_id, doc_id, doc_data, temp_path)
+        except DocumentDeletedError:
+            logger.info(f"Stopped ingesting document {doc_id}: it is being deleted")
             return
-
-        # Chunk text
-        chunks = chunk_text(text)
-
-        if not chunks:
-            await update_document_status(user_id, doc_id, "error")
-            logger.error(f"No chunks generated from document {doc_id}")
+        except DocumentParseError as e:
+            # Retrying cannot fix an unreadable, oversized or pathological file
+            await update_document_status(user_id, doc_id, ERROR)
+            logger.error(f"Could not parse document {doc_id}: {e}")
             return
 
-        # Generate embeddings
-        embeddings = _batch_embed(chunks)
-
-        # Store chunks with embeddings in Firestore
-        chunks_ref = db.collection("users").document(user_id).collection("chunks")
-        batch = db.batch()
-
-        for idx, (chunk_text_content, embedding) in enumerate(zip(chunks, embeddings)):
-            chunk_id = str(uuid.uuid4())
-            chunk_ref = chunks_ref.document(chunk_id)
-            batch.set(
-                chunk_ref,
-                {
-                    "document_id": doc_id,
-                    "document_name": doc_data["filename"],
-                    "content": chunk_text_content,
-                    "embedding": Vector(embedding),
-                    "chunk_index": idx,
-                    "created_at": datetime.now(timezone.utc),
-                },
-            )
-
-            # Firestore batch limit is 500 writes
-            if (idx + 1) % 499 == 0:
-                batch.commit()
-                batch = db.batch()
-
-        batch.commit()
+        if not chunk_count:
+            await update_document_status(user_id, doc_id, ERROR)
+            logger.error(f"No text extracted from document {doc_id}")
+            return
 
         # Update document status
-        await update_document_status(user_id, doc_id, "ready", chunk_count=len(chunks))
-        logger.info(f"Ingested document {doc_id}: {len(chunks)} chunks")
+        if not await update_document_status(user_id, doc_id, READY, chunk_count=chunk_count):
+            logger.info(f"Document {doc_id} was deleted during ingestion")
+            return
+        await bump_corpus_version(user_id)
+        await get_vector_store().save_snapshot(user_id)
+        logger.info(f"Ingested document {doc_id}: {chunk_count} chunks")
 
     except Exception as e:
+        # The ingestion worker decides whether to retry or mark the document failed
         logger.error(f"Ingestion failed for document {doc_id}: {e}")
-        await update_document_status(user_id, doc_id, "error")
         raise
+    finally:
+        if temp_path is not None:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(temp_path)
@@ -0,0 +1,195 @@
+import asyncio
+import contextlib
+import logging
+import os
+from collections.abc import Awaitable, Callable
+
+from app.config import settings
+from app.core import metrics
+from app.models.schemas import ERROR
+from app.services.document_service import update_document_status
+from app.services.ingestion_service import ingest_document
+from app.services.job_queue import Job, JobQueue, get_job_queue
+from app.utils.document_parsers import shutdown_parsers
+from app.utils.retry import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+# Expired leases left by crashed workers on other instances are swept this often
+RECOVERY_INTERVAL_POLLS = 12
+
+
+class IngestionWorkerPool:
+    """Runs queued ingestion jobs with at most ``concurrency`` in flight.
+
+    Jobs that raise are retried with jittered exponential backoff until
+    ``max_attempts`` claims have been used, then the job is failed and the
+    document marked ``error``. Leases are renewed while a job runs so long
+    documents are not handed to another worker.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        handler: Callable[[str, str], Awaitable[None]] = ingest_document,
+        concurrency: int = 2,
+        max_attempts: int = 4,
+        retry_base_delay: float = 5.0,
+        retry_max_delay: float = 300.0,
+        poll_interval: float = 5.0,
+    ):
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.poll_interval = poll_interval
+        self._running: set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._poller: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        try:
+            recovered = await self.queue.recover()
+            if recovered:
+                logger.info(f"Requeued {recovered} interrupted ingestion jobs")
+        except Exception as e:
+            logger.error(f"Ingestion job recovery failed: {e}")
+        self._poller = asyncio.create_task(self._poll())
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        if self._poller is not None:
+            self._poller.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._poller
+            self._poller = None
+        if self._running:
+            # Unfinished jobs keep their lease and are recovered once it expires
+            await asyncio.wait(self._running, timeout=timeout)
+
+    def notify(self) -> None:
+        """Wake the poller now instead of at the next poll interval."""
+        self._wakeup.set()
+
+    async def _poll(self) -> None:
+        polls = 0
+        while True:
+            try:
+                polls += 1
+                if polls % RECOVERY_INTERVAL_POLLS == 0:
+                    await self.queue.recover()
+                free = self.concurrency - len(self._running)
+                if free > 0:
+                    for job in await self.queue.claim(free):
+                        task = asyncio.create_task(self._run(job))
+                        self._running.add(task)
+                        task.add_done_callback(self._on_done)
+            except Exception as e:
+                logger.error(f"Ingestion job poll failed: {e}")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def _on_done(self, task: asyncio.Task) -> None:
+        self._running.discard(task)
+        # A slot freed up; look for more work straight away
+        self._wakeup.set()
+
+    async def _run(self, job: Job) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            await self.handler(job.user_id, job.doc_id)
+        except Exception as e:
+            await self._handle_failure(job, e)
+        else:
+            await self.queue.complete(job)
+            metrics.increment("ingestion.jobs_succeeded")
+        finally:
+            heartbeat.cancel()
+
+    async def _handle_failure(self, job: Job, error: Exception) -> None:
+        message = f"{type(error).__name__}: {error}"
+        if job.attempts < self.max_attempts:
+            delay = backoff_delay(job.attempts - 1, self.retry_base_delay, self.retry_max_delay)
+            logger.warning(
+                f"Ingestion of document {job.doc_id} failed "
+                f"(attempt {job.attempts}/{self.max_attempts}), retrying in {delay:.0f}s: {message}"
+            )
+            await self.queue.retry(job, message, delay)
+            metrics.increment("ingestion.jobs_retried")
+            return
+
+        logger.error(f"Ingestion of document {job.doc_id} failed permanently: {message}")
+        await self.queue.fail(job, message)
+        await update_document_status(job.user_id, job.doc_id, ERROR)
+        metrics.increment("ingestion.jobs_failed")
+
+    async def _heartbeat(self, job: Job) -> None:
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            try:
+                await self.queue.heartbeat(job)
+            except Exception as e:
+                logger.warning(f"Lease renewal failed for job {job.id}: {e}")
+
+
+_worker_pool: IngestionWorkerPool | None = None
+
+
+def get_worker_pool() -> IngestionWorkerPool:
+    global _worker_pool
+    if _worker_pool is None:
+        _worker_pool = IngestionWorkerPool(
+            get_job_queue(),
+            concurrency=settings.INGESTION_CONCURRENCY,
+            max_attempts=settings.INGESTION_MAX_ATTEMPTS,
+            retry_base_delay=settings.INGESTION_RETRY_BASE_DELAY,
+            retry_max_delay=settings.INGESTION_RETRY_MAX_DELAY,
+            poll_interval=settings.INGESTION_POLL_INTERVAL_SECONDS,
+        )
+    return _worker_pool
+
+
+async def enqueue_ingestion(user_id: str, doc_id: str) -> Job:
+    job = await get_job_queue().enqueue(user_id, doc_id)
+    if _worker_pool is not None:
+        _worker_pool.notify()
+    return job
+
+
+async def _answer_health_check(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    with contextlib.suppress(ConnectionError, asyncio.IncompleteReadError):
+        await reader.readuntil(b"\r\n\r\n")
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\n"
+            b"Content-Length: 2\r\nConnection: close\r\n\r\nok"
+        )
+        await writer.drain()
+    writer.close()
+
+
+async def _run_standalone(port: int | None = None) -> None:
+    pool = get_worker_pool()
+    await pool.start()
+    # Cloud Run only keeps a container that listens on $PORT
+    server = None
+    if port is not None:
+        server = await asyncio.start_server(_answer_health_check, "0.0.0.0", port)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        if server is not None:
+            server.close()
+        await pool.stop()
+        shutdown_parsers()
+
+
+if __name__ == "__main__":
+    # Dedicated worker process: python -m app.services.ingestion_worker
+    logging.basicConfig(level=logging.INFO)
+    port = os.environ.get("PORT")
+    asyncio.run(_run_standalone(int(port) if port else None))
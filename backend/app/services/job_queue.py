@@ -0,0 +1,384 @@
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from google.cloud import firestore  # type: ignore[attr-defined]
+from google.cloud.firestore_v1 import FieldFilter
+
+from app.config import settings
+from app.core.executor import run_blocking
+from app.core.firestore_client import get_firestore_client
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+@dataclass
+class Job:
+    """One document ingestion. The job id is the document id, so enqueueing is idempotent."""
+
+    id: str
+    user_id: str
+    doc_id: str
+    status: str = QUEUED
+    attempts: int = 0
+    last_error: str | None = None
+
+
+class JobQueue(ABC):
+    """Durable queue of ingestion jobs shared by every worker.
+
+    ``claim`` leases jobs for ``lease_seconds``; a worker that dies mid-job
+    stops renewing its lease and ``recover`` hands the job to someone else.
+    ``attempts`` counts claims, so a job that keeps crashing its worker still
+    runs out of retries.
+    """
+
+    def __init__(self, lease_seconds: float):
+        self.lease_seconds = lease_seconds
+
+    @abstractmethod
+    async def enqueue(self, user_id: str, doc_id: str) -> Job: ...
+
+    @abstractmethod
+    async def claim(self, limit: int) -> list[Job]:
+        """Lease up to ``limit`` due queued jobs and mark them running."""
+
+    @abstractmethod
+    async def heartbeat(self, job: Job) -> None:
+        """Extend the lease on a running job."""
+
+    @abstractmethod
+    async def complete(self, job: Job) -> None: ...
+
+    @abstractmethod
+    async def retry(self, job: Job, error: str, delay_seconds: float) -> None:
+        """Put a failed job back in the queue once ``delay_seconds`` have passed."""
+
+    @abstractmethod
+    async def fail(self, job: Job, error: str) -> None:
+        """Give up on a job for good."""
+
+    @abstractmethod
+    async def recover(self) -> int:
+        """Requeue running jobs whose lease expired; return how many."""
+
+    @abstractmethod
+    async def pending_count(self, user_id: str | None = None) -> int:
+        """Number of queued or running jobs (of ``user_id`` if given), used for backpressure."""
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Job | None: ...
+
+    @abstractmethod
+    async def delete(self, job_id: str) -> None:
+        """Forget a job, e.g. once its document is deleted. A missing job is ignored."""
+
+
+class FirestoreJobQueue(JobQueue):
+    """Jobs stored in the top-level ``ingestion_jobs`` collection."""
+
+    def _jobs_ref(self):
+        return get_firestore_client().collection("ingestion_jobs")
+
+    async def enqueue(self, user_id: str, doc_id: str) -> Job:
+        now = datetime.now(timezone.utc)
+        await (
+            self._jobs_ref()
+            .document(doc_id)
+            .set(
+                {
+                    "user_id": user_id,
+                    "doc_id": doc_id,
+                    "status": QUEUED,
+                    "attempts": 0,
+                    "available_at": now,
+                    "lease_expires_at": None,
+                    "last_error": None,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+            )
+        )
+        return Job(id=doc_id, user_id=user_id, doc_id=doc_id)
+
+    async def claim(self, limit: int) -> list[Job]:
+        now = datetime.now(timezone.utc)
+        query = (
+            self._jobs_ref()
+            .where(filter=FieldFilter("status", "==", QUEUED))
+            .where(filter=FieldFilter("available_at", "<=", now))
+            .order_by("available_at")
+            .limit(limit)
+        )
+        claimed = []
+        async for snapshot in query.stream():
+            job = await self._transition(snapshot.reference, QUEUED, RUNNING, claim=True)
+            if job is not None:
+                claimed.append(job)
+        return claimed
+
+    async def heartbeat(self, job: Job) -> None:
+        await (
+            self._jobs_ref()
+            .document(job.id)
+            .update(
+                {
+                    "lease_expires_at": self._lease_deadline(),
+                    "updated_at": datetime.now(timezone.utc),
+                }
+            )
+        )
+
+    async def complete(self, job: Job) -> None:
+        await self._update(job, {"status": SUCCEEDED, "lease_expires_at": None})
+
+    async def retry(self, job: Job, error: str, delay_seconds: float) -> None:
+        available_at = datetime.now(timezone.utc) + timedelta(seconds=delay_seconds)
+        await self._update(
+            job,
+            {
+                "status": QUEUED,
+                "available_at": available_at,
+                "lease_expires_at": None,
+                "last_error": error,
+            },
+        )
+
+    async def fail(self, job: Job, error: str) -> None:
+        await self._update(job, {"status": FAILED, "lease_expires_at": None, "last_error": error})
+
+    async def recover(self) -> int:
+        query = (
+            self._jobs_ref()
+            .where(filter=FieldFilter("status", "==", RUNNING))
+            .where(filter=FieldFilter("lease_expires_at", "<", datetime.now(timezone.utc)))
+        )
+        recovered = 0
+        async for snapshot in query.stream():
+            if await self._transition(snapshot.reference, RUNNING, QUEUED) is not None:
+                recovered += 1
+        return recovered
+
+    async def pending_count(self, user_id: str | None = None) -> int:
+        query = self._jobs_ref().where(filter=FieldFilter("status", "in", [QUEUED, RUNNING]))
+        if user_id is not None:
+            query = query.where(filter=FieldFilter("user_id", "==", user_id))
+        results = await query.count().get()
+        return int(results[0][0].value)
+
+    async def get(self, job_id: str) -> Job | None:
+        snapshot = await self._jobs_ref().document(job_id).get()
+        if not snapshot.exists:
+            return None
+        data = snapshot.to_dict()
+        return Job(
+            id=snapshot.id,
+            user_id=data["user_id"],
+            doc_id=data["doc_id"],
+            status=data["status"],
+            attempts=data["attempts"],
+            last_error=data.get("last_error"),
+        )
+
+    async def delete(self, job_id: str) -> None:
+        await self._jobs_ref().document(job_id).delete()
+
+    def _lease_deadline(self) -> datetime:
+        return datetime.now(timezone.utc) + timedelta(seconds=self.lease_seconds)
+
+    async def _update(self, job: Job, data: dict) -> None:
+        await (
+            self._jobs_ref()
+            .document(job.id)
+            .update({**data, "updated_at": datetime.now(timezone.utc)})
+        )
+
+    async def _transition(
+        self, ref, from_status: str, to_status: str, claim: bool = False
+    ) -> Job | None:
+        """Move a job between states inside a transaction, so two workers never both win."""
+        db = get_firestore_client()
+
+        @firestore.async_transactional
+        async def run(transaction) -> Job | None:
+            snapshot = await ref.get(transaction=transaction)
+            data = snapshot.to_dict() if snapshot.exists else None
+            if data is None or data["status"] != from_status:
+                return None
+            attempts = data["attempts"] + 1 if claim else data["attempts"]
+            update: dict[str, Any] = {"status": to_status, "updated_at": datetime.now(timezone.utc)}
+            if claim:
+                update["attempts"] = attempts
+                update["lease_expires_at"] = self._lease_deadline()
+            transaction.update(ref, update)
+            return Job(
+                id=snapshot.id,
+                user_id=data["user_id"],
+                doc_id=data["doc_id"],
+                status=to_status,
+                attempts=attempts,
+                last_error=data.get("last_error"),
+            )
+
+        job: Job | None = await run(db.transaction())
+        return job
+
+
+class SQLiteJobQueue(JobQueue):
+    """Single-file (or ``:memory:``) queue for local development and tests."""
+
+    def __init__(self, path: str, lease_seconds: float):
+        super().__init__(lease_seconds)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL,
+                lease_expires_at REAL,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+
+    def _execute(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    async def enqueue(self, user_id: str, doc_id: str) -> Job:
+        now = time.time()
+        await run_blocking(
+            self._execute,
+            "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, 0, ?, NULL, NULL, ?, ?)",
+            (doc_id, user_id, doc_id, QUEUED, now, now, now),
+        )
+        return Job(id=doc_id, user_id=user_id, doc_id=doc_id)
+
+    async def claim(self, limit: int) -> list[Job]:
+        return await run_blocking(self._claim, limit)
+
+    def _claim(self, limit: int) -> list[Job]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, user_id, doc_id, attempts, last_error FROM jobs "
+                    "WHERE status = ? AND available_at <= ? ORDER BY available_at LIMIT ?",
+                    (QUEUED, now, limit),
+                ).fetchall()
+                for row in rows:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, attempts = attempts + 1, "
+                        "lease_expires_at = ?, updated_at = ? WHERE id = ?",
+                        (RUNNING, now + self.lease_seconds, now, row[0]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [
+            Job(
+                id=job_id,
+                user_id=user_id,
+                doc_id=doc_id,
+                status=RUNNING,
+                attempts=attempts + 1,
+                last_error=last_error,
+            )
+            for job_id, user_id, doc_id, attempts, last_error in rows
+        ]
+
+    async def heartbeat(self, job: Job) -> None:
+        now = time.time()
+        await run_blocking(
+            self._execute,
+            "UPDATE jobs SET lease_expires_at = ?, updated_at = ? WHERE id = ?",
+            (now + self.lease_seconds, now, job.id),
+        )
+
+    async def complete(self, job: Job) -> None:
+        await run_blocking(
+            self._execute,
+            "UPDATE jobs SET status = ?, lease_expires_at = NULL, updated_at = ? WHERE id = ?",
+            (SUCCEEDED, time.time(), job.id),
+        )
+
+    async def retry(self, job: Job, error: str, delay_seconds: float) -> None:
+        now = time.time()
+        await run_blocking(
+            self._execute,
+            "UPDATE jobs SET status = ?, available_at = ?, lease_expires_at = NULL, "
+            "last_error = ?, updated_at = ? WHERE id = ?",
+            (QUEUED, now + delay_seconds, error, now, job.id),
+        )
+
+    async def fail(self, job: Job, error: str) -> None:
+        await run_blocking(
+            self._execute,
+            "UPDATE jobs SET status = ?, lease_expires_at = NULL, last_error = ?, "
+            "updated_at = ? WHERE id = ?",
+            (FAILED, error, time.time(), job.id),
+        )
+
+    async def recover(self) -> int:
+        now = time.time()
+        rows = await run_blocking(
+            self._execute,
+            "UPDATE jobs SET status = ?, lease_expires_at = NULL, updated_at = ? "
+            "WHERE status = ? AND lease_expires_at < ? RETURNING id",
+            (QUEUED, now, RUNNING, now),
+        )
+        return len(rows)
+
+    async def pending_count(self, user_id: str | None = None) -> int:
+        sql = "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)"
+        params: tuple = (QUEUED, RUNNING)
+        if user_id is not None:
+            sql += " AND user_id = ?"
+            params += (user_id,)
+        rows = await run_blocking(self._execute, sql, params)
+        return int(rows[0][0])
+
+    async def get(self, job_id: str) -> Job | None:
+        rows = await run_blocking(
+            self._execute,
+            "SELECT id, user_id, doc_id, status, attempts, last_error FROM jobs WHERE id = ?",
+            (job_id,),
+        )
+        return Job(*rows[0]) if rows else None
+
+    async def delete(self, job_id: str) -> None:
+        await run_blocking(self._execute, "DELETE FROM jobs WHERE id = ?", (job_id,))
+
+
+_job_queue: JobQueue | None = None
+
+
+def get_job_queue() -> JobQueue:
+    global _job_queue
+    if _job_queue is None:
+        backend = settings.JOB_QUEUE_BACKEND
+        if backend == "firestore":
+            _job_queue = FirestoreJobQueue(settings.INGESTION_LEASE_SECONDS)
+        elif backend == "sqlite":
+            _job_queue = SQLiteJobQueue(
+                settings.JOB_QUEUE_SQLITE_PATH, settings.INGESTION_LEASE_SECONDS
+            )
+        else:
+            raise ValueError(f"Unsupported job queue backend: {backend}")
+    return _job_queue
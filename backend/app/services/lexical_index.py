@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+from app.config import settings
+from app.core import metrics
+from app.core.executor import run_blocking
+from app.services.answer_cache import get_corpus_versions
+from app.services.vector_store import FirestoreVectorStore, live_document_ids
+from app.utils.bm25 import BM25Index, LexicalHits
+
+logger = logging.getLogger(__name__)
+
+# Chunks are indexed this many at a time while rebuilding from Firestore
+_REBUILD_BATCH_SIZE = 500
+# Catch-up reads re-fetch chunks written this long before the last sync, so a
+# write still in flight during that sync (or clock skew) is not missed
+SYNC_SLACK = timedelta(minutes=5)
+
+
+@dataclass
+class _LexicalEntry:
+    index: BM25Index
+    # Corpus version and wall-clock time of the last read from Firestore
+    version: int
+    synced_at: datetime
+    checked_at: float = field(default_factory=time.monotonic)
+
+
+class LexicalIndexStore:
+    """Per-user BM25 indexes over chunk text, kept in process.
+
+    Indexes are never built on the request path. A search for a user with
+    no index yet starts a build in the background and returns no hits, so
+    that request is answered by vector search alone. Every
+    ``max_age_seconds`` a search also starts a background check of the
+    user's corpus version. When the version has changed (documents
+    ingested or deleted on any instance), the index catches up
+    incrementally. It reads only the chunks created since its last sync,
+    and drops the documents that no longer exist. Ingestion and deletes on
+    this instance update loaded indexes directly. At most ``max_users``
+    indexes are kept, least recently used first out.
+    """
+
+    def __init__(self, source: FirestoreVectorStore, max_age_seconds: float, max_users: int):
+        self.source = source
+        self.max_age_seconds = max_age_seconds
+        self.max_users = max_users
+        self._indexes: OrderedDict[str, _LexicalEntry] = OrderedDict()
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    async def add_chunks(self, user_id: str, chunks: list[dict]) -> None:
+        entry = self._indexes.get(user_id)
+        if entry is not None:
+            await run_blocking(
+                entry.index.add_batch,
+                [(c["chunk_id"], c["document_id"], c["content"]) for c in chunks],
+            )
+
+    async def delete_document(self, user_id: str, doc_id: str) -> None:
+        entry = self._indexes.get(user_id)
+        if entry is not None:
+            await run_blocking(entry.index.remove_group, doc_id)
+
+    async def search(
+        self, user_id: str, query: str, top_k: int, document_ids: list[str] | None = None
+    ) -> LexicalHits:
+        entry = self._indexes.get(user_id)
+        if entry is None:
+            metrics.increment("lexical_index.cold_searches")
+            self._update_in_background(user_id)
+            return LexicalHits([], 0.0, 0, False, 0)
+        self._indexes.move_to_end(user_id)
+        if time.monotonic() - entry.checked_at > self.max_age_seconds:
+            self._update_in_background(user_id)
+        return entry.index.search(query, top_k, groups=document_ids)
+
+    async def load(self, user_id: str) -> None:
+        """Build or catch up the user's index now, e.g. to warm it ahead of searches."""
+        self._update_in_background(user_id)
+        await asyncio.shield(self._tasks[user_id])
+
+    def _update_in_background(self, user_id: str) -> None:
+        if user_id in self._tasks:
+            return
+        task = asyncio.create_task(self._update(user_id))
+        self._tasks[user_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(user_id, None))
+
+    async def _update(self, user_id: str) -> None:
+        try:
+            version = await get_corpus_versions().get(user_id)
+            entry = self._indexes.get(user_id)
+            if entry is None:
+                self._indexes[user_id] = await self._build(user_id, version)
+                while len(self._indexes) > self.max_users:
+                    self._indexes.popitem(last=False)
+            elif version != entry.version:
+                await self._catch_up(user_id, entry, version)
+            else:
+                entry.checked_at = time.monotonic()
+        except Exception as e:
+            # Searches keep using what is loaded (or vector search alone) until the next try
+            metrics.increment("lexical_index.update_failures")
+            logger.warning(f"Could not update lexical index for user {user_id}: {e}")
+
+    async def _build(self, user_id: str, version: int) -> _LexicalEntry:
+        start = time.perf_counter()
+        synced_at = datetime.now(timezone.utc)
+        index = BM25Index()
+        batch: list[tuple[str, str, str]] = []
+        async for chunk in self.source.iter_chunks(user_id, with_embeddings=False):
+            batch.append((chunk["chunk_id"], chunk["document_id"], chunk["content"]))
+            if len(batch) >= _REBUILD_BATCH_SIZE:
+                await run_blocking(index.add_batch, batch)
+                batch = []
+        if batch:
+            await run_blocking(index.add_batch, batch)
+        metrics.increment("lexical_index.builds")
+        logger.info(
+            f"Built lexical index for user {user_id}: {len(index)} chunks "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+        return _LexicalEntry(index, version, synced_at)
+
+    async def _catch_up(self, user_id: str, entry: _LexicalEntry, version: int) -> None:
+        synced_at = datetime.now(timezone.utc)
+        since = entry.synced_at - SYNC_SLACK
+        changed = [
+            (c["chunk_id"], c["document_id"], c["content"])
+            async for c in self.source.iter_chunks(
+                user_id, with_embeddings=False, created_after=since
+            )
+        ]
+        live = await live_document_ids(user_id)
+        await run_blocking(entry.index.add_batch, changed)
+        for doc_id in await run_blocking(entry.index.groups) - live:
+            await run_blocking(entry.index.remove_group, doc_id)
+        entry.version = version
+        entry.synced_at = synced_at
+        entry.checked_at = time.monotonic()
+        metrics.increment("lexical_index.catch_ups")
+        logger.info(
+            f"Caught up lexical index for user {user_id} to corpus version {version}: "
+            f"{len(changed)} new chunks"
+        )
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = 60) -> list[tuple[str, float]]:
+    """Fuse ranked id lists: each id scores ``sum(1 / (k + rank))``, best first."""
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, 1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+_lexical_index: LexicalIndexStore | None = None
+
+
+def get_lexical_index() -> LexicalIndexStore:
+    global _lexical_index
+    if _lexical_index is None:
+        _lexical_index = LexicalIndexStore(
+            FirestoreVectorStore(),
+            max_age_seconds=settings.LEXICAL_INDEX_MAX_AGE_SECONDS,
+            max_users=settings.LEXICAL_INDEX_MAX_USERS,
+        )
+    return _lexical_index
@@ -1,17 +1,121 @@
-from google.cloud.firestore_v1.base_vector_query import DistanceMeasure
-from google.cloud.firestore_v1.vector import Vector
-from vertexai.language_models import TextEmbeddingInput
+from dataclasses import dataclass
 
 from app.config import settings
-from app.core.firestore_client import get_firestore_client
-from app.core.vertex_client import get_embedding_model
+from app.core import metrics
+from app.services.deletion_service import get_background_deleter
+from app.services.embedding_batcher import EmbeddingCoalescer
+from app.services.embedding_store import embedding_key
+from app.services.lexical_index import get_lexical_index, reciprocal_rank_fusion
+from app.services.vector_store import get_vector_store
+from app.utils.bm25 import LexicalHits
+from app.utils.cache import CacheBackend, LRUCache
+from app.utils.mmr import cosine_similarities, mmr_select
+from app.utils.text_processing import estimate_tokens, join_overlapping, truncate_to_tokens
 
+QUERY_TASK_TYPE = "RETRIEVAL_QUERY"
+# A truncated passage shorter than this isn't worth its source label
+_MIN_PASSAGE_TOKENS = 50
 
-def _embed_query(query: str) -> list[float]:
-    model = get_embedding_model()
-    inputs = [TextEmbeddingInput(text=query, task_type="RETRIEVAL_QUERY")]
-    embeddings = model.get_embeddings(inputs)
-    return list(embeddings[0].values)
+_query_embedding_cache: CacheBackend | None = None
+_query_coalescer: EmbeddingCoalescer | None = None
+
+
+def get_query_embedding_cache() -> CacheBackend:
+    global _query_embedding_cache
+    if _query_embedding_cache is None:
+        _query_embedding_cache = LRUCache(
+            max_size=settings.QUERY_EMBEDDING_CACHE_SIZE,
+            ttl_seconds=settings.QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+        )
+        _register_cache_metrics(_query_embedding_cache)
+    return _query_embedding_cache
+
+
+def set_query_embedding_cache(cache: CacheBackend) -> None:
+    """Swap the query embedding cache backend, e.g. for one shared across instances."""
+    global _query_embedding_cache
+    _query_embedding_cache = cache
+    _register_cache_metrics(cache)
+
+
+def _register_cache_metrics(cache: CacheBackend) -> None:
+    metrics.register_collector(
+        "query_embedding_cache", lambda: {**cache.stats.as_dict(), "size": len(cache)}
+    )
+
+
+def get_query_embedding_coalescer() -> EmbeddingCoalescer:
+    global _query_coalescer
+    if _query_coalescer is None:
+        _query_coalescer = EmbeddingCoalescer(
+            QUERY_TASK_TYPE,
+            max_batch_size=settings.QUERY_EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_seconds=settings.QUERY_EMBEDDING_BATCH_MAX_WAIT_MS / 1000,
+        )
+    return _query_coalescer
+
+
+def _query_cache_key(query: str) -> str:
+    return embedding_key(" ".join(query.split()).casefold(), QUERY_TASK_TYPE)
+
+
+async def embed_query(query: str) -> list[float]:
+    """Embedding of ``query``, reused for repeats of the same normalised text."""
+    cache = get_query_embedding_cache()
+    key = _query_cache_key(query)
+    cached = await cache.get(key)
+    if cached is not None:
+        return list(cached)
+
+    values = await get_query_embedding_coalescer().embed(query)
+    await cache.set(key, values)
+    return values
+
+
+@dataclass
+class _SearchScope:
+    document_ids: list[str] | None
+    search_k: int
+    excluded: set[str]
+
+
+async def _search_scope(
+    user_id: str, document_ids: list[str] | None, top_k: int
+) -> _SearchScope | None:
+    """What to search for ``top_k`` results; None if every selected document is being deleted."""
+    # MMR needs a wider candidate pool to choose diverse chunks from
+    search_k = top_k * settings.MMR_FETCH_MULTIPLIER if settings.MMR_ENABLED else top_k
+
+    # Documents being deleted still have chunks until the background purge ends
+    excluded = await get_background_deleter().excluded_documents(user_id)
+    if excluded:
+        if document_ids:
+            document_ids = [doc_id for doc_id in document_ids if doc_id not in excluded]
+            if not document_ids:
+                return None
+        else:
+            search_k *= 2
+    return _SearchScope(document_ids or None, search_k, excluded)
+
+
+async def search_lexical(
+    user_id: str, query: str, document_ids: list[str] | None = None, top_k: int | None = None
+) -> LexicalHits | None:
+    """The BM25 search ``retrieve_relevant_chunks`` runs for ``query``.
+
+    None when hybrid search is off or there is nothing to search. A caller
+    that looks at the hits first (see ``is_keyword_lookup``) passes them on
+    to ``retrieve_relevant_chunks`` with the same arguments, which then
+    doesn't search again.
+    """
+    if not settings.HYBRID_SEARCH_ENABLED:
+        return None
+    scope = await _search_scope(user_id, document_ids, top_k or settings.TOP_K_RESULTS)
+    if scope is None:
+        return None
+    return await get_lexical_index().search(
+        user_id, query, scope.search_k, document_ids=scope.document_ids
+    )
 
 
 async def retrieve_relevant_chunks(
@@ -19,47 +123,221 @@ async def retrieve_relevant_chunks(
     query: str,
     document_ids: list[str] | None = None,
     top_k: int | None = None,
+    lexical: LexicalHits | None = None,
 ) -> list[dict]:
+    """Chunks for ``query``, best first, each with a ``score`` (higher is closer).
+
+    ``score`` is the cosine similarity ``1 - distance``. Chunks under
+    ``RETRIEVAL_MIN_SCORE`` are dropped unless BM25 also matched them, and the
+    rest are reranked with MMR so overlapping near-duplicates don't all make
+    it into the prompt. Lexical fast-path answers have no ``distance``; their
+    score is the BM25 score relative to the best hit. ``lexical`` is the
+    result of an earlier ``search_lexical`` for the same query, reused
+    instead of searching BM25 again.
+    """
     if top_k is None:
         top_k = settings.TOP_K_RESULTS
+    scope = await _search_scope(user_id, document_ids, top_k)
+    if scope is None:
+        return []
+    document_ids, search_k, excluded = scope.document_ids, scope.search_k, scope.excluded
+
+    vector_store = get_vector_store()
+    if settings.HYBRID_SEARCH_ENABLED:
+        if lexical is None:
+            lexical = await get_lexical_index().search(
+                user_id, query, search_k, document_ids=document_ids
+            )
+        if _is_confident_keyword_match(lexical, top_k):
+            # Exact-term lookups (error codes, part numbers) need no embedding call
+            metrics.increment("retrieval.lexical_fast_path")
+            scores = dict(lexical.hits)
+            best = lexical.hits[0][1]
+            chunks = await vector_store.get_chunks(user_id, list(scores))
+            return [
+                {
+                    **c,
+                    "distance": None,
+                    "lexical_score": scores[c["chunk_id"]],
+                    "score": scores[c["chunk_id"]] / best,
+                }
+                for c in chunks
+                if c["document_id"] not in excluded
+            ][:top_k]
 
     # Embed the query
-    query_embedding = _embed_query(query)
+    query_embedding = await embed_query(query)
+
+    # Vector search, scoped to the selected documents
+    chunks = await vector_store.search(
+        user_id,
+        query_embedding,
+        search_k,
+        document_ids=document_ids,
+        with_embeddings=settings.MMR_ENABLED,
+    )
+    relevance = [1.0 - c["distance"] for c in chunks]
+    if lexical is not None and lexical.hits:
+        chunks, relevance = await _fuse(user_id, query_embedding, chunks, lexical.hits, search_k)
+
+    kept = []
+    below_threshold = 0
+    for chunk, rel in zip(chunks, relevance):
+        if chunk["document_id"] in excluded:
+            continue
+        chunk["score"] = 1.0 - chunk["distance"]
+        if chunk["score"] < settings.RETRIEVAL_MIN_SCORE and "lexical_score" not in chunk:
+            below_threshold += 1
+            continue
+        kept.append((chunk, rel))
+    if below_threshold:
+        metrics.increment("retrieval.below_threshold", below_threshold)
+
+    if settings.MMR_ENABLED and len(kept) > 1:
+        order = mmr_select(
+            query_embedding,
+            [chunk["embedding"] for chunk, _ in kept],
+            top_k,
+            lambda_mult=settings.MMR_LAMBDA,
+            relevance=[rel for _, rel in kept],
+        )
+        kept = [kept[i] for i in order]
+    return [{k: v for k, v in chunk.items() if k != "embedding"} for chunk, _ in kept[:top_k]]
+
+
+def is_keyword_lookup(lexical: LexicalHits | None, top_k: int | None = None) -> bool:
+    """Whether ``retrieve_relevant_chunks``, given these ``search_lexical`` hits,
+    answers from BM25 alone without embedding the query."""
+    if lexical is None or not settings.HYBRID_SEARCH_ENABLED:
+        return False
+    return _is_confident_keyword_match(lexical, top_k or settings.TOP_K_RESULTS)
 
-    # Vector search in Firestore
-    db = get_firestore_client()
-    chunks_ref = db.collection("users").document(user_id).collection("chunks")
 
-    vector_query = chunks_ref.find_nearest(
-        vector_field="embedding",
-        query_vector=Vector(query_embedding),
-        distance_measure=DistanceMeasure.COSINE,
-        limit=top_k,
+def _is_confident_keyword_match(lexical: LexicalHits, top_k: int) -> bool:
+    """A short query whose exact tokens pinpoint at most ``top_k`` chunks."""
+    return (
+        settings.LEXICAL_FAST_PATH_ENABLED
+        and bool(lexical.hits)
+        and lexical.all_terms_known
+        and 0 < lexical.exact_matches <= top_k
+        and lexical.query_terms <= settings.LEXICAL_FAST_PATH_MAX_TERMS
+        and lexical.confidence >= settings.LEXICAL_FAST_PATH_MIN_CONFIDENCE
     )
 
-    results = []
-    for doc in vector_query.stream():
-        chunk_data = doc.to_dict()
 
-        # Filter by document_ids if specified
-        if document_ids and chunk_data["document_id"] not in document_ids:
+async def _fuse(
+    user_id: str,
+    query_embedding: list[float],
+    vector_chunks: list[dict],
+    lexical_hits: list[tuple[str, float]],
+    limit: int,
+) -> tuple[list[dict], list[float]]:
+    """Merge vector and BM25 rankings with reciprocal-rank fusion.
+
+    Returns the fused chunks with their fusion scores scaled to ``[0, 1]``.
+    """
+    metrics.increment("retrieval.hybrid_queries")
+    fused = reciprocal_rank_fusion(
+        [[c["chunk_id"] for c in vector_chunks], [key for key, _ in lexical_hits]],
+        k=settings.HYBRID_RRF_K,
+    )[:limit]
+    by_id = {c["chunk_id"]: c for c in vector_chunks}
+    lexical_scores = dict(lexical_hits)
+    missing = [chunk_id for chunk_id, _ in fused if chunk_id not in by_id]
+    if missing:
+        # Lexical-only hits are scored against the query here
+        found = await get_vector_store().get_chunks(user_id, missing, with_embeddings=True)
+        if found:
+            similarities = cosine_similarities(
+                query_embedding, [chunk["embedding"] for chunk in found]
+            )
+            for chunk, similarity in zip(found, similarities.tolist()):
+                by_id[chunk["chunk_id"]] = {**chunk, "distance": 1.0 - similarity}
+
+    chunks = []
+    relevance = []
+    best = fused[0][1] if fused else 1.0
+    for chunk_id, fused_score in fused:
+        if chunk_id not in by_id:
             continue
+        chunk = by_id[chunk_id]
+        if chunk_id in lexical_scores:
+            chunk = {**chunk, "lexical_score": lexical_scores[chunk_id]}
+        chunks.append(chunk)
+        relevance.append(fused_score / best)
+    return chunks, relevance
+
+
+@dataclass
+class PackedContext:
+    """Prompt context plus the sources its ``[Source N]`` labels refer to.
+
+    ``sources[n - 1]`` is ``[Source n]``: a passage of one or more adjacent
+    chunks with the first chunk's id, the passage text and its best score.
+    """
 
-        results.append(
-            {
-                "chunk_id": doc.id,
-                "document_id": chunk_data["document_id"],
-                "document_name": chunk_data.get("document_name", "Unknown"),
-                "content": chunk_data["content"],
-                "chunk_index": chunk_data.get("chunk_index", 0),
+    text: str
+    sources: list[dict]
+    tokens: int
+
+
+def _merge_adjacent(chunks: list[dict]) -> list[dict]:
+    """Merge hits with consecutive ``chunk_index`` from one document into passages."""
+    by_document: dict[str, list[dict]] = {}
+    for chunk in chunks:
+        by_document.setdefault(chunk["document_id"], []).append(chunk)
+
+    passages: list[dict] = []
+    for document_chunks in by_document.values():
+        document_chunks.sort(key=lambda c: c["chunk_index"])
+        passage: dict | None = None
+        for chunk in document_chunks:
+            score = chunk.get("score", 0.0)
+            if passage is not None and chunk["chunk_index"] == passage["last_index"] + 1:
+                passage["content"] = join_overlapping(passage["content"], chunk["content"])
+                passage["last_index"] = chunk["chunk_index"]
+                passage["score"] = max(passage["score"], score)
+                continue
+            passage = {
+                "chunk_id": chunk["chunk_id"],
+                "document_id": chunk["document_id"],
+                "document_name": chunk["document_name"],
+                "content": chunk["content"],
+                "last_index": chunk["chunk_index"],
+                "score": score,
             }
-        )
+            passages.append(passage)
+    for passage in passages:
+        del passage["last_index"]
+    # Stable, so equal scores keep retrieval order
+    passages.sort(key=lambda p: p["score"], reverse=True)
+    return passages
+
+
+def build_context(chunks: list[dict], max_tokens: int | None = None) -> PackedContext:
+    """Pack retrieved chunks into at most ``max_tokens`` estimated tokens.
 
-    return results
+    Adjacent chunks of a document are merged with their overlap removed.
+    Passages go in best-first; the one that no longer fits is truncated and
+    any after it are dropped, so the lowest-scored text is cut first.
+    """
+    if max_tokens is None:
+        max_tokens = settings.CONTEXT_MAX_TOKENS
 
+    parts: list[str] = []
+    sources: list[dict] = []
+    used = 0
+    for passage in _merge_adjacent(chunks):
+        header = f"[Source {len(sources) + 1} - {passage['document_name']}]\n"
+        # Parts are separated by a blank line
+        remaining = max_tokens - used - estimate_tokens(header) - 1
+        if remaining < _MIN_PASSAGE_TOKENS:
+            break
+        content = truncate_to_tokens(passage["content"], remaining)
+        part = header + content
+        parts.append(part)
+        sources.append({**passage, "content": content})
+        used += estimate_tokens(part) + 1
 
-def build_context(chunks: list[dict]) -> str:
-    context_parts = []
-    for i, chunk in enumerate(chunks, 1):
-        context_parts.append(f"[Source {i} - {chunk['document_name']}]\n{chunk['content']}")
-    return "\n\n".join(context_parts)
+    metrics.observe("retrieval.context_tokens", used)
+    return PackedContext(text="\n\n".join(parts), sources=sources, tokens=used)
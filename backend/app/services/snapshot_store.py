@@ -0,0 +1,96 @@
+import contextlib
+import logging
+import os
+import tempfile
+from datetime import datetime
+
+import numpy as np
+from google.api_core import exceptions as gexc
+
+from app.config import settings
+from app.core.executor import run_blocking
+from app.core.gcs_client import get_bucket
+from app.utils.index_snapshot import IndexSnapshot, SnapshotFormatError, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotStore:
+    """Per-user index snapshots kept in ``directory`` and mirrored to GCS.
+
+    The local file is what gets memory-mapped; GCS is how a fresh instance
+    finds a snapshot another instance built. Snapshots are stamped with the
+    user's corpus version (see ``answer_cache.CorpusVersions``), which is
+    how a stale one is recognised.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _local_path(self, user_id: str) -> str:
+        return os.path.join(self.directory, f"{user_id}.idx")
+
+    def _blob(self, user_id: str):
+        return get_bucket().blob(f"users/{user_id}/index.snapshot")
+
+    async def load(self, user_id: str) -> IndexSnapshot | None:
+        """The user's snapshot, fetched from GCS if not on local disk; None if there is none."""
+        path = self._local_path(user_id)
+        if not os.path.exists(path):
+            try:
+                await run_blocking(self._download, user_id, path)
+            except gexc.NotFound:
+                return None
+        try:
+            return await run_blocking(IndexSnapshot, path)
+        except (OSError, SnapshotFormatError) as e:
+            logger.warning(f"Discarding unreadable index snapshot for user {user_id}: {e}")
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+            return None
+
+    def _download(self, user_id: str, path: str) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".download")
+        os.close(fd)
+        try:
+            self._blob(user_id).download_to_filename(temp_path)
+            os.replace(temp_path, path)
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(temp_path)
+
+    async def save(
+        self,
+        user_id: str,
+        *,
+        version: int,
+        synced_at: datetime,
+        storage: str,
+        rows: list[dict],
+        vectors: np.ndarray,
+        exact: bool = False,
+    ) -> None:
+        path = self._local_path(user_id)
+        await run_blocking(os.makedirs, self.directory, exist_ok=True)
+        await run_blocking(
+            write_snapshot,
+            path,
+            version=version,
+            synced_at=synced_at,
+            storage=storage,
+            rows=rows,
+            vectors=vectors,
+            exact=exact,
+        )
+        await run_blocking(self._blob(user_id).upload_from_filename, path)
+
+
+_snapshot_store: SnapshotStore | None = None
+
+
+def get_snapshot_store() -> SnapshotStore:
+    global _snapshot_store
+    if _snapshot_store is None:
+        _snapshot_store = SnapshotStore(settings.INDEX_SNAPSHOT_DIR)
+    return _snapshot_store
@@ -0,0 +1,655 @@
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from google.cloud.firestore_v1 import FieldFilter
+from google.cloud.firestore_v1.base_vector_query import DistanceMeasure
+from google.cloud.firestore_v1.vector import Vector
+
+from app.config import settings
+from app.core import metrics
+from app.core.bulk_writer import BulkWriter
+from app.core.executor import run_blocking
+from app.core.firestore_client import get_firestore_client
+from app.models.schemas import DELETING
+from app.services.answer_cache import get_corpus_versions
+from app.services.snapshot_store import SnapshotStore, get_snapshot_store
+from app.utils.index_snapshot import IndexSnapshot
+from app.utils.ivf import IVFIndex
+from app.utils.mmr import cosine_similarities
+
+logger = logging.getLogger(__name__)
+
+# Firestore "in" filters accept at most 30 values
+FIRESTORE_IN_LIMIT = 30
+DISTANCE_FIELD = "vector_distance"
+# Everything a search result needs; leaves out the 768-float embedding
+RESULT_FIELDS = ["document_id", "document_name", "content", "chunk_index"]
+
+
+def _get_chunks_ref(user_id: str):
+    db = get_firestore_client()
+    return db.collection("users").document(user_id).collection("chunks")
+
+
+async def live_document_ids(user_id: str) -> set[str]:
+    """Ids of the user's documents that exist and are not being deleted."""
+    docs_ref = get_firestore_client().collection("users").document(user_id).collection("documents")
+    docs = docs_ref.select(["status"]).stream()
+    return {doc.id async for doc in docs if doc.to_dict().get("status") != DELETING}
+
+
+def _to_result(chunk_id: str, chunk_data: dict, with_embedding: bool = False) -> dict:
+    result = {
+        "chunk_id": chunk_id,
+        "document_id": chunk_data["document_id"],
+        "document_name": chunk_data.get("document_name", "Unknown"),
+        "content": chunk_data["content"],
+        "chunk_index": chunk_data.get("chunk_index", 0),
+    }
+    if with_embedding:
+        result["embedding"] = list(chunk_data["embedding"])
+    return result
+
+
+class VectorStore(ABC):
+    """Storage and nearest-neighbour search over a user's embedded chunks.
+
+    Chunks are dicts with ``chunk_id``, ``document_id``, ``document_name``,
+    ``content``, ``chunk_index`` and ``embedding``. Search results carry the
+    same keys minus ``embedding`` (unless ``with_embeddings`` is set), plus
+    the cosine ``distance`` to the query.
+    """
+
+    @abstractmethod
+    async def add_chunks(self, user_id: str, chunks: list[dict]) -> None: ...
+
+    @abstractmethod
+    async def search(
+        self,
+        user_id: str,
+        query_embedding: list[float],
+        top_k: int,
+        document_ids: list[str] | None = None,
+        with_embeddings: bool = False,
+    ) -> list[dict]:
+        """Return the ``top_k`` nearest chunks, restricted to ``document_ids`` if given.
+
+        The restriction is applied inside the search, so up to ``top_k``
+        in-scope chunks come back however small the scope is.
+        """
+
+    @abstractmethod
+    async def delete_document(self, user_id: str, doc_id: str) -> None: ...
+
+    @abstractmethod
+    async def get_chunks(
+        self, user_id: str, chunk_ids: list[str], with_embeddings: bool = False
+    ) -> list[dict]:
+        """Fetch chunks by id, in the order given, without distances."""
+
+    async def save_snapshot(self, user_id: str) -> None:
+        """Persist the user's index for fast cold starts; stores without one do nothing."""
+
+
+class FirestoreVectorStore(VectorStore):
+    """Chunks stored in ``users/{uid}/chunks`` and searched with ``find_nearest``."""
+
+    async def get_chunks(
+        self, user_id: str, chunk_ids: list[str], with_embeddings: bool = False
+    ) -> list[dict]:
+        db = get_firestore_client()
+        chunks_ref = _get_chunks_ref(user_id)
+        found = {}
+        refs = [chunks_ref.document(chunk_id) for chunk_id in chunk_ids]
+        field_paths = [*RESULT_FIELDS, "embedding"] if with_embeddings else RESULT_FIELDS
+        async for doc in db.get_all(refs, field_paths=field_paths):
+            if doc.exists:
+                found[doc.id] = _to_result(doc.id, doc.to_dict(), with_embeddings)
+        return [found[chunk_id] for chunk_id in chunk_ids if chunk_id in found]
+
+    async def add_chunks(self, user_id: str, chunks: list[dict]) -> None:
+        chunks_ref = _get_chunks_ref(user_id)
+        now = datetime.now(timezone.utc)
+        async with BulkWriter() as writer:
+            for chunk in chunks:
+                data = {
+                    "document_id": chunk["document_id"],
+                    "document_name": chunk["document_name"],
+                    "content": chunk["content"],
+                    "embedding": Vector(chunk["embedding"]),
+                    "chunk_index": chunk["chunk_index"],
+                    "created_at": now,
+                }
+                await writer.set(chunks_ref.document(chunk["chunk_id"]), data)
+
+    async def search(
+        self,
+        user_id: str,
+        query_embedding: list[float],
+        top_k: int,
+        document_ids: list[str] | None = None,
+        with_embeddings: bool = False,
+    ) -> list[dict]:
+        if not document_ids:
+            return await self._find_nearest(
+                _get_chunks_ref(user_id), query_embedding, top_k, with_embeddings
+            )
+
+        # Pre-filter inside the vector query (needs the document_id + embedding
+        # composite index). "in" takes at most 30 values, so wider scopes fan
+        # out one query per group and merge by distance.
+        chunks_ref = _get_chunks_ref(user_id)
+        groups = [
+            document_ids[i : i + FIRESTORE_IN_LIMIT]
+            for i in range(0, len(document_ids), FIRESTORE_IN_LIMIT)
+        ]
+        results = await asyncio.gather(
+            *(
+                self._find_nearest(
+                    chunks_ref.where(filter=FieldFilter("document_id", "in", group)),
+                    query_embedding,
+                    top_k,
+                    with_embeddings,
+                )
+                for group in groups
+            )
+        )
+        if len(results) == 1:
+            return results[0]
+        merged = sorted((c for group in results for c in group), key=lambda c: c["distance"])
+        return merged[:top_k]
+
+    async def _find_nearest(
+        self, query, query_embedding: list[float], top_k: int, with_embeddings: bool
+    ) -> list[dict]:
+        vector_query = query.find_nearest(
+            vector_field="embedding",
+            query_vector=Vector(query_embedding),
+            distance_measure=DistanceMeasure.COSINE,
+            limit=top_k,
+            distance_result_field=DISTANCE_FIELD,
+        )
+        results = []
+        async for doc in vector_query.stream():
+            chunk_data = doc.to_dict()
+            results.append(
+                {
+                    **_to_result(doc.id, chunk_data, with_embeddings),
+                    "distance": chunk_data[DISTANCE_FIELD],
+                }
+            )
+        return results
+
+    async def delete_document(self, user_id: str, doc_id: str) -> None:
+        chunks_ref = _get_chunks_ref(user_id)
+        # Only the references are needed; skip loading contents and embeddings
+        query = chunks_ref.where(filter=FieldFilter("document_id", "==", doc_id)).select([])
+        async with BulkWriter() as writer:
+            async for chunk_doc in query.stream():
+                await writer.delete(chunk_doc.reference)
+
+    async def iter_chunks(
+        self,
+        user_id: str,
+        with_embeddings: bool = True,
+        created_after: datetime | None = None,
+    ) -> AsyncIterator[dict]:
+        """Stream every stored chunk for a user, embedding included unless disabled.
+
+        ``created_after`` limits it to chunks written after that time.
+        """
+        query = _get_chunks_ref(user_id)
+        if created_after is not None:
+            query = query.where(filter=FieldFilter("created_at", ">", created_after))
+        query = query.select([*RESULT_FIELDS, "embedding"] if with_embeddings else RESULT_FIELDS)
+        async for doc in query.stream():
+            yield _to_result(doc.id, doc.to_dict(), with_embeddings)
+
+
+# Chunks written up to this long before a snapshot's sync time are re-read on
+# refresh, which absorbs clock skew between instances
+SNAPSHOT_SYNC_SLACK = timedelta(minutes=5)
+
+
+@dataclass
+class _UserIndex:
+    index: IVFIndex
+    rows: dict[int, dict] = field(default_factory=dict)
+    labels_by_document: dict[str, list[int]] = field(default_factory=dict)
+    labels_by_chunk: dict[str, int] = field(default_factory=dict)
+    loaded_at: float = field(default_factory=time.monotonic)
+    # Corpus version and wall-clock time of the last read from the durable store
+    version: int = 0
+    synced_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    # Snapshot the index was loaded from; ``index`` holds the chunks added since
+    base: IndexSnapshot | None = None
+    base_rows: dict[str, int] = field(default_factory=dict)
+    base_deleted: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=bool))
+    # Normalised float32 vectors by label, kept for rescoring when ``index`` is quantized
+    exact: dict[int, np.ndarray] | None = None
+
+    def __len__(self) -> int:
+        return len(self.rows) + len(self.base_rows)
+
+    def attach(self, snapshot: IndexSnapshot) -> None:
+        self.base = snapshot
+        self.base_rows = {chunk_id: i for i, chunk_id in enumerate(snapshot.chunk_ids)}
+        self.base_deleted = np.zeros(len(snapshot), dtype=bool)
+        self.version = snapshot.version
+        self.synced_at = snapshot.synced_at
+
+    @property
+    def document_ids(self) -> set[str]:
+        documents = set(self.labels_by_document)
+        if self.base is not None:
+            documents.update(self.base.document_ids)
+        return documents
+
+    def add(self, chunks: list[dict]) -> None:
+        if not chunks:
+            return
+        vectors = np.asarray([chunk["embedding"] for chunk in chunks], dtype=np.float32)
+        labels = self.index.add_batch(vectors)
+        if self.exact is not None:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self.exact.update(zip(labels, vectors / norms))
+        for label, chunk in zip(labels, chunks):
+            replaced = self.labels_by_chunk.get(chunk["chunk_id"])
+            if replaced is not None:
+                self.index.remove(replaced)
+                if self.exact is not None:
+                    self.exact.pop(replaced, None)
+                row = self.rows.pop(replaced, None)
+                if row is not None:
+                    self.labels_by_document[row["document_id"]].remove(replaced)
+            self._drop_base_row(chunk["chunk_id"])
+            self.labels_by_chunk[chunk["chunk_id"]] = label
+            self.rows[label] = {k: v for k, v in chunk.items() if k != "embedding"}
+            self.labels_by_document.setdefault(chunk["document_id"], []).append(label)
+
+    def remove_document(self, doc_id: str) -> None:
+        for label in self.labels_by_document.pop(doc_id, []):
+            self.index.remove(label)
+            if self.exact is not None:
+                self.exact.pop(label, None)
+            row = self.rows.pop(label, None)
+            if row is not None:
+                self.labels_by_chunk.pop(row["chunk_id"], None)
+        if self.base is not None:
+            for i in self.base.rows_for_documents([doc_id]).tolist():
+                self._drop_base_row(self.base.chunk_ids[i])
+
+    def _drop_base_row(self, chunk_id: str) -> None:
+        i = self.base_rows.pop(chunk_id, None)
+        if i is not None:
+            self.base_deleted[i] = True
+
+    def search(
+        self, query_embedding: list[float], k: int, document_ids: list[str] | None
+    ) -> list[dict]:
+        allowed = None
+        if document_ids:
+            # Per-document label lists act as sub-indexes for the filtered scan
+            allowed = [
+                label
+                for doc_id in document_ids
+                for label in self.labels_by_document.get(doc_id, [])
+            ]
+        hits = self.index.search(query_embedding, k, allowed=allowed)
+        results = [
+            {**self.rows[label], "distance": distance}
+            for label, distance in hits
+            if label in self.rows
+        ]
+        if self.base is not None:
+            rows = self.base.rows_for_documents(document_ids) if document_ids else None
+            base_hits = self.base.search(query_embedding, k, rows=rows, deleted=self.base_deleted)
+            results += [{**self.base.row(i), "distance": distance} for i, distance in base_hits]
+            results.sort(key=lambda r: r["distance"])
+        return results[:k]
+
+    def get(self, chunk_ids: list[str]) -> list[dict]:
+        results = []
+        for chunk_id in chunk_ids:
+            label = self.labels_by_chunk.get(chunk_id)
+            if label is not None and label in self.rows:
+                results.append(dict(self.rows[label]))
+            elif self.base is not None and chunk_id in self.base_rows:
+                results.append(self.base.row(self.base_rows[chunk_id]))
+        return results
+
+    @property
+    def exact_nbytes(self) -> int:
+        return len(self.exact) * self.index.dim * 4 if self.exact is not None else 0
+
+    def _vectors(self, labels: list[int]) -> np.ndarray:
+        if self.exact is None:
+            return self.index.get_vectors(labels)
+        return np.array([self.exact[label] for label in labels], dtype=np.float32)
+
+    def embeddings(self, chunk_ids: list[str]) -> np.ndarray:
+        """Unit-length vectors for ``chunk_ids``, which is all cosine comparisons need.
+
+        Full precision wherever the index keeps exact copies.
+        """
+        vectors = np.zeros((len(chunk_ids), self.index.dim), dtype=np.float32)
+        in_index = [i for i, c in enumerate(chunk_ids) if c in self.labels_by_chunk]
+        in_base = [i for i, c in enumerate(chunk_ids) if c not in self.labels_by_chunk]
+        if in_index:
+            labels = [self.labels_by_chunk[chunk_ids[i]] for i in in_index]
+            vectors[in_index] = self._vectors(labels)
+        if in_base and self.base is not None:
+            base_rows = [self.base_rows[chunk_ids[i]] for i in in_base]
+            vectors[in_base] = self.base.exact_vectors(base_rows)
+        return vectors
+
+    def export(self) -> tuple[list[dict], np.ndarray]:
+        """Every live chunk's metadata and vector, for writing a snapshot."""
+        labels = list(self.rows)
+        rows = [self.rows[label] for label in labels]
+        parts = [self._vectors(labels)] if labels else []
+        if self.base is not None and self.base_rows:
+            base_rows = sorted(self.base_rows.values())
+            rows += [self.base.row(i) for i in base_rows]
+            parts.append(self.base.exact_vectors(base_rows))
+        if not parts:
+            return rows, np.zeros((0, self.index.dim), dtype=np.float32)
+        return rows, np.concatenate(parts)
+
+
+class InMemoryVectorStore(VectorStore):
+    """Per-user in-process IVF indexes in front of a durable store.
+
+    Writes and deletes go to ``durable`` (the source of truth) and are
+    mirrored into the local index of any user already loaded. A user's index
+    is built lazily from ``durable`` on first search. Each search compares
+    it with the user's corpus version (cached for a few seconds), so
+    documents another instance ingested or started deleting are caught up
+    incrementally; once older than ``max_age_seconds`` it is rebuilt from
+    scratch instead.
+
+    With a quantized ``storage`` format the index holds compact vectors and
+    a search takes ``rescore_multiplier`` times ``top_k`` candidates from
+    it, then re-ranks them by exact distance to full-precision copies kept
+    locally: in the snapshot file for chunks loaded from one, in memory for
+    the rest. A multiplier of 1 keeps no copies, skips rescoring and returns
+    approximate distances.
+
+    With ``snapshots``, an index is loaded from the user's memory-mapped
+    snapshot when there is one instead of streaming every chunk. A snapshot
+    stamped with an older corpus version is caught up incrementally: chunks
+    written since it was synced are added and documents that are gone or
+    being deleted are dropped. Snapshots are rewritten after ingestion and
+    whenever a load had to stream or catch up.
+    """
+
+    def __init__(
+        self,
+        durable: FirestoreVectorStore,
+        n_lists: int = 0,
+        n_probe: int = 8,
+        max_age_seconds: float = 3600.0,
+        storage: str = "float32",
+        rescore_multiplier: int = 4,
+        snapshots: SnapshotStore | None = None,
+    ):
+        self.durable = durable
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.max_age_seconds = max_age_seconds
+        self.storage = storage
+        self.rescore_multiplier = rescore_multiplier
+        self.rescore = storage != "float32" and rescore_multiplier > 1
+        self.snapshots = snapshots
+        self._indexes: dict[str, _UserIndex] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def add_chunks(self, user_id: str, chunks: list[dict]) -> None:
+        await self.durable.add_chunks(user_id, chunks)
+        user_index = self._indexes.get(user_id)
+        if user_index is not None:
+            await run_blocking(user_index.add, chunks)
+
+    async def search(
+        self,
+        user_id: str,
+        query_embedding: list[float],
+        top_k: int,
+        document_ids: list[str] | None = None,
+        with_embeddings: bool = False,
+    ) -> list[dict]:
+        user_index = await self._get_index(user_id)
+        fetch_k = top_k * self.rescore_multiplier if self.rescore else top_k
+        results = user_index.search(query_embedding, fetch_k, document_ids)
+        if self.rescore:
+            return self._rescore(user_index, query_embedding, results, top_k, with_embeddings)
+        if with_embeddings:
+            self._attach_embeddings(user_index, results)
+        return results
+
+    def _rescore(
+        self,
+        user_index: _UserIndex,
+        query_embedding: list[float],
+        candidates: list[dict],
+        top_k: int,
+        with_embeddings: bool,
+    ) -> list[dict]:
+        if not candidates:
+            return []
+        start = time.perf_counter()
+        vectors = user_index.embeddings([c["chunk_id"] for c in candidates])
+        similarities = cosine_similarities(query_embedding, vectors)
+        for chunk, vector, similarity in zip(candidates, vectors, similarities.tolist()):
+            chunk["distance"] = 1.0 - similarity
+            if with_embeddings:
+                chunk["embedding"] = vector.tolist()
+        candidates.sort(key=lambda c: c["distance"])
+        metrics.observe("vector_store.rescore_seconds", time.perf_counter() - start)
+        return candidates[:top_k]
+
+    async def get_chunks(
+        self, user_id: str, chunk_ids: list[str], with_embeddings: bool = False
+    ) -> list[dict]:
+        user_index = self._indexes.get(user_id)
+        if user_index is None:
+            return await self.durable.get_chunks(user_id, chunk_ids, with_embeddings)
+        results = user_index.get(chunk_ids)
+        if with_embeddings:
+            self._attach_embeddings(user_index, results)
+        return results
+
+    def _attach_embeddings(self, user_index: _UserIndex, results: list[dict]) -> None:
+        vectors = user_index.embeddings([c["chunk_id"] for c in results])
+        for chunk, vector in zip(results, vectors.tolist()):
+            chunk["embedding"] = vector
+
+    async def delete_document(self, user_id: str, doc_id: str) -> None:
+        await self.durable.delete_document(user_id, doc_id)
+        user_index = self._indexes.get(user_id)
+        if user_index is None:
+            return
+        user_index.remove_document(doc_id)
+        # Tombstones widen every search; rebuild once they outnumber live vectors
+        if user_index.index.deleted_count > len(user_index.index):
+            self._indexes.pop(user_id, None)
+
+    async def save_snapshot(self, user_id: str) -> None:
+        if self.snapshots is None:
+            return
+        if user_id not in self._indexes:
+            # Loading catches up with the corpus and saves a snapshot if it changed anything
+            await self._get_index(user_id)
+            return
+        async with self._locks.setdefault(user_id, asyncio.Lock()):
+            user_index = self._indexes.get(user_id)
+            if user_index is None:
+                return
+            await self._refresh(user_id, user_index)
+        await self._write_snapshot(user_id, user_index)
+
+    async def _get_index(self, user_id: str) -> _UserIndex:
+        user_index = self._indexes.get(user_id)
+        if user_index is not None and not self._is_stale(user_index):
+            if await get_corpus_versions().get(user_id) == user_index.version:
+                return user_index
+
+        lock = self._locks.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            user_index = self._indexes.get(user_id)
+            if user_index is None or self._is_stale(user_index):
+                user_index = await self._build_index(user_id)
+                self._indexes[user_id] = user_index
+            else:
+                await self._refresh(user_id, user_index)
+        return user_index
+
+    def index_stats(self) -> dict:
+        indexes = list(self._indexes.values())
+        return {
+            "users": len(indexes),
+            "vectors": sum(len(i) for i in indexes),
+            "bytes": sum(i.index.nbytes + i.exact_nbytes for i in indexes),
+            "snapshot_bytes": sum(i.base.codes.nbytes for i in indexes if i.base is not None),
+        }
+
+    def _is_stale(self, user_index: _UserIndex) -> bool:
+        return time.monotonic() - user_index.loaded_at > self.max_age_seconds
+
+    def _new_index(self) -> _UserIndex:
+        return _UserIndex(
+            index=IVFIndex(
+                dim=settings.EMBEDDING_DIMENSION,
+                n_lists=self.n_lists,
+                n_probe=self.n_probe,
+                storage=self.storage,
+            ),
+            exact={} if self.rescore else None,
+        )
+
+    async def _build_index(self, user_id: str) -> _UserIndex:
+        start = time.perf_counter()
+        if self.snapshots is not None:
+            user_index = await self._load_snapshot(user_id)
+            if user_index is not None:
+                metrics.observe("vector_store.snapshot_load_seconds", time.perf_counter() - start)
+                logger.info(
+                    f"Loaded vector index for user {user_id} from snapshot: "
+                    f"{len(user_index)} chunks in {time.perf_counter() - start:.2f}s"
+                )
+                return user_index
+
+        user_index = self._new_index()
+        user_index.version = await get_corpus_versions().get(user_id)
+        user_index.synced_at = datetime.now(timezone.utc)
+        chunks = [chunk async for chunk in self.durable.iter_chunks(user_id)]
+        await run_blocking(user_index.add, chunks)
+        logger.info(
+            f"Built vector index for user {user_id}: {len(chunks)} chunks "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+        if self.snapshots is not None:
+            self._save_in_background(user_id, user_index)
+        return user_index
+
+    async def _load_snapshot(self, user_id: str) -> _UserIndex | None:
+        assert self.snapshots is not None
+        snapshot = await self.snapshots.load(user_id)
+        if snapshot is None:
+            return None
+        settings_match = (
+            snapshot.storage == self.storage
+            and snapshot.dim == settings.EMBEDDING_DIMENSION
+            # Rescoring needs the full-precision copies
+            and (snapshot.exact is not None or not self.rescore)
+        )
+        if not settings_match:
+            logger.info(f"Ignoring index snapshot for user {user_id}: built with other settings")
+            return None
+        user_index = self._new_index()
+        user_index.attach(snapshot)
+        if await self._refresh(user_id, user_index):
+            self._save_in_background(user_id, user_index)
+        return user_index
+
+    async def _refresh(self, user_id: str, user_index: _UserIndex) -> bool:
+        """Catch ``user_index`` up to the current corpus version; False if it already was."""
+        version = await get_corpus_versions().get(user_id)
+        if version == user_index.version:
+            return False
+        synced_at = datetime.now(timezone.utc)
+        since = user_index.synced_at - SNAPSHOT_SYNC_SLACK
+        changed = [c async for c in self.durable.iter_chunks(user_id, created_after=since)]
+        live = await live_document_ids(user_id)
+        await run_blocking(user_index.add, changed)
+        for doc_id in user_index.document_ids - live:
+            user_index.remove_document(doc_id)
+        user_index.version = version
+        user_index.synced_at = synced_at
+        metrics.increment("vector_store.snapshot_refreshes")
+        logger.info(
+            f"Caught up vector index for user {user_id} to corpus version {version}: "
+            f"{len(changed)} new chunks"
+        )
+        return True
+
+    def _save_in_background(self, user_id: str, user_index: _UserIndex) -> None:
+        task = asyncio.create_task(self._write_snapshot(user_id, user_index))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _write_snapshot(self, user_id: str, user_index: _UserIndex) -> None:
+        assert self.snapshots is not None
+        # Read before exporting, so later writes only ever make the snapshot look stale
+        version, synced_at = user_index.version, user_index.synced_at
+        try:
+            rows, vectors = await run_blocking(user_index.export)
+            if not rows:
+                return
+            await self.snapshots.save(
+                user_id,
+                version=version,
+                synced_at=synced_at,
+                storage=self.storage,
+                rows=rows,
+                vectors=vectors,
+                exact=self.rescore,
+            )
+        except Exception as e:
+            # Only cold starts get slower without one; the next save tries again
+            logger.warning(f"Could not save index snapshot for user {user_id}: {e}")
+
+
+_vector_store: VectorStore | None = None
+
+
+def get_vector_store() -> VectorStore:
+    global _vector_store
+    if _vector_store is None:
+        backend = settings.VECTOR_STORE_BACKEND
+        durable = FirestoreVectorStore()
+        if backend == "firestore":
+            _vector_store = durable
+        elif backend == "memory":
+            store = InMemoryVectorStore(
+                durable,
+                n_lists=settings.IVF_N_LISTS,
+                n_probe=settings.IVF_N_PROBE,
+                max_age_seconds=settings.VECTOR_INDEX_MAX_AGE_SECONDS,
+                storage=settings.EMBEDDING_STORAGE_FORMAT,
+                rescore_multiplier=settings.VECTOR_RESCORE_MULTIPLIER,
+                snapshots=get_snapshot_store() if settings.INDEX_SNAPSHOTS_ENABLED else None,
+            )
+            metrics.register_collector("vector_index", store.index_stats)
+            _vector_store = store
+        else:
+            raise ValueError(f"Unsupported vector store backend: {backend}")
+    return _vector_store
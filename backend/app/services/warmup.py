@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+
+from app.config import settings
+from app.core import metrics
+from app.core.executor import run_blocking
+from app.core.firestore_client import get_firestore_client
+from app.core.gcs_client import get_bucket
+from app.core.vertex_client import get_embedding_model, get_generation_model
+
+logger = logging.getLogger(__name__)
+
+WarmupStep = Callable[[], Awaitable[None]]
+
+
+async def _warm_firestore() -> None:
+    # A read of a missing document opens the channel and fetches credentials
+    await get_firestore_client().collection("_warmup").document("ping").get()
+
+
+async def _warm_storage() -> None:
+    await run_blocking(lambda: get_bucket().get_blob("_warmup"))
+
+
+async def _warm_embedding_model() -> None:
+    await run_blocking(get_embedding_model)
+
+
+async def _warm_generation_model() -> None:
+    from app.services.generation_service import SYSTEM_PROMPT
+
+    model = await run_blocking(get_generation_model, SYSTEM_PROMPT)
+    await model.count_tokens_async("ping")
+
+
+DEFAULT_STEPS: dict[str, WarmupStep] = {
+    "firestore": _warm_firestore,
+    "storage": _warm_storage,
+    "embedding_model": _warm_embedding_model,
+    "generation_model": _warm_generation_model,
+}
+
+
+class Warmup:
+    """Creates and pings the shared clients and models once at startup.
+
+    The steps run concurrently in a background task, so the server accepts
+    requests (and passes ``/api/health``) straight away while the Vertex SDK
+    is imported and connections are opened. ``/api/ready`` reports ``warm``
+    once every step has finished. A failed or timed-out step is logged and
+    reported but does not hold readiness back: the client is then created
+    lazily by the first request that needs it, as it would be without warmup.
+    """
+
+    def __init__(self, steps: dict[str, WarmupStep] | None = None, timeout: float = 60.0):
+        self._steps = DEFAULT_STEPS if steps is None else steps
+        self._timeout = timeout
+        self._task: asyncio.Task | None = None
+        self.results: dict[str, dict] = {}
+        self.finished = False
+
+    @property
+    def ok(self) -> bool:
+        return self.finished and all(result["ok"] for result in self.results.values())
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def wait(self) -> None:
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    async def _run(self) -> None:
+        start = time.perf_counter()
+        await asyncio.gather(*(self._step(name, step) for name, step in self._steps.items()))
+        elapsed = time.perf_counter() - start
+        metrics.observe("startup.warmup_seconds", elapsed)
+        self.finished = True
+        logger.info(f"Warmup finished in {elapsed:.2f}s: {self.results}")
+
+    async def _step(self, name: str, step: WarmupStep) -> None:
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(step(), self._timeout)
+        except Exception as e:
+            elapsed = time.perf_counter() - start
+            error = str(e) or type(e).__name__
+            self.results[name] = {"ok": False, "seconds": round(elapsed, 3), "error": error}
+            metrics.increment("startup.warmup_failures")
+            logger.warning(f"Warmup step {name} failed after {elapsed:.2f}s: {e!r}")
+            return
+        elapsed = time.perf_counter() - start
+        self.results[name] = {"ok": True, "seconds": round(elapsed, 3)}
+        metrics.observe(f"startup.warmup.{name}_seconds", elapsed)
+
+
+_warmup: Warmup | None = None
+
+
+def get_warmup() -> Warmup:
+    global _warmup
+    if _warmup is None:
+        _warmup = Warmup(timeout=settings.WARMUP_TIMEOUT_SECONDS)
+    return _warmup
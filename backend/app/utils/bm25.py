@@ -0,0 +1,220 @@
+import math
+import re
+import threading
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+
+import numpy as np
+
+# Words, plus identifiers that keep their inner separators: "E-1042", "v2.3.1", "part_no"
+_TOKEN_RE = re.compile(r"\w+(?:[-_.:/]\w+)*")
+_SPLIT_RE = re.compile(r"[-_.:/]")
+_MAX_TF = 65535
+
+
+def tokenize(text: str) -> list[str]:
+    """Case-folded terms; compound identifiers also contribute their parts."""
+    terms = _TOKEN_RE.findall(text.casefold())
+    compounds = [token for token in terms if not token.isalnum()]
+    for token in compounds:
+        terms.extend(part for part in _SPLIT_RE.split(token) if part)
+    return terms
+
+
+@dataclass
+class LexicalHits:
+    """BM25 hits as ``(key, score)`` pairs, best first.
+
+    ``confidence`` is the IDF-weighted share of the query terms that the top
+    hit contains, in ``[0, 1]``. ``exact_matches`` counts entries containing
+    every query token as written. ``all_terms_known`` says whether every
+    query term occurs in the index; ``query_terms`` counts the query's tokens
+    before identifiers are split.
+    """
+
+    hits: list[tuple[str, float]]
+    confidence: float
+    exact_matches: int
+    all_terms_known: bool
+    query_terms: int
+
+
+class BM25Index:
+    """In-memory inverted index with Okapi BM25 scoring.
+
+    Postings are stored per term as two typed arrays (labels as ``uint32``,
+    term frequencies as ``uint16``) that only ever grow at the end, so adding
+    documents is cheap and the index stays compact. Each entry has a string
+    ``key`` and belongs to a ``group`` (the chunk id and document id); adding
+    an existing key replaces it. Removed entries are tombstoned and dropped
+    by ``compact``, which runs automatically once they outnumber live ones.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._term_ids: dict[str, int] = {}
+        self._postings: list[array] = []
+        self._freqs: list[array] = []
+        self._lengths = array("I")
+        self._live = bytearray()
+        self._keys: list[str] = []
+        self._groups: list[str] = []
+        self._label_by_key: dict[str, int] = {}
+        self._labels_by_group: dict[str, list[int]] = {}
+        self._total_length = 0
+        self._deleted = 0
+
+    def __len__(self) -> int:
+        return len(self._keys) - self._deleted
+
+    def add(self, key: str, group: str, text: str) -> None:
+        self.add_batch([(key, group, text)])
+
+    def add_batch(self, entries: list[tuple[str, str, str]]) -> None:
+        """Index ``(key, group, text)`` entries."""
+        tokenized = [(key, group, Counter(tokenize(text))) for key, group, text in entries]
+        with self._lock:
+            # Gather the batch's postings per term first, then extend each array once
+            pending: dict[str, tuple[list[int], list[int]]] = {}
+            for key, group, counts in tokenized:
+                if key in self._label_by_key:
+                    self._remove_label(self._label_by_key[key])
+                label = len(self._keys)
+                self._keys.append(key)
+                self._groups.append(group)
+                self._label_by_key[key] = label
+                self._labels_by_group.setdefault(group, []).append(label)
+                length = sum(counts.values())
+                self._lengths.append(length)
+                self._live.append(1)
+                self._total_length += length
+                for term, tf in counts.items():
+                    postings = pending.get(term)
+                    if postings is None:
+                        postings = pending[term] = ([], [])
+                    postings[0].append(label)
+                    postings[1].append(tf if tf < _MAX_TF else _MAX_TF)
+            for term, (labels, freqs) in pending.items():
+                term_id = self._term_ids.get(term)
+                if term_id is None:
+                    term_id = self._term_ids[term] = len(self._postings)
+                    self._postings.append(array("I"))
+                    self._freqs.append(array("H"))
+                self._postings[term_id].extend(labels)
+                self._freqs[term_id].extend(freqs)
+
+    def groups(self) -> set[str]:
+        with self._lock:
+            return set(self._labels_by_group)
+
+    def remove_group(self, group: str) -> None:
+        with self._lock:
+            for label in self._labels_by_group.pop(group, []):
+                self._remove_label(label)
+            if self._deleted > len(self._keys) - self._deleted:
+                self._compact()
+
+    def search(self, query: str, k: int, groups: list[str] | None = None) -> LexicalHits:
+        """Top ``k`` entries for ``query``, restricted to ``groups`` if given."""
+        tokens = list(dict.fromkeys(_TOKEN_RE.findall(query.casefold())))
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            n = len(self._keys)
+            live_count = n - self._deleted
+            if not terms or not live_count:
+                return LexicalHits([], 0.0, 0, False, len(tokens))
+
+            avg_length = self._total_length / live_count
+            lengths = np.frombuffer(self._lengths, dtype=np.uint32).astype(np.float32)
+            norms = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+            scores = np.zeros(n, dtype=np.float32)
+            idfs: dict[str, float] = {}
+            for term in terms:
+                term_id = self._term_ids.get(term)
+                if term_id is None:
+                    continue
+                labels = np.frombuffer(self._postings[term_id], dtype=np.uint32)
+                df = len(labels)
+                if not df:
+                    continue
+                freqs = np.frombuffer(self._freqs[term_id], dtype=np.uint16).astype(np.float32)
+                idf = math.log(1 + (live_count - df + 0.5) / (df + 0.5))
+                scores[labels] += idf * freqs * (self.k1 + 1) / (freqs + norms[labels])
+                idfs[term] = idf
+
+            mask = np.frombuffer(self._live, dtype=np.uint8).astype(np.float32)
+            if groups is not None:
+                in_groups = np.zeros(n, dtype=np.float32)
+                for group in groups:
+                    in_groups[self._labels_by_group.get(group, [])] = 1.0
+                mask *= in_groups
+            scores *= mask
+
+            candidates = np.flatnonzero(scores > 0)
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+            hits = [(self._keys[label], float(scores[label])) for label in ranked]
+
+            confidence = 0.0
+            if len(ranked) and idfs:
+                top = ranked[0]
+                covered = sum(idf for term, idf in idfs.items() if self._contains(term, top))
+                confidence = covered / sum(idfs.values())
+            exact_matches = self._count_containing_all(tokens, mask)
+
+        return LexicalHits(hits, confidence, exact_matches, len(idfs) == len(terms), len(tokens))
+
+    def compact(self) -> None:
+        with self._lock:
+            self._compact()
+
+    def _contains(self, term: str, label: int) -> bool:
+        labels = np.frombuffer(self._postings[self._term_ids[term]], dtype=np.uint32)
+        return bool(np.any(labels == label))
+
+    def _count_containing_all(self, terms: list[str], mask: np.ndarray) -> int:
+        postings = []
+        for term in terms:
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                return 0
+            postings.append(np.frombuffer(self._postings[term_id], dtype=np.uint32))
+        if not postings:
+            return 0
+        matching = postings[0]
+        for labels in postings[1:]:
+            matching = np.intersect1d(matching, labels)
+        return int(np.count_nonzero(mask[matching]))
+
+    def _remove_label(self, label: int) -> None:
+        if self._live[label]:
+            self._live[label] = 0
+            self._deleted += 1
+            self._total_length -= self._lengths[label]
+            self._label_by_key.pop(self._keys[label], None)
+
+    def _compact(self) -> None:
+        live = np.frombuffer(self._live, dtype=np.uint8).astype(bool)
+        remap = np.full(len(live), -1, dtype=np.int64)
+        remap[live] = np.arange(int(live.sum()))
+        for term_id, postings in enumerate(self._postings):
+            labels = np.frombuffer(postings, dtype=np.uint32)
+            keep = live[labels]
+            self._postings[term_id] = array("I", remap[labels[keep]].astype(np.uint32).tobytes())
+            freqs = np.frombuffer(self._freqs[term_id], dtype=np.uint16)
+            self._freqs[term_id] = array("H", freqs[keep].tobytes())
+        keep_labels = np.flatnonzero(live)
+        self._keys = [self._keys[i] for i in keep_labels]
+        self._groups = [self._groups[i] for i in keep_labels]
+        lengths = np.frombuffer(self._lengths, dtype=np.uint32)[live]
+        self._lengths = array("I", lengths.tobytes())
+        self._live = bytearray(b"\x01" * len(self._keys))
+        self._label_by_key = {key: label for label, key in enumerate(self._keys)}
+        self._labels_by_group = {}
+        for label, group in enumerate(self._groups):
+            self._labels_by_group.setdefault(group, []).append(label)
+        self._deleted = 0
@@ -1,20 +1,106 @@
+import asyncio
+import codecs
+import contextlib
 import io
+import itertools
+import logging
+import multiprocessing
+import os
+import signal
+import tempfile
+from collections import deque
+from collections.abc import AsyncGenerator, Callable, Generator, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Any, TypeVar
 
-import docx
-import fitz
+from app.config import settings
+from app.core.executor import run_blocking
 
+# PyMuPDF and python-docx are imported by the parsers themselves, so only the
+# processes that actually parse a file pay for loading them
+if TYPE_CHECKING:
+    import fitz
 
-def parse_pdf(file_bytes: bytes) -> str:
-    text_parts = []
-    with fitz.open(stream=file_bytes, filetype="pdf") as doc:
+logger = logging.getLogger(__name__)
+
+# A parser source is either the file's bytes or a path to it on local disk
+Source = bytes | str
+T = TypeVar("T")
+
+TEXT_BLOCK_SIZE = 64 * 1024
+DOCX_PARAGRAPHS_PER_SECTION = 50
+
+
+class DocumentParseError(ValueError):
+    """The document is unreadable or exceeds the parser's page or time limits."""
+
+
+def _open_pdf(source: Source) -> "fitz.Document":
+    import fitz
+
+    try:
+        if isinstance(source, bytes):
+            return fitz.open(stream=source, filetype="pdf")
+        return fitz.open(source, filetype="pdf")
+    except Exception as e:
+        raise DocumentParseError(f"Could not open PDF: {e}") from e
+
+
+def pdf_page_count(source: Source) -> int:
+    with _open_pdf(source) as doc:
+        return int(doc.page_count)
+
+
+def _extract_pdf_pages(source: Source, start: int, end: int) -> list[str]:
+    # Runs in parser worker processes, so it must stay a picklable module-level function
+    with _open_pdf(source) as doc:
+        return [doc[i].get_text() for i in range(start, end)]
+
+
+def iter_pdf_pages(source: Source) -> Iterator[str]:
+    with _open_pdf(source) as doc:
         for page in doc:
-            text_parts.append(page.get_text())
-    return "\n".join(text_parts)
+            yield page.get_text()
+
+
+def _docx_sections(source: Source) -> list[str]:
+    # Runs in a parser process; python-docx reads the whole file up front anyway
+    return list(iter_docx_sections(source))
+
+
+def iter_docx_sections(source: Source) -> Iterator[str]:
+    import docx
+
+    doc = docx.Document(io.BytesIO(source) if isinstance(source, bytes) else source)
+    section: list[str] = []
+    for paragraph in doc.paragraphs:
+        if paragraph.text.strip():
+            section.append(paragraph.text)
+        if len(section) >= DOCX_PARAGRAPHS_PER_SECTION:
+            yield "\n".join(section)
+            section = []
+    if section:
+        yield "\n".join(section)
+
+
+def iter_text_sections(source: Source) -> Generator[str, None, None]:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    stream = io.BytesIO(source) if isinstance(source, bytes) else open(source, "rb")
+    with stream:
+        while block := stream.read(TEXT_BLOCK_SIZE):
+            if text := decoder.decode(block):
+                yield text
+    if tail := decoder.decode(b"", final=True):
+        yield tail
+
+
+def parse_pdf(file_bytes: bytes) -> str:
+    return "\n".join(iter_pdf_pages(file_bytes))
 
 
 def parse_docx(file_bytes: bytes) -> str:
-    doc = docx.Document(io.BytesIO(file_bytes))
-    return "\n".join(paragraph.text for paragraph in doc.paragraphs if paragraph.text.strip())
+    return "\n".join(iter_docx_sections(file_bytes))
 
 
 def parse_text(file_bytes: bytes) -> str:
@@ -28,6 +114,13 @@ PARSERS = {
     "text/markdown": parse_text,
 }
 
+STREAMING_PARSERS: dict[str, Callable[[Source], Iterator[str]]] = {
+    "application/pdf": iter_pdf_pages,
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": (iter_docx_sections),
+    "text/plain": iter_text_sections,
+    "text/markdown": iter_text_sections,
+}
+
 EXTENSION_TO_CONTENT_TYPE = {
     ".pdf": "application/pdf",
     ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
@@ -43,3 +136,197 @@ def parse_document(file_bytes: bytes, content_type: str) -> str:
     if parser is None:
         raise ValueError(f"Unsupported content type: {content_type}")
     return parser(file_bytes)
+
+
+class _ParserProcess:
+    """One spawned parser process, used by a single document at a time.
+
+    A one-worker ``ProcessPoolExecutor`` whose pid is read when it starts,
+    so a parse stuck past the time limit can be killed without reaching
+    into the executor's internals.
+    """
+
+    def __init__(self) -> None:
+        self._pool = ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        )
+        self.pid: int = self._pool.submit(os.getpid).result()
+        self._futures: list[Future] = []
+
+    def run(self, fn: Callable[..., T], *args: Any) -> "asyncio.Future[T]":
+        future = self._pool.submit(fn, *args)
+        self._futures.append(future)
+        return asyncio.wrap_future(future)
+
+    @property
+    def reusable(self) -> bool:
+        """Nothing is still running, and the process did not die under a task."""
+        return all(
+            f.done() and (f.cancelled() or not isinstance(f.exception(), BrokenProcessPool))
+            for f in self._futures
+        )
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False)
+
+    def kill(self) -> None:
+        # A running task cannot be cancelled, so the process itself is terminated
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        with contextlib.suppress(ProcessLookupError):
+            os.kill(self.pid, signal.SIGTERM)
+
+
+# Warm parser processes no document has checked out, at most ``PARSER_WORKERS``
+_idle_parsers: list[_ParserProcess] = []
+
+
+async def _checkout_parsers(count: int) -> list[_ParserProcess]:
+    parsers = [_idle_parsers.pop() for _ in range(min(count, len(_idle_parsers)))]
+    try:
+        # Only spawned when none are idle; starting an interpreter blocks, so off the loop
+        for _ in range(count - len(parsers)):
+            parsers.append(await run_blocking(_ParserProcess))
+    except BaseException:
+        _release_parsers(parsers)
+        raise
+    return parsers
+
+
+def _release_parsers(parsers: list[_ParserProcess]) -> None:
+    """Keep finished parsers warm for the next document; kill any still busy."""
+    for parser in parsers:
+        if not parser.reusable:
+            parser.kill()
+        elif len(_idle_parsers) < settings.PARSER_WORKERS:
+            parser._futures.clear()
+            _idle_parsers.append(parser)
+        else:
+            parser.close()
+
+
+def shutdown_parsers() -> None:
+    while _idle_parsers:
+        _idle_parsers.pop().close()
+
+
+async def _within(awaitable, deadline: float):
+    remaining = deadline - asyncio.get_running_loop().time()
+    try:
+        return await asyncio.wait_for(awaitable, max(remaining, 0))
+    except TimeoutError:
+        raise DocumentParseError(
+            f"Parsing exceeded {settings.PARSER_TIMEOUT_SECONDS}s time limit"
+        ) from None
+
+
+async def stream_document(source: Source, content_type: str) -> AsyncGenerator[str, None]:
+    """Yield a document's text page by page (PDF) or section by section.
+
+    PDFs and Word files are parsed in worker processes checked out by this
+    call and returned warm when it is done, so a pathological file that hits
+    the time limit is killed without touching other documents' parsers; a
+    fresh process replaces it on demand. PDFs with more than
+    ``PARSER_PAGES_PER_TASK`` pages are split into page ranges parsed in
+    parallel, yielded in page order. PDFs over ``PARSER_MAX_PAGES`` pages
+    and documents that take longer than ``PARSER_TIMEOUT_SECONDS`` in total
+    raise ``DocumentParseError``.
+    """
+    if content_type not in STREAMING_PARSERS:
+        raise ValueError(f"Unsupported content type: {content_type}")
+    deadline = asyncio.get_running_loop().time() + settings.PARSER_TIMEOUT_SECONDS
+
+    if content_type.startswith("text/"):
+        # Closed explicitly, so an abandoned stream releases its file right away
+        async with contextlib.aclosing(_stream_text(source, deadline)) as sections:
+            async for section in sections:
+                yield section
+        return
+
+    parsers = await _checkout_parsers(1)
+    try:
+        if content_type == "application/pdf":
+            async with contextlib.aclosing(_stream_pdf(source, parsers, deadline)) as pages:
+                async for page in pages:
+                    yield page
+        else:
+            for section in await _within(parsers[0].run(_docx_sections, source), deadline):
+                yield section
+    finally:
+        # Nothing parsing this document outlives it, whether it finished, failed or timed out
+        _release_parsers(parsers)
+
+
+async def _stream_text(source: Source, deadline: float) -> AsyncGenerator[str, None]:
+    # Decoding fixed-size blocks cannot stall, so plain text stays in-process
+    sections = iter_text_sections(source)
+    step: asyncio.Future[str | None] | None = None
+    try:
+        while True:
+            step = asyncio.ensure_future(run_blocking(next, sections, None))
+            # Shielded: a timeout must not leave the generator running with no one to close it
+            section = await _within(asyncio.shield(step), deadline)
+            if section is None:
+                return
+            yield section
+    finally:
+        # Closing releases the file; if a block is still being read, once that returns
+        if step is None or step.done():
+            sections.close()
+        else:
+            step.add_done_callback(lambda _: sections.close())
+
+
+async def _stream_pdf(
+    source: Source, parsers: list[_ParserProcess], deadline: float
+) -> AsyncGenerator[str, None]:
+    page_count = await _within(parsers[0].run(pdf_page_count, source), deadline)
+    if page_count > settings.PARSER_MAX_PAGES:
+        raise DocumentParseError(
+            f"PDF has {page_count} pages; the limit is {settings.PARSER_MAX_PAGES}"
+        )
+
+    pages_per_task = settings.PARSER_PAGES_PER_TASK
+    if page_count <= pages_per_task:
+        for page in await _within(
+            parsers[0].run(_extract_pdf_pages, source, 0, page_count), deadline
+        ):
+            yield page
+        return
+    # Appended in place, so the caller releases these too
+    range_count = -(-page_count // pages_per_task)
+    parsers += await _checkout_parsers(min(settings.PARSER_WORKERS, range_count) - 1)
+
+    # Workers re-open the file per range; a path avoids pickling the bytes each time
+    temp_path = None
+    if isinstance(source, bytes):
+        fd, temp_path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as f:
+            f.write(source)
+        source = temp_path
+
+    ranges = iter(
+        (start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    )
+    workers = itertools.cycle(parsers)
+    pending: deque[asyncio.Future[list[str]]] = deque()
+
+    def submit() -> None:
+        page_range = next(ranges, None)
+        if page_range is not None:
+            pending.append(next(workers).run(_extract_pdf_pages, source, *page_range))
+
+    try:
+        # Keep a bounded number of ranges in flight so parsed pages don't pile up
+        for _ in range(len(parsers) * 2):
+            submit()
+        while pending:
+            pages = await _within(pending.popleft(), deadline)
+            submit()
+            for page in pages:
+                yield page
+    finally:
+        for future in pending:
+            future.cancel()
+        if temp_path is not None:
+            os.unlink(temp_path)
@@ -0,0 +1,229 @@
+import contextlib
+import json
+import mmap
+import os
+import tempfile
+from datetime import datetime
+
+import numpy as np
+
+from app.utils.quantization import FORMATS, dequantize, quantize
+
+MAGIC = b"RAGIDX01"
+_ALIGN = 64
+# Rows decoded per step when scanning int8/float16 codes, bounding the float32 copy
+_SCAN_BLOCK = 8192
+
+
+class SnapshotFormatError(ValueError):
+    pass
+
+
+def _padded(size: int) -> int:
+    return -size % _ALIGN
+
+
+def write_snapshot(
+    path: str,
+    *,
+    version: int,
+    synced_at: datetime,
+    storage: str,
+    rows: list[dict],
+    vectors: np.ndarray,
+    exact: bool = False,
+) -> None:
+    """Write ``rows`` (chunk metadata with ``chunk_id`` and ``document_id``) and
+    their ``vectors`` to ``path`` as one snapshot file, replacing it atomically.
+
+    Layout: magic, a length-prefixed JSON header, then 64-byte aligned
+    sections: per-row document index (int32), metadata offsets (uint64),
+    scales (float32), the ``storage``-format code matrix and the JSON-encoded
+    rows. Vectors are L2-normalised before they are quantized. With
+    ``exact`` and a quantized ``storage``, a float32 copy of the normalised
+    vectors follows, for rescoring.
+    """
+    if storage not in FORMATS:
+        raise ValueError(f"Unsupported storage format: {storage}")
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim != 2 or len(vectors) != len(rows):
+        raise ValueError("vectors must be a matrix with one row per chunk")
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    codes, scales = quantize(vectors / norms, storage)
+
+    document_ids = sorted({row["document_id"] for row in rows})
+    position = {doc_id: i for i, doc_id in enumerate(document_ids)}
+    encoded = [json.dumps(row, separators=(",", ":")).encode() for row in rows]
+    offsets = np.zeros(len(rows) + 1, dtype="<u8")
+    offsets[1:] = np.cumsum([len(e) for e in encoded], dtype=np.uint64)
+
+    sections = [
+        ("doc_index", np.array([position[r["document_id"]] for r in rows], dtype="<i4").tobytes()),
+        ("offsets", offsets.tobytes()),
+        ("scales", scales.astype("<f4").tobytes()),
+        ("codes", codes.astype(codes.dtype.newbyteorder("<")).tobytes()),
+        ("rows", b"".join(encoded)),
+    ]
+    if exact and storage != "float32":
+        sections.append(("exact", (vectors / norms).astype("<f4").tobytes()))
+    layout = {}
+    cursor = 0
+    for name, data in sections:
+        layout[name] = cursor
+        cursor += len(data) + _padded(len(data))
+    header = json.dumps(
+        {
+            "version": version,
+            "synced_at": synced_at.isoformat(),
+            "storage": storage,
+            "dim": vectors.shape[1],
+            "count": len(rows),
+            "chunk_ids": [row["chunk_id"] for row in rows],
+            "document_ids": document_ids,
+            "sections": layout,
+        }
+    ).encode()
+
+    # Written beside the target and renamed, so readers never map a partial file
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            prefix = MAGIC + len(header).to_bytes(4, "little") + header
+            f.write(prefix + b"\0" * _padded(len(prefix)))
+            for _, data in sections:
+                f.write(data + b"\0" * _padded(len(data)))
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(temp_path)
+        raise
+
+
+class IndexSnapshot:
+    """A user's chunk index loaded from a snapshot file with ``mmap``.
+
+    Nothing is copied on open: the arrays are NumPy views over the mapping,
+    so pages are read from disk as searches touch them. Row metadata is
+    decoded only for the rows returned. ``version`` and ``synced_at`` say
+    which corpus version the file reflects and when it was read from the
+    durable store.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < len(MAGIC) + 4:
+                raise SnapshotFormatError(f"Truncated index snapshot: {path}")
+            # The mapping outlives the file handle and is released with the last array view
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._parse(path)
+
+    def _parse(self, path: str) -> None:
+        buffer = self._mmap
+        if buffer[: len(MAGIC)] != MAGIC:
+            raise SnapshotFormatError(f"Not an index snapshot: {path}")
+        header_end = len(MAGIC) + 4 + int.from_bytes(buffer[len(MAGIC) : len(MAGIC) + 4], "little")
+        try:
+            header = json.loads(buffer[len(MAGIC) + 4 : header_end])
+            self.version: int = header["version"]
+            self.synced_at = datetime.fromisoformat(header["synced_at"])
+            self.storage: str = header["storage"]
+            self.dim: int = header["dim"]
+            self.chunk_ids: list[str] = header["chunk_ids"]
+            self.document_ids: list[str] = header["document_ids"]
+            sections = header["sections"]
+        except (KeyError, TypeError, ValueError) as e:
+            raise SnapshotFormatError(f"Corrupt index snapshot header: {path}") from e
+        if self.storage not in FORMATS:
+            raise SnapshotFormatError(f"Unsupported snapshot storage: {self.storage}")
+
+        count = header["count"]
+        base = header_end + _padded(header_end)
+
+        def view(name: str, dtype, length: int) -> np.ndarray:
+            return np.frombuffer(buffer, dtype=dtype, count=length, offset=base + sections[name])
+
+        try:
+            self.doc_index = view("doc_index", "<i4", count)
+            self._offsets = view("offsets", "<u8", count + 1)
+            self.scales = view("scales", "<f4", count)
+            codes_dtype = np.dtype(self.storage).newbyteorder("<")
+            self.codes = view("codes", codes_dtype, count * self.dim).reshape(count, self.dim)
+            self.exact: np.ndarray | None = None
+            if "exact" in sections:
+                self.exact = view("exact", "<f4", count * self.dim).reshape(count, self.dim)
+        except ValueError as e:
+            raise SnapshotFormatError(f"Truncated index snapshot: {path}") from e
+        self._rows_offset = base + sections["rows"]
+        self._document_position = {doc_id: i for i, doc_id in enumerate(self.document_ids)}
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    def row(self, i: int) -> dict:
+        start = self._rows_offset + int(self._offsets[i])
+        end = self._rows_offset + int(self._offsets[i + 1])
+        row: dict = json.loads(self._mmap[start:end])
+        return row
+
+    def rows_for_documents(self, document_ids: list[str]) -> np.ndarray:
+        positions = [
+            self._document_position[d] for d in document_ids if d in self._document_position
+        ]
+        rows: np.ndarray = np.flatnonzero(np.isin(self.doc_index, positions))
+        return rows
+
+    def vectors(self, rows: list[int] | np.ndarray) -> np.ndarray:
+        """Stored (normalised, dequantized) vectors for ``rows``."""
+        rows = np.asarray(rows, dtype=np.int64)
+        return dequantize(self.codes[rows], self.scales[rows])
+
+    def exact_vectors(self, rows: list[int] | np.ndarray) -> np.ndarray:
+        """Full-precision normalised vectors for ``rows`` when the file has them."""
+        if self.exact is None:
+            return self.vectors(rows)
+        exact: np.ndarray = self.exact[np.asarray(rows, dtype=np.int64)]
+        return exact
+
+    def search(
+        self,
+        query: list[float] | np.ndarray,
+        k: int,
+        rows: np.ndarray | None = None,
+        deleted: np.ndarray | None = None,
+    ) -> list[tuple[int, float]]:
+        """Exact scan returning up to ``k`` ``(row, cosine_distance)`` pairs, nearest first.
+
+        ``rows`` restricts the scan; rows flagged in the boolean ``deleted``
+        mask are skipped.
+        """
+        q = np.asarray(query, dtype=np.float32)
+        norm = float(np.linalg.norm(q))
+        q = q / norm if norm else q
+        if rows is None:
+            scope = np.arange(len(self), dtype=np.int64)
+            scores = self._scan(q)
+        else:
+            scope = rows
+            scores = self.vectors(scope) @ q
+        if deleted is not None and len(scope):
+            live = ~deleted[scope]
+            scope, scores = scope[live], scores[live]
+        want = min(k, len(scores))
+        if want <= 0:
+            return []
+        top = np.argpartition(-scores, want - 1)[:want]
+        top = top[np.argsort(-scores[top])]
+        return [(int(scope[i]), float(1.0 - scores[i])) for i in top]
+
+    def _scan(self, q: np.ndarray) -> np.ndarray:
+        if self.storage == "float32":
+            # Straight off the mapped pages, no copy
+            scores: np.ndarray = self.codes @ q
+            return scores
+        scores = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), _SCAN_BLOCK):
+            block = slice(start, start + _SCAN_BLOCK)
+            scores[block] = dequantize(self.codes[block], self.scales[block]) @ q
+        return scores
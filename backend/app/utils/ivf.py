@@ -0,0 +1,278 @@
+import threading
+
+import numpy as np
+
+from app.utils.quantization import FORMATS, dequantize, quantize
+
+
+class IVFIndex:
+    """In-memory inverted-file (IVF) index for cosine search.
+
+    Vectors are L2-normalised on insert, so cosine distance is ``1 - dot``.
+    Once ``min_train_size`` vectors are present they are clustered with
+    spherical k-means into ``n_lists`` cells (``sqrt(n)`` when 0), and a query
+    scans only the ``n_probe`` cells whose centroids are closest. Raising
+    ``n_probe`` improves recall at the cost of latency; below
+    ``min_train_size`` every search is exact. The index retrains itself when
+    it has grown to ``retrain_factor`` times the size it was trained on.
+
+    ``storage`` sets how vectors are held: ``float32``, ``float16`` (half
+    the memory) or ``int8`` with a per-vector scale (a quarter). Distances
+    from a quantized index are approximate; see ``InMemoryVectorStore`` for
+    exact rescoring of the top candidates.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        n_lists: int = 0,
+        n_probe: int = 8,
+        min_train_size: int = 1024,
+        retrain_factor: float = 4.0,
+        seed: int = 0,
+        storage: str = "float32",
+    ):
+        if storage not in FORMATS:
+            raise ValueError(f"Unsupported storage format: {storage}")
+        self.dim = dim
+        self.storage = storage
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.min_train_size = min_train_size
+        self.retrain_factor = retrain_factor
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+        self._count = 0
+        self._trained_size = 0
+        self._deleted: set[int] = set()
+        # Tombstoned labels dropped for good by retraining
+        self._dropped = 0
+        self._centroids = np.zeros((1, dim), dtype=np.float32)
+        self._list_vectors = [np.zeros((16, dim), dtype=storage)]
+        self._list_scales = [np.ones(16, dtype=np.float32)]
+        self._list_labels = [np.zeros(16, dtype=np.int64)]
+        self._list_sizes = [0]
+        # Where each label currently lives (cell -1 once dropped), for exact scans
+        self._label_cell = np.zeros(16, dtype=np.int64)
+        self._label_pos = np.zeros(16, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return self._count - self._dropped - len(self._deleted)
+
+    @property
+    def deleted_count(self) -> int:
+        return len(self._deleted)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by stored vectors, scales and labels, including spare capacity."""
+        arrays = [*self._list_vectors, *self._list_scales, *self._list_labels]
+        return sum(a.nbytes for a in arrays) + self._centroids.nbytes
+
+    def add(self, vector: list[float] | np.ndarray) -> int:
+        """Insert a vector and return its integer label."""
+        return self.add_batch(np.asarray(vector, dtype=np.float32)[None, :])[0]
+
+    def add_batch(self, vectors: list[list[float]] | np.ndarray) -> list[int]:
+        """Insert vectors and return their labels in input order."""
+        matrix = self._normalize(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim))
+        with self._lock:
+            labels = np.arange(self._count, self._count + len(matrix), dtype=np.int64)
+            self._count += len(matrix)
+            if self._count > len(self._label_cell):
+                capacity = max(self._count, len(self._label_cell) * 2)
+                self._label_cell = np.resize(self._label_cell, capacity)
+                self._label_pos = np.resize(self._label_pos, capacity)
+            self._assign(matrix, labels)
+            if self._needs_training():
+                self._train()
+        return [int(label) for label in labels]
+
+    def get_vectors(self, labels: list[int]) -> np.ndarray:
+        """Stored (normalised, dequantized) vectors for ``labels``, one row per label."""
+        with self._lock:
+            return self._gather(np.asarray(labels, dtype=np.int64))
+
+    def remove(self, label: int) -> None:
+        """Tombstone a label so it is never returned."""
+        with self._lock:
+            if 0 <= label < self._count and self._label_cell[label] >= 0:
+                self._deleted.add(label)
+
+    def search(
+        self,
+        vector: list[float] | np.ndarray,
+        k: int,
+        n_probe: int | None = None,
+        allowed: list[int] | np.ndarray | None = None,
+    ) -> list[tuple[int, float]]:
+        """Return up to ``k`` ``(label, cosine_distance)`` pairs, nearest first.
+
+        ``allowed`` restricts results to those labels. An allowed set no larger
+        than a normal probe is scored exactly; a larger one is probed cell by
+        cell in centroid order, widening the probe until ``k`` allowed vectors
+        have been seen.
+        """
+        query = self._normalize(np.asarray(vector, dtype=np.float32).reshape(1, self.dim))[0]
+        with self._lock:
+            deleted = self._deleted.copy()
+            if allowed is not None:
+                scope = np.asarray(allowed, dtype=np.int64)
+                scope = scope[(scope >= 0) & (scope < self._count)]
+                # Labels dropped by retraining no longer have a cell to gather from
+                scope = scope[self._label_cell[scope] >= 0]
+                if deleted:
+                    scope = scope[~np.isin(scope, list(deleted))]
+                if len(scope) <= self._exact_scan_limit(k):
+                    return self._top_k(self._gather(scope) @ query, scope, k, deleted)
+                allowed = scope
+
+            order = np.argsort(-(self._centroids @ query))
+            probe = min(n_probe or self.n_probe, len(order))
+            scanned = 0
+            found = 0
+            scores_parts = []
+            labels_parts = []
+            while True:
+                for cell in order[scanned:probe].tolist():
+                    size = self._list_sizes[cell]
+                    labels = self._list_labels[cell][:size]
+                    vectors = self._list_vectors[cell][:size]
+                    scales = self._list_scales[cell][:size]
+                    if allowed is not None:
+                        mask = np.isin(labels, allowed)
+                        labels, vectors, scales = labels[mask], vectors[mask], scales[mask]
+                    if len(labels):
+                        scores_parts.append(self._scores(vectors, scales, query))
+                        labels_parts.append(labels)
+                        found += len(labels)
+                scanned = probe
+                if allowed is None or found >= k or probe == len(order):
+                    break
+                probe = min(probe * 2, len(order))
+
+        if not scores_parts:
+            return []
+        return self._top_k(np.concatenate(scores_parts), np.concatenate(labels_parts), k, deleted)
+
+    def _exact_scan_limit(self, k: int) -> int:
+        # Rows a normal probe would score; scanning fewer allowed rows is cheaper
+        return max(k, self.n_probe * self._count // len(self._centroids))
+
+    def _scores(self, vectors: np.ndarray, scales: np.ndarray, query: np.ndarray) -> np.ndarray:
+        if self.storage == "float32":
+            scores: np.ndarray = vectors @ query
+            return scores
+        # Decode in float32 (numpy has no BLAS path for int8/float16), then undo the scaling
+        scores = vectors.astype(np.float32) @ query
+        if self.storage == "int8":
+            scores *= scales
+        return scores
+
+    def _gather(self, labels: np.ndarray) -> np.ndarray:
+        cells = self._label_cell[labels]
+        positions = self._label_pos[labels]
+        vectors = np.empty((len(labels), self.dim), dtype=np.float32)
+        for cell in np.unique(cells).tolist():
+            members = cells == cell
+            rows = positions[members]
+            vectors[members] = dequantize(
+                self._list_vectors[cell][rows], self._list_scales[cell][rows]
+            )
+        return vectors
+
+    def _top_k(
+        self, scores: np.ndarray, labels: np.ndarray, k: int, deleted: set[int]
+    ) -> list[tuple[int, float]]:
+        want = min(k + len(deleted), len(scores))
+        if want == 0:
+            return []
+        top = np.argpartition(-scores, want - 1)[:want]
+        top = top[np.argsort(-scores[top])]
+        results = [
+            (int(labels[i]), float(1.0 - scores[i])) for i in top if int(labels[i]) not in deleted
+        ]
+        return results[:k]
+
+    def _normalize(self, matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        normalized: np.ndarray = matrix / norms
+        return normalized
+
+    def _assign(self, matrix: np.ndarray, labels: np.ndarray) -> None:
+        if len(self._centroids) == 1:
+            cells = np.zeros(len(matrix), dtype=np.int64)
+        else:
+            cells = np.argmax(matrix @ self._centroids.T, axis=1)
+        for cell in np.unique(cells).tolist():
+            members = cells == cell
+            self._append(cell, matrix[members], labels[members])
+
+    def _append(self, cell: int, vectors: np.ndarray, labels: np.ndarray) -> None:
+        size = self._list_sizes[cell]
+        needed = size + len(vectors)
+        capacity = len(self._list_labels[cell])
+        if needed > capacity:
+            capacity = max(needed, capacity * 2)
+            grown_vectors = np.zeros((capacity, self.dim), dtype=self.storage)
+            grown_vectors[:size] = self._list_vectors[cell][:size]
+            grown_scales = np.ones(capacity, dtype=np.float32)
+            grown_scales[:size] = self._list_scales[cell][:size]
+            grown_labels = np.zeros(capacity, dtype=np.int64)
+            grown_labels[:size] = self._list_labels[cell][:size]
+            self._list_vectors[cell] = grown_vectors
+            self._list_scales[cell] = grown_scales
+            self._list_labels[cell] = grown_labels
+        codes, scales = quantize(vectors, self.storage)
+        self._list_vectors[cell][size:needed] = codes
+        self._list_scales[cell][size:needed] = scales
+        self._list_labels[cell][size:needed] = labels
+        self._list_sizes[cell] = needed
+        self._label_cell[labels] = cell
+        self._label_pos[labels] = np.arange(size, needed)
+
+    def _needs_training(self) -> bool:
+        live = len(self)
+        if live < self.min_train_size:
+            return False
+        return self._trained_size == 0 or live > self._trained_size * self.retrain_factor
+
+    def _train(self) -> None:
+        # Re-quantizing decoded vectors reproduces the same codes, so retraining is lossless
+        vectors = np.concatenate(
+            [
+                dequantize(v[:size], scales[:size])
+                for v, scales, size in zip(self._list_vectors, self._list_scales, self._list_sizes)
+            ]
+        )
+        labels = np.concatenate(
+            [ids[:size] for ids, size in zip(self._list_labels, self._list_sizes)]
+        )
+        if self._deleted:
+            live = ~np.isin(labels, np.fromiter(self._deleted, dtype=np.int64))
+            self._label_cell[labels[~live]] = -1
+            self._dropped += int((~live).sum())
+            vectors, labels = vectors[live], labels[live]
+            self._deleted.clear()
+
+        n_lists = self.n_lists or int(np.sqrt(len(vectors)))
+        self._centroids = self._kmeans(vectors, max(1, min(n_lists, len(vectors))))
+        self._list_vectors = [np.zeros((16, self.dim), dtype=self.storage) for _ in self._centroids]
+        self._list_scales = [np.ones(16, dtype=np.float32) for _ in self._centroids]
+        self._list_labels = [np.zeros(16, dtype=np.int64) for _ in self._centroids]
+        self._list_sizes = [0] * len(self._centroids)
+        self._assign(vectors, labels)
+        self._trained_size = len(vectors)
+
+    def _kmeans(self, vectors: np.ndarray, k: int, iterations: int = 10) -> np.ndarray:
+        centroids = vectors[self._rng.choice(len(vectors), k, replace=False)].copy()
+        for _ in range(iterations):
+            cells = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, cells, vectors)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            filled = norms[:, 0] > 0
+            centroids[filled] = sums[filled] / norms[filled]
+        return centroids
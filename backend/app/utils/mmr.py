@@ -0,0 +1,56 @@
+import numpy as np
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    normalized: np.ndarray = matrix / norms
+    return normalized
+
+
+def cosine_similarities(
+    query: list[float] | np.ndarray, vectors: list[list[float]] | np.ndarray
+) -> np.ndarray:
+    """Cosine similarity of ``query`` to each row of ``vectors``."""
+    matrix = _normalize(np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1))
+    q = _normalize(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+    similarities: np.ndarray = matrix @ q
+    return similarities
+
+
+def mmr_select(
+    query: list[float] | np.ndarray,
+    candidates: list[list[float]],
+    k: int,
+    lambda_mult: float = 0.7,
+    relevance: list[float] | np.ndarray | None = None,
+) -> list[int]:
+    """Pick up to ``k`` candidate indexes by maximal marginal relevance.
+
+    Each step takes the candidate maximising ``lambda_mult * relevance -
+    (1 - lambda_mult) * max cosine similarity to those already picked``, so
+    near-duplicates of a chosen candidate fall back. ``relevance`` defaults
+    to cosine similarity to ``query``; ``lambda_mult=1`` keeps relevance order.
+    """
+    n = len(candidates)
+    if n == 0 or k <= 0:
+        return []
+    matrix = _normalize(np.asarray(candidates, dtype=np.float32).reshape(n, -1))
+    if relevance is None:
+        relevance = cosine_similarities(query, candidates)
+    gain = lambda_mult * np.asarray(relevance, dtype=np.float32)
+    similarity = matrix @ matrix.T
+
+    first = int(np.argmax(gain))
+    selected = [first]
+    redundancy = similarity[first].copy()
+    available = np.ones(n, dtype=bool)
+    available[first] = False
+    while len(selected) < min(k, n):
+        scores = gain - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return selected
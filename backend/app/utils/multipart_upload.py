@@ -0,0 +1,101 @@
+from collections.abc import AsyncIterator
+
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, parse_options_header
+
+
+class MultipartError(ValueError):
+    """The request body is not a well-formed multipart/form-data upload."""
+
+
+class MultipartFileReader:
+    """The ``field`` file part of a multipart/form-data body, read as it arrives.
+
+    Parts are parsed straight off ``chunks`` (the raw request body), so
+    nothing is spooled: ``read`` pulls only as much of the body as it needs
+    to return ``size`` bytes of file data, and a caller that stops reading
+    stops receiving. Other parts are skipped without being kept.
+    """
+
+    def __init__(self, content_type: str, chunks: AsyncIterator[bytes], field: str = "file"):
+        media_type, options = parse_options_header(content_type)
+        boundary = options.get(b"boundary")
+        if media_type != b"multipart/form-data" or not boundary:
+            raise MultipartError("Expected a multipart/form-data body")
+        self.filename: str | None = None
+        self._chunks = chunks
+        self._field = field.encode()
+        self._buffer = bytearray()
+        self._headers: dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._in_file = False
+        self._file_done = False
+        self._body_done = False
+        self._parser = MultipartParser(
+            boundary,
+            callbacks={
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+                "on_end": self._on_end,
+            },
+        )
+
+    async def open(self) -> str | None:
+        """Read up to the file part's headers; its filename, or None if there is no file."""
+        while self.filename is None and not self._body_done and await self._feed():
+            pass
+        return self.filename
+
+    async def read(self, size: int = -1) -> bytes:
+        while not self._file_done and (size < 0 or len(self._buffer) < size):
+            if not await self._feed():
+                raise MultipartError("Upload ended before the file was complete")
+        n = len(self._buffer) if size < 0 else size
+        data = bytes(self._buffer[:n])
+        del self._buffer[:n]
+        return data
+
+    async def _feed(self) -> bool:
+        chunk = await anext(self._chunks, None)
+        if chunk is None:
+            return False
+        try:
+            self._parser.write(chunk)
+        except MultipartParseError as e:
+            raise MultipartError(f"Malformed multipart body: {e}") from e
+        return True
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, params = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._headers = {}
+        # Only the first matching file part is read
+        if self.filename is None and params.get(b"name") == self._field and b"filename" in params:
+            self.filename = params[b"filename"].decode("utf-8", errors="replace")
+            self._in_file = True
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_file:
+            self._buffer += data[start:end]
+
+    def _on_part_end(self) -> None:
+        if self._in_file:
+            self._in_file = False
+            self._file_done = True
+
+    def _on_end(self) -> None:
+        self._body_done = True
@@ -0,0 +1,68 @@
+import base64
+import binascii
+import json
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime
+
+
+class InvalidPageTokenError(ValueError):
+    pass
+
+
+@dataclass
+class Page:
+    items: list[dict]
+    next_page_token: str | None = None
+
+
+def encode_page_token(position: datetime, doc_id: str) -> str:
+    payload = json.dumps([position.isoformat(), doc_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_page_token(token: str) -> tuple[datetime, str]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        position, doc_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(position), str(doc_id)
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise InvalidPageTokenError("Invalid page token") from e
+
+
+async def fetch_page(
+    query,
+    order_field: str,
+    direction: str,
+    limit: int,
+    page_token: str | None = None,
+    include: Callable[[dict], bool] | None = None,
+) -> Page:
+    """One page of ``query`` ordered by ``order_field`` with the document id as tie-breaker.
+
+    The page token is an opaque cursor over the last document read. Documents
+    rejected by ``include`` still advance the cursor, so a page can hold
+    fewer than ``limit`` items; ``next_page_token`` is None on the last page.
+    """
+    query = query.order_by(order_field, direction=direction).order_by(
+        "__name__", direction=direction
+    )
+    if page_token:
+        position, doc_id = decode_page_token(page_token)
+        query = query.start_after({order_field: position, "__name__": doc_id})
+
+    # One extra document tells whether another page follows
+    docs = [doc async for doc in query.limit(limit + 1).stream()]
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+
+    items = []
+    for doc in docs:
+        data = doc.to_dict()
+        if include is None or include(data):
+            items.append({"id": doc.id, **data})
+    next_page_token = None
+    if has_more:
+        last = docs[-1]
+        next_page_token = encode_page_token(last.get(order_field), last.id)
+    return Page(items, next_page_token)
@@ -0,0 +1,35 @@
+import numpy as np
+
+# Storage formats for embeddings, full precision first
+FORMATS = ("float32", "float16", "int8")
+INT8_MAX = 127
+
+
+def _check_format(fmt: str) -> None:
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported embedding format: {fmt}")
+
+
+def quantize(matrix: np.ndarray, fmt: str) -> tuple[np.ndarray, np.ndarray]:
+    """Encode the rows of ``matrix`` as ``fmt`` codes plus one float32 scale per row.
+
+    int8 is symmetric per row: the largest magnitude maps to 127, so the
+    rounding error of each component is at most ``scale / 2``. Float
+    formats have a scale of 1.
+    """
+    _check_format(fmt)
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if fmt != "int8":
+        return matrix.astype(fmt), np.ones(len(matrix), dtype=np.float32)
+    scales = np.abs(matrix).max(axis=1) / INT8_MAX if matrix.size else np.ones(0)
+    scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(matrix / scales[:, None]), -INT8_MAX, INT8_MAX).astype(np.int8)
+    return codes, scales
+
+
+def dequantize(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """Float32 approximation of the vectors behind ``codes``."""
+    if codes.dtype == np.int8:
+        decoded: np.ndarray = codes.astype(np.float32) * scales[:, None]
+        return decoded
+    return codes.astype(np.float32)
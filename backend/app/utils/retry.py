@@ -0,0 +1,45 @@
+import asyncio
+import logging
+import random
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+from google.api_core import exceptions as gexc
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Quota, overload and timeout errors that are worth retrying
+TRANSIENT_ERRORS: tuple[type[Exception], ...] = (
+    gexc.TooManyRequests,
+    gexc.ServiceUnavailable,
+    gexc.DeadlineExceeded,
+    gexc.InternalServerError,
+)
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Exponential backoff with full jitter for a zero-based ``attempt``."""
+    return random.uniform(0, min(max_delay, base_delay * (2**attempt)))
+
+
+async def retry_async(
+    func: Callable[[], Awaitable[T]],
+    *,
+    max_attempts: int,
+    base_delay: float,
+    max_delay: float,
+    retry_on: tuple[type[Exception], ...] = TRANSIENT_ERRORS,
+) -> T:
+    """Await ``func()``, retrying ``retry_on`` errors with jittered exponential backoff."""
+    for attempt in range(max_attempts):
+        try:
+            return await func()
+        except retry_on as e:
+            if attempt == max_attempts - 1:
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            logger.warning(f"Retrying after {type(e).__name__} in {delay:.2f}s: {e}")
+            await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
@@ -1,13 +1,88 @@
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from functools import lru_cache
+from typing import TYPE_CHECKING
 
 from app.config import settings
 
+if TYPE_CHECKING:
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-def chunk_text(text: str) -> list[str]:
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=settings.CHUNK_SIZE,
-        chunk_overlap=settings.CHUNK_OVERLAP,
+
+@lru_cache(maxsize=4)
+def _get_splitter(chunk_size: int, chunk_overlap: int) -> "RecursiveCharacterTextSplitter":
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
         separators=["\n\n", "\n", ". ", " ", ""],
         length_function=len,
     )
+
+
+def chunk_text(text: str) -> list[str]:
+    splitter = _get_splitter(settings.CHUNK_SIZE, settings.CHUNK_OVERLAP)
     return splitter.split_text(text)
+
+
+class IncrementalChunker:
+    """Chunks text that arrives in pieces (pages, sections) as it arrives.
+
+    Buffered text is split once it holds a few chunks' worth; every chunk but
+    the last is emitted and the last is kept, since it may continue in the
+    next piece. Pieces are joined with a newline, as ``parse_document`` does.
+    """
+
+    def __init__(self, flush_chars: int | None = None):
+        self.flush_chars = flush_chars or settings.CHUNK_SIZE * 4
+        self._buffer = ""
+
+    def feed(self, text: str) -> list[str]:
+        self._buffer = f"{self._buffer}\n{text}" if self._buffer else text
+        if len(self._buffer) < self.flush_chars:
+            return []
+        chunks = chunk_text(self._buffer)
+        if len(chunks) < 2:
+            return []
+        tail = chunks[-1]
+        self._buffer = self._buffer[self._buffer.rfind(tail) :]
+        return chunks[:-1]
+
+    def finish(self) -> list[str]:
+        chunks = chunk_text(self._buffer) if self._buffer.strip() else []
+        self._buffer = ""
+        return chunks
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for English text (~4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+# Shorter suffix/prefix matches are more likely coincidence than chunk overlap
+_MIN_OVERLAP_CHARS = 8
+
+
+def join_overlapping(first: str, second: str, max_overlap: int | None = None) -> str:
+    """Join consecutive chunks, keeping the text they share only once.
+
+    Chunks repeat up to ``CHUNK_OVERLAP`` characters of their predecessor,
+    so the longest suffix of ``first`` that starts ``second`` is dropped.
+    Chunks that don't overlap are joined with a newline.
+    """
+    if max_overlap is None:
+        max_overlap = settings.CHUNK_OVERLAP
+    longest = min(len(first), len(second), max_overlap)
+    for size in range(longest, _MIN_OVERLAP_CHARS - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return f"{first}\n{second}"
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut ``text`` at a word boundary to fit ``max_tokens`` (by ``estimate_tokens``)."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[: max(0, (max_tokens - 1) * 4 - 1)]
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return f"{cut}…"
@@ -0,0 +1,82 @@
+"""Recall, latency and memory of quantized IVF storage against float32.
+
+Each format is searched as the memory vector store does it: with rescoring,
+``top_k * rescore`` candidates come from the quantized index and are
+re-ranked by exact cosine against full-precision vectors held locally.
+Recall is measured against a flat float32 scan. Run from ``backend/``::
+
+    python -m benchmarks.bench_quantization --chunks 20000 --rescore 1 4
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from app.utils.ivf import IVFIndex
+from app.utils.quantization import FORMATS
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    return float(np.percentile(np.array(samples) * 1000, pct))
+
+
+def _clustered(rng: np.random.Generator, n: int, centers: np.ndarray) -> np.ndarray:
+    points = centers[rng.integers(len(centers), size=n)]
+    points = points + 0.5 * rng.normal(size=points.shape) / np.sqrt(centers.shape[1])
+    points = points.astype(np.float32)
+    return points / np.linalg.norm(points, axis=1, keepdims=True)
+
+
+def _search(
+    index: IVFIndex, vectors: np.ndarray, query: np.ndarray, top_k: int, rescore: int
+) -> list[int]:
+    hits = index.search(query, top_k * rescore)
+    labels = np.array([label for label, _ in hits], dtype=np.int64)
+    if rescore <= 1 or not len(labels):
+        return labels[:top_k].tolist()
+    exact = vectors[labels] @ query
+    return labels[np.argsort(-exact)[:top_k]].tolist()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--n-probe", type=int, default=8)
+    parser.add_argument("--rescore", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(args.clusters, args.dim)) / np.sqrt(args.dim)
+    vectors = _clustered(rng, args.chunks, centers)
+    queries = _clustered(rng, args.queries, centers)
+    truth = [set(np.argsort(-(vectors @ q))[: args.top_k].tolist()) for q in queries]
+
+    for fmt in FORMATS:
+        start = time.perf_counter()
+        index = IVFIndex(args.dim, n_probe=args.n_probe, storage=fmt)
+        index.add_batch(vectors)
+        build = time.perf_counter() - start
+        print(f"{fmt:<8} build={build:.2f}s  memory={index.nbytes / 2**20:.1f}MiB")
+
+        for rescore in args.rescore:
+            latencies = []
+            hits = 0
+            for query, expected in zip(queries, truth):
+                start = time.perf_counter()
+                results = _search(index, vectors, query, args.top_k, rescore)
+                latencies.append(time.perf_counter() - start)
+                hits += len(expected & set(results))
+            recall = hits / (len(queries) * args.top_k)
+            print(
+                f"  rescore={rescore:<3} recall={recall:.3f}  "
+                f"p50={_percentile(latencies, 50):.3f}ms  p99={_percentile(latencies, 99):.3f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+"""End-to-end service benchmark against in-process fakes (see ``benchmarks.fakes``).
+
+Drives the real code paths with Vertex AI, Firestore and GCS replaced by
+fakes with injected latency:
+
+* ingest: ``upload_document`` then ``ingest_document`` for a synthetic corpus
+  (chunks/sec and per-document seconds)
+* retrieval: ``retrieve_relevant_chunks`` for queries drawn from the corpus
+  (p50/p99 latency)
+* chat: ``POST /api/chat`` through the ASGI app, reading the SSE stream
+  (time to first content event and total stream time)
+
+Peak RSS is sampled after each phase. Results are written as JSON with
+``--output``; ``--baseline`` compares them with an earlier run's file and
+exits non-zero if a metric regressed by more than ``--tolerance``. Latency
+is simulated, so compare runs with the same latency flags. Run from
+``backend/``::
+
+    python -m benchmarks.bench_service --documents 40 --output before.json
+    python -m benchmarks.bench_service --documents 40 --baseline before.json
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import numpy as np
+
+from app.config import settings
+from benchmarks.fakes import Latency, fake_backends
+
+USER_ID = "bench-user"
+
+# Metrics where a higher value is better; for the rest (latencies, memory) lower is better
+HIGHER_IS_BETTER = {"ingest.chunks_per_second"}
+
+
+class _BytesReader:
+    def __init__(self, data: bytes):
+        self._data = memoryview(data)
+        self._offset = 0
+
+    async def read(self, size: int = -1) -> bytes:
+        end = len(self._data) if size < 0 else self._offset + size
+        chunk = bytes(self._data[self._offset : end])
+        self._offset += len(chunk)
+        return chunk
+
+
+def _vocabulary(rng: np.random.Generator, size: int) -> list[str]:
+    syllables = ["ka", "lo", "mi", "ter", "an", "su", "vel", "or", "pi", "den", "ra", "tu"]
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(syllables, size=rng.integers(2, 5))))
+    return sorted(words)
+
+
+def _corpus(rng: np.random.Generator, documents: int, words: int, topics: int) -> list[str]:
+    """Documents whose sentences mostly use their topic's words, plus common filler."""
+    vocabulary = _vocabulary(rng, 4000)
+    common = vocabulary[:200]
+    topic_words = [rng.choice(vocabulary[200:], size=150, replace=False) for _ in range(topics)]
+    texts = []
+    for i in range(documents):
+        own = topic_words[i % topics]
+        sentences = []
+        total = 0
+        while total < words:
+            length = int(rng.integers(8, 20))
+            pool = [own, common]
+            sentence = [str(rng.choice(pool[int(rng.random() < 0.3)])) for _ in range(length)]
+            sentences.append(" ".join(sentence).capitalize() + ".")
+            total += length
+        paragraphs = [" ".join(sentences[j : j + 6]) for j in range(0, len(sentences), 6)]
+        texts.append("\n\n".join(paragraphs))
+    return texts
+
+
+def _queries(rng: np.random.Generator, texts: list[str], count: int) -> list[str]:
+    queries = []
+    for _ in range(count):
+        words = texts[int(rng.integers(len(texts)))].split()
+        start = int(rng.integers(max(1, len(words) - 12)))
+        queries.append(" ".join(words[start : start + 10]).rstrip(".") + "?")
+    return queries
+
+
+def _peak_rss_mib() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+def _summary(samples: list[float]) -> dict:
+    ms = np.array(samples) * 1000
+    return {
+        "count": len(samples),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "mean_ms": float(ms.mean()),
+    }
+
+
+async def _bounded(concurrency: int, jobs) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(job):
+        async with semaphore:
+            return await job
+
+    return await asyncio.gather(*(run(job) for job in jobs))
+
+
+async def _ingest(texts: list[str], concurrency: int) -> dict:
+    from app.services.document_service import get_document, upload_document
+    from app.services.ingestion_service import ingest_document
+
+    doc_ids = []
+    for i, text in enumerate(texts):
+        data = text.encode()
+        doc = await upload_document(USER_ID, f"doc-{i}.txt", _BytesReader(data), len(data))
+        doc_ids.append(doc["id"])
+
+    async def ingest(doc_id: str) -> float:
+        start = time.perf_counter()
+        await ingest_document(USER_ID, doc_id)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    seconds = await _bounded(concurrency, [ingest(doc_id) for doc_id in doc_ids])
+    elapsed = time.perf_counter() - start
+    docs = [await get_document(USER_ID, doc_id) for doc_id in doc_ids]
+    failed = sum(1 for d in docs if d is None or d["status"] != "ready")
+    if failed:
+        raise RuntimeError(f"{failed} of {len(docs)} documents failed to ingest")
+    chunks = sum(d["chunk_count"] for d in docs if d is not None)
+    return {
+        "documents": len(docs),
+        "chunks": chunks,
+        "seconds": elapsed,
+        "chunks_per_second": chunks / elapsed,
+        "document": _summary(seconds),
+    }
+
+
+async def _retrieve(queries: list[str], concurrency: int) -> dict:
+    from app.services.retrieval_service import retrieve_relevant_chunks
+
+    async def retrieve(query: str) -> tuple[float, int]:
+        start = time.perf_counter()
+        chunks = await retrieve_relevant_chunks(USER_ID, query)
+        return time.perf_counter() - start, len(chunks)
+
+    # One query first so the index and lazy imports are not timed
+    await retrieve_relevant_chunks(USER_ID, queries[0])
+    results = await _bounded(concurrency, [retrieve(q) for q in queries])
+    return {
+        **_summary([seconds for seconds, _ in results]),
+        "empty": sum(1 for _, count in results if not count),
+    }
+
+
+async def _post_sse(app, path: str, payload: dict) -> tuple[float | None, float, list[dict]]:
+    """POST to the ASGI app directly and time the SSE stream as it is sent.
+
+    httpx's ``ASGITransport`` buffers the whole body, which would hide the
+    time to first token.
+    """
+    body = json.dumps(payload).encode()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+    sent = False
+    disconnect = asyncio.Event()
+    buffer = b""
+    events: list[dict] = []
+    first: float | None = None
+    status = None
+
+    async def receive() -> dict:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict) -> None:
+        nonlocal buffer, first, status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            return
+        buffer += message.get("body", b"")
+        *complete, buffer = buffer.split(b"\n\n")
+        for raw in complete:
+            if raw.startswith(b"data: "):
+                event = json.loads(raw[len(b"data: ") :])
+                if event["type"] == "content" and first is None:
+                    first = time.perf_counter() - start
+                events.append(event)
+
+    start = time.perf_counter()
+    try:
+        await app(scope, receive, send)
+    finally:
+        disconnect.set()
+    if status != 200:
+        raise RuntimeError(f"POST {path} returned {status}")
+    return first, time.perf_counter() - start, events
+
+
+async def _chat(queries: list[str], concurrency: int) -> dict:
+    from app.api.dependencies import get_current_user
+    from app.main import app
+
+    app.dependency_overrides[get_current_user] = lambda: USER_ID
+
+    async def chat(query: str) -> tuple[float | None, float, bool]:
+        first, total, events = await _post_sse(app, "/api/chat", {"message": query})
+        sources = next((e["sources"] for e in events if e["type"] == "sources"), [])
+        return first, total, bool(sources)
+
+    try:
+        results = await _bounded(concurrency, [chat(q) for q in queries])
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
+    return {
+        "time_to_first_token": _summary([first for first, _, _ in results if first is not None]),
+        "total": _summary([total for _, total, _ in results]),
+        "without_sources": sum(1 for _, _, grounded in results if not grounded),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    from app.core import metrics
+
+    rng = np.random.default_rng(args.seed)
+    texts = _corpus(rng, args.documents, args.words, args.topics)
+    retrieval_queries = _queries(rng, texts, args.queries)
+    chat_queries = _queries(rng, texts, args.chats)
+    latency = Latency(
+        firestore=args.firestore_latency,
+        storage=args.storage_latency,
+        embedding=args.embedding_latency,
+        first_token=args.first_token_latency,
+        token=args.token_latency,
+    )
+
+    results: dict = {"peak_rss_mib": {"start": _peak_rss_mib()}}
+    with fake_backends(latency, answer_tokens=args.answer_tokens) as backends:
+        results["ingest"] = await _ingest(texts, args.concurrency)
+        results["peak_rss_mib"]["ingest"] = _peak_rss_mib()
+        results["retrieval"] = await _retrieve(retrieval_queries, args.concurrency)
+        results["peak_rss_mib"]["retrieval"] = _peak_rss_mib()
+        results["chat"] = await _chat(chat_queries, args.concurrency)
+        results["peak_rss_mib"]["chat"] = _peak_rss_mib()
+        results["calls"] = {
+            "embedding": backends.embedding_model.calls,
+            "firestore_queries": backends.firestore.queries,
+            "firestore_commits": backends.firestore.commits,
+        }
+    results["counters"] = metrics.snapshot()["counters"]
+    return results
+
+
+def _flatten(results: dict, prefix: str = "") -> dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, int | float):
+            flat[name] = float(value)
+    return flat
+
+
+def _compare(baseline: dict, current: dict, tolerance: float) -> list[str]:
+    """Print changes in the headline metrics; return the ones that regressed."""
+    before = _flatten(baseline["results"])
+    after = _flatten(current["results"])
+    headline = [
+        "ingest.chunks_per_second",
+        "retrieval.p50_ms",
+        "retrieval.p99_ms",
+        "chat.time_to_first_token.p50_ms",
+        "chat.time_to_first_token.p99_ms",
+        "peak_rss_mib.chat",
+    ]
+    regressions = []
+    print(f"\nvs {baseline['timestamp']} ({baseline.get('git_commit') or 'unknown commit'}):")
+    ignored = {"output", "baseline", "tolerance"}
+    differing = sorted(
+        key
+        for key, value in current["config"].items()
+        if key not in ignored and baseline["config"].get(key) != value
+    )
+    if differing:
+        print(f"  note: runs differ in {', '.join(differing)}")
+    for name in headline:
+        if name not in before or name not in after or not before[name]:
+            continue
+        change = (after[name] - before[name]) / before[name]
+        worse = -change if name in HIGHER_IS_BETTER else change
+        flag = "  REGRESSION" if worse > tolerance else ""
+        print(f"  {name:<34} {before[name]:10.2f} -> {after[name]:10.2f}  ({change:+.1%}){flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def _git_commit() -> str | None:
+    try:
+        proc = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return proc.stdout.strip()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--words", type=int, default=3000, help="words per document")
+    parser.add_argument("--topics", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--chats", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument("--vector-store", choices=["firestore", "memory"], default="firestore")
+    parser.add_argument("--answer-cache", action="store_true", help="keep the answer cache on")
+    parser.add_argument("--firestore-latency", type=float, default=Latency.firestore)
+    parser.add_argument("--storage-latency", type=float, default=Latency.storage)
+    parser.add_argument("--embedding-latency", type=float, default=Latency.embedding)
+    parser.add_argument("--first-token-latency", type=float, default=Latency.first_token)
+    parser.add_argument("--token-latency", type=float, default=Latency.token)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    with (
+        tempfile.TemporaryDirectory() as snapshot_dir,
+        patch.multiple(
+            settings,
+            VECTOR_STORE_BACKEND=args.vector_store,
+            ANSWER_CACHE_ENABLED=args.answer_cache,
+            INDEX_SNAPSHOT_DIR=snapshot_dir,
+        ),
+    ):
+        results = asyncio.run(run(args))
+
+    report = {
+        "benchmark": "service",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "results": results,
+    }
+    ingest, retrieval, chat = results["ingest"], results["retrieval"], results["chat"]
+    print(
+        f"ingest     {ingest['documents']} docs, {ingest['chunks']} chunks in "
+        f"{ingest['seconds']:.2f}s = {ingest['chunks_per_second']:.1f} chunks/s"
+    )
+    print(
+        f"retrieval  p50={retrieval['p50_ms']:.1f}ms  p99={retrieval['p99_ms']:.1f}ms  "
+        f"({retrieval['empty']} empty)"
+    )
+    ttft = chat["time_to_first_token"]
+    print(
+        f"chat       ttft p50={ttft['p50_ms']:.1f}ms  p99={ttft['p99_ms']:.1f}ms  "
+        f"total p50={chat['total']['p50_ms']:.1f}ms  ({chat['without_sources']} ungrounded)"
+    )
+    print(f"peak RSS   {results['peak_rss_mib']['chat']:.0f} MiB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = _compare(json.load(f), report, args.tolerance)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Cold-import time of ``app.main``, the part of a Cloud Run scale-out we control.
+
+Each run imports the app in a fresh interpreter with ``-X importtime`` and
+reports the median wall time, the slowest modules by cumulative time, and
+any of the deferred heavy SDKs that were imported eagerly (they should only
+load on first use or during the background warmup). Exits non-zero if one
+was, so it can guard CI. Run from ``backend/``::
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+# Loaded lazily by the code that needs them; importing app.main must not pull them in
+DEFERRED_MODULES = ("vertexai", "fitz", "docx", "langchain_text_splitters")
+
+_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _import_once(module: str) -> tuple[float, list[tuple[str, int, int]]]:
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    elapsed = time.perf_counter() - start
+    modules = []
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(cumulative_us), len(indent) // 2))
+    return elapsed, modules
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    timings = []
+    modules: list[tuple[str, int, int]] = []
+    for _ in range(args.runs):
+        elapsed, modules = _import_once(args.module)
+        timings.append(elapsed)
+
+    print(
+        f"import {args.module}: median={statistics.median(timings):.3f}s  "
+        f"min={min(timings):.3f}s  max={max(timings):.3f}s  ({args.runs} runs, incl. interpreter)"
+    )
+    # Top-level packages only (depth 1), so nested imports are not double counted
+    top_level = sorted((m for m in modules if m[2] <= 1), key=lambda m: -m[1])
+    for name, cumulative_us, _ in top_level[: args.top]:
+        print(f"  {cumulative_us / 1000:8.1f}ms  {name}")
+
+    eager = sorted(
+        {
+            name
+            for name, _, _ in modules
+            if any(name == d or name.startswith(f"{d}.") for d in DEFERRED_MODULES)
+        }
+    )
+    if eager:
+        print(f"Deferred modules imported eagerly: {', '.join(eager[:10])}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
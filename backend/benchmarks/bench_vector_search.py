@@ -0,0 +1,77 @@
+"""Offline comparison of IVF search against brute-force (flat) search.
+
+Brute force over the full matrix is what Firestore's ``flat`` vector index
+does per query. Vectors are drawn around random cluster centres to mimic the
+topical structure of real chunk embeddings. Run from ``backend/``::
+
+    python -m benchmarks.bench_vector_search --chunks 20000 --n-probe 4 8 16
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from app.utils.ivf import IVFIndex
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    return float(np.percentile(np.array(samples) * 1000, pct))
+
+
+def _clustered(rng: np.random.Generator, n: int, centers: np.ndarray) -> np.ndarray:
+    points = centers[rng.integers(len(centers), size=n)]
+    points = points + 0.5 * rng.normal(size=points.shape) / np.sqrt(centers.shape[1])
+    points = points.astype(np.float32)
+    return points / np.linalg.norm(points, axis=1, keepdims=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--n-lists", type=int, default=0)
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[4, 8, 16])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(args.clusters, args.dim)) / np.sqrt(args.dim)
+    vectors = _clustered(rng, args.chunks, centers)
+    queries = _clustered(rng, args.queries, centers)
+
+    start = time.perf_counter()
+    index = IVFIndex(args.dim, n_lists=args.n_lists)
+    index.add_batch(vectors)
+    print(f"IVF build: {args.chunks} vectors in {time.perf_counter() - start:.2f}s")
+
+    truth = []
+    flat_latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        truth.append(set(np.argsort(-(vectors @ query))[: args.top_k].tolist()))
+        flat_latencies.append(time.perf_counter() - start)
+    print(
+        f"flat          recall=1.000  p50={_percentile(flat_latencies, 50):.3f}ms  "
+        f"p99={_percentile(flat_latencies, 99):.3f}ms"
+    )
+
+    for n_probe in args.n_probe:
+        latencies = []
+        hits = 0
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            results = index.search(query, args.top_k, n_probe=n_probe)
+            latencies.append(time.perf_counter() - start)
+            hits += len(expected & {label for label, _ in results})
+        recall = hits / (len(queries) * args.top_k)
+        print(
+            f"ivf probe={n_probe:<3} recall={recall:.3f}  "
+            f"p50={_percentile(latencies, 50):.3f}ms  p99={_percentile(latencies, 99):.3f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""In-process stand-ins for Vertex AI, Firestore and Cloud Storage with injected latency.
+
+``fake_backends`` swaps them in behind the app's client getters, so the real
+services (ingestion, retrieval, the chat route) run unchanged without
+network access or credentials. Blocking fakes (the Vertex and GCS SDK
+calls, which the app runs in ``run_blocking``) sleep; async ones await.
+"""
+
+import asyncio
+import contextlib
+import io
+import time
+import zlib
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+
+from app.config import settings
+from app.core import firestore_client, gcs_client, vertex_client
+from tests.fake_firestore import FakeFirestore
+
+
+@dataclass
+class Latency:
+    """Seconds added per call; the defaults are rough us-central1 figures."""
+
+    firestore: float = 0.008
+    storage: float = 0.03
+    embedding: float = 0.12
+    first_token: float = 0.35
+    token: float = 0.015
+
+
+class FakeEmbeddingModel:
+    """Bag-of-words embeddings: each token hashes to a fixed random direction.
+
+    Texts sharing words land close together, so searches over a synthetic
+    corpus return the chunks a query was drawn from.
+    """
+
+    def __init__(self, dim: int, latency: float):
+        self.dim = dim
+        self.latency = latency
+        self.calls = 0
+        self._tokens: dict[str, np.ndarray] = {}
+
+    def _token(self, token: str) -> np.ndarray:
+        vector = self._tokens.get(token)
+        if vector is None:
+            rng = np.random.default_rng(zlib.crc32(token.encode()))
+            vector = self._tokens[token] = rng.standard_normal(self.dim).astype(np.float32)
+        return vector
+
+    def embed(self, text: str) -> list[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in text.lower().split():
+            vector += self._token(token.strip(".,;:?!"))
+        norm = float(np.linalg.norm(vector))
+        values: list[float] = (vector / norm if norm else vector).tolist()
+        return values
+
+    def get_embeddings(self, inputs) -> list[SimpleNamespace]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return [SimpleNamespace(values=self.embed(i.text)) for i in inputs]
+
+
+class _FakeResponseStream:
+    def __init__(self, words: list[str], latency: Latency):
+        self._words = words
+        self._latency = latency
+        self._sent = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> SimpleNamespace:
+        if self._sent > len(self._words):
+            raise StopAsyncIteration
+        await asyncio.sleep(self._latency.first_token if not self._sent else self._latency.token)
+        self._sent += 1
+        if self._sent > len(self._words):
+            # The last chunk carries only the finish reason and usage
+            return SimpleNamespace(
+                text="",
+                candidates=[SimpleNamespace(finish_reason=SimpleNamespace(name="STOP"))],
+                usage_metadata=SimpleNamespace(
+                    prompt_token_count=0, candidates_token_count=len(self._words)
+                ),
+            )
+        return SimpleNamespace(text=self._words[self._sent - 1] + " ", candidates=[])
+
+    async def aclose(self) -> None:
+        self._sent = len(self._words) + 1
+
+
+class FakeGenerativeModel:
+    """Streams ``answer_tokens`` words, the first after ``first_token`` seconds."""
+
+    def __init__(self, latency: Latency, answer_tokens: int):
+        self.latency = latency
+        self.answer_tokens = answer_tokens
+
+    async def generate_content_async(self, contents, generation_config=None, stream=False):
+        prompt = contents[-1]["parts"][0]["text"].split()
+        words = [prompt[i % len(prompt)] for i in range(self.answer_tokens)]
+        return _FakeResponseStream(words, self.latency)
+
+    async def count_tokens_async(self, contents) -> SimpleNamespace:
+        return SimpleNamespace(total_tokens=len(str(contents).split()))
+
+
+class _FakeWriter(io.BytesIO):
+    def __init__(self, blob: "FakeBlob"):
+        super().__init__()
+        self._blob = blob
+
+    def close(self) -> None:
+        if not self.closed:
+            self._blob._store(self.getvalue())
+        super().close()
+
+
+class FakeBlob:
+    def __init__(self, bucket: "FakeBucket", name: str):
+        self.bucket = bucket
+        self.name = name
+
+    def _store(self, data: bytes) -> None:
+        time.sleep(self.bucket.latency)
+        self.bucket.objects[self.name] = data
+
+    def _load(self) -> bytes:
+        time.sleep(self.bucket.latency)
+        if self.name not in self.bucket.objects:
+            from google.api_core.exceptions import NotFound
+
+            raise NotFound(self.name)
+        return self.bucket.objects[self.name]
+
+    def open(self, mode: str = "rb", **kwargs) -> io.BytesIO:
+        if mode == "wb":
+            return _FakeWriter(self)
+        return io.BytesIO(self._load())
+
+    def download_to_filename(self, path: str) -> None:
+        Path(path).write_bytes(self._load())
+
+    def upload_from_filename(self, path: str) -> None:
+        self._store(Path(path).read_bytes())
+
+    def exists(self) -> bool:
+        time.sleep(self.bucket.latency)
+        return self.name in self.bucket.objects
+
+    def delete(self) -> None:
+        time.sleep(self.bucket.latency)
+        self.bucket.objects.pop(self.name, None)
+
+
+class FakeBucket:
+    def __init__(self, name: str, latency: float):
+        self.name = name
+        self.latency = latency
+        self.objects: dict[str, bytes] = {}
+
+    def blob(self, name: str) -> FakeBlob:
+        return FakeBlob(self, name)
+
+    def get_blob(self, name: str) -> FakeBlob | None:
+        time.sleep(self.latency)
+        return FakeBlob(self, name) if name in self.objects else None
+
+
+class FakeStorageClient:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self._buckets: dict[str, FakeBucket] = {}
+
+    def bucket(self, name: str) -> FakeBucket:
+        if name not in self._buckets:
+            self._buckets[name] = FakeBucket(name, self.latency)
+        return self._buckets[name]
+
+
+@dataclass
+class FakeBackends:
+    firestore: FakeFirestore
+    storage: FakeStorageClient
+    embedding_model: FakeEmbeddingModel
+    generation_model: FakeGenerativeModel
+
+
+@contextlib.contextmanager
+def fake_backends(latency: Latency, answer_tokens: int = 120) -> Iterator[FakeBackends]:
+    """Route the app's Firestore, GCS and Vertex clients to fakes for the duration."""
+    from app.services.generation_service import SYSTEM_PROMPT
+
+    backends = FakeBackends(
+        firestore=FakeFirestore(latency=latency.firestore),
+        storage=FakeStorageClient(latency.storage),
+        embedding_model=FakeEmbeddingModel(settings.EMBEDDING_DIMENSION, latency.embedding),
+        generation_model=FakeGenerativeModel(latency, answer_tokens),
+    )
+    models = {None: backends.generation_model, SYSTEM_PROMPT: backends.generation_model}
+    with (
+        patch.object(firestore_client, "_db", backends.firestore),
+        patch.object(gcs_client, "_client", backends.storage),
+        patch.object(vertex_client, "_initialized", True),
+        patch.object(vertex_client, "_embedding_model", backends.embedding_model),
+        patch.object(vertex_client, "_generation_models", models),
+    ):
+        yield backends
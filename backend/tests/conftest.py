@@ -1,6 +1,27 @@
+from unittest.mock import patch
+
 import pytest
 
+from tests.fake_firestore import FakeFirestore
+
 
 @pytest.fixture
 def test_user_id():
     return "test-user-123"
+
+
+@pytest.fixture
+def fake_firestore():
+    """Route every ``get_firestore_client()`` call to an in-memory fake."""
+    from app.core import firestore_client
+    from app.services import answer_cache, deletion_service, lexical_index
+
+    db = FakeFirestore()
+    with (
+        patch.object(firestore_client, "_db", db),
+        patch.object(deletion_service, "_background_deleter", None),
+        patch.object(lexical_index, "_lexical_index", None),
+        patch.object(answer_cache, "_answer_cache", None),
+        patch.object(answer_cache, "_corpus_versions", None),
+    ):
+        yield db
@@ -0,0 +1,333 @@
+"""In-memory stand-in for the parts of ``firestore.AsyncClient`` the app uses."""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import uuid
+from typing import Any
+
+from google.cloud.firestore_v1.transforms import Increment
+from google.cloud.firestore_v1.vector import Vector
+
+_MISSING = object()
+
+
+def _lookup(data: dict, field_path: str) -> Any:
+    value: Any = data
+    for part in field_path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _matches(value: Any, op: str, target: Any) -> bool:
+    if value is _MISSING:
+        return False
+    if op == "==":
+        return bool(value == target)
+    if op == "!=":
+        return bool(value != target)
+    if op == "in":
+        return value in target
+    if op == "not-in":
+        return value not in target
+    if value is None:
+        return False
+    return {
+        "<": value < target,
+        "<=": value <= target,
+        ">": value > target,
+        ">=": value >= target,
+    }[op]
+
+
+def _apply(current: dict, changes: dict) -> dict:
+    merged = dict(current)
+    for key, value in changes.items():
+        if isinstance(value, Increment):
+            merged[key] = merged.get(key, 0) + value.value
+        else:
+            merged[key] = value
+    return merged
+
+
+def _cosine_distance(a, b) -> float:
+    a, b = list(a), list(b)
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return 1.0 - dot / norm if norm else 1.0
+
+
+class FakeSnapshot:
+    def __init__(self, reference: FakeDocumentReference, data: dict | None):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> dict | None:
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field_path: str) -> Any:
+        value = _lookup(self._data or {}, field_path)
+        if value is _MISSING:
+            raise KeyError(field_path)
+        return value
+
+
+class FakeDocumentReference:
+    def __init__(self, db: FakeFirestore, path: str):
+        self._db = db
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    @property
+    def parent(self) -> FakeCollectionReference:
+        return FakeCollectionReference(self._db, self.path.rsplit("/", 1)[0])
+
+    def collection(self, name: str) -> FakeCollectionReference:
+        return FakeCollectionReference(self._db, f"{self.path}/{name}")
+
+    async def get(self, transaction=None) -> FakeSnapshot:
+        await self._db.round_trip()
+        return self._db._snapshot(self.path)
+
+    async def set(self, data: dict, merge: bool = False) -> None:
+        await self._db.round_trip()
+        current = self._db.docs.get(self.path, {}) if merge else {}
+        self._db.docs[self.path] = _apply(current, data)
+
+    async def update(self, data: dict) -> None:
+        await self._db.round_trip()
+        if self.path not in self._db.docs:
+            raise KeyError(f"No document to update: {self.path}")
+        self._db.docs[self.path] = _apply(self._db.docs[self.path], data)
+
+    async def delete(self) -> None:
+        await self._db.round_trip()
+        self._db.docs.pop(self.path, None)
+
+
+class FakeQuery:
+    def __init__(
+        self,
+        db: FakeFirestore,
+        collection_path: str | None = None,
+        group: str | None = None,
+        filters: tuple = (),
+        orders: tuple = (),
+        limit_count: int | None = None,
+        start_after_values: tuple | None = None,
+    ):
+        self._db = db
+        self._collection_path = collection_path
+        self._group = group
+        self._filters = filters
+        self._orders = orders
+        self._limit = limit_count
+        self._start_after = start_after_values
+
+    def _copy(self, **changes) -> FakeQuery:
+        state = {
+            "collection_path": self._collection_path,
+            "group": self._group,
+            "filters": self._filters,
+            "orders": self._orders,
+            "limit_count": self._limit,
+            "start_after_values": self._start_after,
+        }
+        state.update(changes)
+        return FakeQuery(self._db, **state)
+
+    def where(self, *args, filter=None) -> FakeQuery:
+        if filter is None:
+            field_path, op, value = args
+        else:
+            field_path, op, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=(*self._filters, (field_path, op, value)))
+
+    def order_by(self, field_path: str, direction: str = "ASCENDING") -> FakeQuery:
+        return self._copy(orders=(*self._orders, (field_path, direction)))
+
+    def limit(self, count: int) -> FakeQuery:
+        return self._copy(limit_count=count)
+
+    def limit_to_last(self, count: int) -> FakeQuery:
+        raise NotImplementedError
+
+    def start_after(self, values: dict) -> FakeQuery:
+        return self._copy(start_after_values=tuple(values[f] for f, _ in self._orders))
+
+    def select(self, field_paths) -> FakeQuery:
+        return self
+
+    def _matching(self) -> list[FakeSnapshot]:
+        rows = []
+        for path in list(self._db.docs):
+            parent, _ = path.rsplit("/", 1)
+            if self._collection_path is not None and parent != self._collection_path:
+                continue
+            if self._group is not None and parent.rsplit("/", 1)[-1] != self._group:
+                continue
+            data = self._db.docs[path]
+            if all(_matches(_lookup(data, f), op, v) for f, op, v in self._filters):
+                rows.append(FakeSnapshot(FakeDocumentReference(self._db, path), dict(data)))
+        for field_path, direction in reversed(self._orders):
+            rows.sort(
+                key=lambda s: _order_value(s, field_path),
+                reverse=direction == "DESCENDING",
+            )
+        if self._start_after is not None:
+            rows = [s for s in rows if self._after_cursor(s)]
+        if self._limit is not None:
+            rows = rows[: self._limit]
+        return rows
+
+    def _after_cursor(self, snapshot: FakeSnapshot) -> bool:
+        for (field_path, direction), cursor in zip(self._orders, self._start_after or ()):
+            value = _order_value(snapshot, field_path)
+            if value == cursor:
+                continue
+            return value < cursor if direction == "DESCENDING" else value > cursor
+        return False
+
+    async def stream(self, transaction=None):
+        self._db.queries += 1
+        await self._db.round_trip()
+        for snapshot in self._matching():
+            yield snapshot
+
+    async def get(self, transaction=None) -> list[FakeSnapshot]:
+        return [s async for s in self.stream()]
+
+    def find_nearest(
+        self,
+        vector_field: str,
+        query_vector,
+        distance_measure,
+        limit: int,
+        distance_result_field: str | None = None,
+    ) -> FakeVectorQuery:
+        return FakeVectorQuery(self, vector_field, query_vector, limit, distance_result_field)
+
+
+class FakeVectorQuery:
+    def __init__(self, query: FakeQuery, field: str, vector, limit: int, result_field):
+        self._query = query
+        self._field = field
+        self._vector = vector
+        self._limit = limit
+        self._result_field = result_field
+
+    async def stream(self):
+        await self._query._db.round_trip()
+        scored = []
+        for snapshot in self._query._matching():
+            embedding = _lookup(snapshot._data, self._field)
+            if embedding is _MISSING:
+                continue
+            scored.append((_cosine_distance(self._vector, embedding), snapshot))
+        scored.sort(key=lambda pair: pair[0])
+        for distance, snapshot in scored[: self._limit]:
+            if self._result_field:
+                snapshot._data[self._result_field] = distance
+            yield snapshot
+
+
+def _order_value(snapshot: FakeSnapshot, field_path: str):
+    # ``__name__`` orders by document id, as Firestore does for tie-breaking
+    return snapshot.id if field_path == "__name__" else _lookup(snapshot._data, field_path)
+
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, db: FakeFirestore, path: str):
+        super().__init__(db, collection_path=path)
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    @property
+    def parent(self) -> FakeDocumentReference | None:
+        if "/" not in self.path:
+            return None
+        return FakeDocumentReference(self._db, self.path.rsplit("/", 1)[0])
+
+    def document(self, doc_id: str | None = None) -> FakeDocumentReference:
+        return FakeDocumentReference(self._db, f"{self.path}/{doc_id or uuid.uuid4().hex}")
+
+
+class FakeWriteBatch:
+    def __init__(self, db: FakeFirestore):
+        self._db = db
+        self._writes: list[tuple[str, FakeDocumentReference, dict | None]] = []
+
+    def set(self, ref: FakeDocumentReference, data: dict) -> None:
+        self._writes.append(("set", ref, data))
+
+    def update(self, ref: FakeDocumentReference, data: dict) -> None:
+        self._writes.append(("update", ref, data))
+
+    def delete(self, ref: FakeDocumentReference) -> None:
+        self._writes.append(("delete", ref, None))
+
+    async def commit(self) -> None:
+        self._db.commits += 1
+        await self._db.round_trip()
+        for kind, ref, data in self._writes:
+            if kind == "set":
+                self._db.docs[ref.path] = dict(data or {})
+            elif kind == "update":
+                self._db.docs[ref.path].update(data or {})
+            else:
+                self._db.docs.pop(ref.path, None)
+
+
+class FakeFirestore:
+    """Documents keyed by full path, e.g. ``users/u1/documents/d1``.
+
+    ``latency`` seconds are awaited once per RPC (a read, write, query or
+    batch commit), for benchmarks that need Firestore to cost something.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.docs: dict[str, dict] = {}
+        self.commits = 0
+        self.queries = 0
+        self.latency = latency
+
+    async def round_trip(self) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def collection(self, name: str) -> FakeCollectionReference:
+        return FakeCollectionReference(self, name)
+
+    def collection_group(self, name: str) -> FakeQuery:
+        return FakeQuery(self, group=name)
+
+    def document(self, path: str) -> FakeDocumentReference:
+        return FakeDocumentReference(self, path)
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    async def get_all(self, refs, field_paths=None):
+        await self.round_trip()
+        for ref in refs:
+            yield self._snapshot(ref.path)
+
+    def _snapshot(self, path: str) -> FakeSnapshot:
+        data = self.docs.get(path)
+        return FakeSnapshot(
+            FakeDocumentReference(self, path), dict(data) if data is not None else None
+        )
+
+    def put(self, path: str, data: dict) -> None:
+        """Seed a document directly."""
+        if "embedding" in data and not isinstance(data["embedding"], Vector):
+            data = {**data, "embedding": Vector(list(data["embedding"]))}
+        self.docs[path] = dict(data)
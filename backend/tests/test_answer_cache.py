@@ -0,0 +1,120 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.services.answer_cache import SemanticAnswerCache, bump_corpus_version
+
+USER_ID = "test-user-123"
+
+
+def test_lookup_matches_similar_queries_in_the_same_scope_and_version():
+    cache = SemanticAnswerCache(max_entries=10, threshold=0.95)
+    cache.store(USER_ID, 1, ["b", "a"], [1.0, 0.0], "q", "answer", [])
+
+    assert cache.lookup(USER_ID, 1, ["a", "b"], [0.99, 0.05]).answer == "answer"
+    assert cache.lookup(USER_ID, 1, ["a", "b"], [0.7, 0.7]) is None
+    assert cache.lookup(USER_ID, 1, None, [1.0, 0.0]) is None
+    assert cache.lookup(USER_ID, 2, ["a", "b"], [1.0, 0.0]) is None
+    assert cache.lookup("other-user", 1, ["a", "b"], [1.0, 0.0]) is None
+    assert (cache.stats.hits, cache.stats.misses) == (1, 4)
+
+
+def test_least_recently_used_answers_are_evicted_and_old_ones_expire():
+    now = [0.0]
+    cache = SemanticAnswerCache(max_entries=2, threshold=0.99, ttl_seconds=60, clock=lambda: now[0])
+    cache.store(USER_ID, 0, None, [1.0, 0.0, 0.0], "q1", "a1", [])
+    cache.store(USER_ID, 0, None, [0.0, 1.0, 0.0], "q2", "a2", [])
+    assert cache.lookup(USER_ID, 0, None, [1.0, 0.0, 0.0]) is not None
+
+    cache.store(USER_ID, 0, None, [0.0, 0.0, 1.0], "q3", "a3", [])
+
+    assert len(cache) == 2
+    assert cache.lookup(USER_ID, 0, None, [0.0, 1.0, 0.0]) is None
+    now[0] = 61.0
+    assert cache.lookup(USER_ID, 0, None, [1.0, 0.0, 0.0]) is None
+    assert cache.stats.evictions == 1
+    assert cache.stats.expirations == 1
+
+
+class _Model:
+    def __init__(self):
+        self.calls = 0
+
+    async def generate_content_async(self, contents, generation_config=None, stream=False):
+        self.calls += 1
+
+        async def responses():
+            yield SimpleNamespace(
+                text="Prime the pump first.",
+                candidates=[SimpleNamespace(finish_reason=SimpleNamespace(name="STOP"))],
+                usage_metadata=None,
+            )
+
+        return responses()
+
+
+@pytest.fixture
+def client(fake_firestore):
+    from app.api.dependencies import get_current_user
+    from app.api.routes import chat
+    from app.main import app
+    from app.services import generation_service
+
+    model = _Model()
+    chunk = {
+        "chunk_id": "d1_0",
+        "document_id": "d1",
+        "document_name": "manual.pdf",
+        "content": "Prime the pump before starting it.",
+        "chunk_index": 0,
+        "score": 0.9,
+    }
+    app.dependency_overrides[get_current_user] = lambda: USER_ID
+    with (
+        patch.object(chat, "embed_query", AsyncMock(return_value=[1.0, 0.0])),
+        patch.object(chat, "retrieve_relevant_chunks", AsyncMock(return_value=[chunk])),
+        patch.object(generation_service, "get_generation_model", lambda _: model),
+    ):
+        yield AsyncClient(transport=ASGITransport(app=app), base_url="http://test"), model
+    app.dependency_overrides.clear()
+
+
+async def _ask(http: AsyncClient, message: str) -> list[dict]:
+    response = await http.post("/api/chat", json={"message": message})
+    return [
+        json.loads(line.removeprefix("data: "))
+        for line in response.text.splitlines()
+        if line.startswith("data: ")
+    ]
+
+
+async def test_repeated_first_question_is_replayed_until_the_corpus_changes(client):
+    http, model = client
+
+    first = await _ask(http, "How do I start the pump?")
+    second = await _ask(http, "How do I start the pump?")
+
+    assert model.calls == 1
+    assert [e["type"] for e in second] == [e["type"] for e in first]
+    assert second[-2]["full_response"] == "Prime the pump first."
+    assert second[1]["sources"] == first[-3]["sources"]
+    assert second[-1]["chat_id"] != first[-1]["chat_id"]
+
+    await bump_corpus_version(USER_ID)
+    await _ask(http, "How do I start the pump?")
+    assert model.calls == 2
+
+
+async def test_keyword_lookups_are_not_embedded_for_the_cache(client):
+    from app.api.routes import chat
+
+    http, model = client
+    with patch.object(chat, "is_keyword_lookup", Mock(return_value=True)):
+        await _ask(http, "E-1042")
+        await _ask(http, "E-1042")
+
+    chat.embed_query.assert_not_called()
+    assert model.calls == 2
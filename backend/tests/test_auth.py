@@ -0,0 +1,95 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.services import auth_service
+from app.services.auth_service import TokenVerifier
+
+
+class _FakeFirebase:
+    def __init__(self, exp: float):
+        self.exp = exp
+        self.calls: list[tuple[str, bool]] = []
+        self.revoked: set[str] = set()
+
+    def verify_id_token(self, token: str, check_revoked: bool = False) -> dict:
+        self.calls.append((token, check_revoked))
+        time.sleep(0.05)
+        if token == "bad" or (check_revoked and token in self.revoked):
+            raise ValueError("rejected")
+        return {"uid": f"uid-{token}", "exp": self.exp}
+
+
+@pytest.fixture
+def firebase():
+    fake = _FakeFirebase(exp=time.time() + 3600)
+    with patch.object(auth_service, "firebase_auth", fake):
+        yield fake
+
+
+async def test_verified_tokens_are_reused_until_they_expire(firebase):
+    wall = [time.time()]
+    verifier = TokenVerifier(max_size=10, wall_clock=lambda: wall[0])
+
+    assert (await verifier.verify("t1"))["uid"] == "uid-t1"
+    assert (await verifier.verify("t1"))["uid"] == "uid-t1"
+    assert len(firebase.calls) == 1
+
+    wall[0] = firebase.exp
+    await verifier.verify("t1")
+    assert len(firebase.calls) == 2
+    assert verifier.stats.hits == 1
+
+
+async def test_concurrent_requests_share_one_verification(firebase):
+    verifier = TokenVerifier(max_size=10)
+
+    results = await asyncio.gather(*(verifier.verify("t1") for _ in range(5)))
+
+    assert all(r["uid"] == "uid-t1" for r in results)
+    assert len(firebase.calls) == 1
+
+
+async def test_cancelled_caller_does_not_strand_concurrent_requests(firebase):
+    verifier = TokenVerifier(max_size=10)
+    first = asyncio.create_task(verifier.verify("t1"))
+    await asyncio.sleep(0.01)
+    follower = asyncio.create_task(verifier.verify("t1"))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    claims = await asyncio.wait_for(follower, timeout=1)
+
+    assert claims["uid"] == "uid-t1"
+    assert first.cancelled()
+    assert len(firebase.calls) == 1
+    assert (await verifier.verify("t1"))["uid"] == "uid-t1"
+    assert len(firebase.calls) == 1
+
+
+async def test_revocation_is_rechecked_on_the_interval(firebase):
+    now = [0.0]
+    verifier = TokenVerifier(max_size=10, revocation_check_seconds=300, clock=lambda: now[0])
+    await verifier.verify("t1")
+    firebase.revoked.add("t1")
+
+    await verifier.verify("t1")  # still within the interval
+    now[0] = 301.0
+    with pytest.raises(ValueError):
+        await verifier.verify("t1")
+    with pytest.raises(ValueError):
+        await verifier.verify("t1")
+
+    # A rejected token isn't cached, so it stays rejected
+    assert firebase.calls == [("t1", True)] * 3
+
+
+async def test_invalid_tokens_are_not_cached(firebase):
+    verifier = TokenVerifier(max_size=10)
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            await verifier.verify("bad")
+    assert len(firebase.calls) == 2
+    assert len(verifier) == 0
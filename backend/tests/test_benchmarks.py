@@ -0,0 +1,31 @@
+import argparse
+
+from app.config import settings
+from benchmarks.bench_service import run
+
+
+async def test_service_benchmark_runs_against_fakes(fake_firestore, monkeypatch):
+    monkeypatch.setattr(settings, "ANSWER_CACHE_ENABLED", False)
+    args = argparse.Namespace(
+        documents=2,
+        words=400,
+        topics=2,
+        queries=5,
+        chats=2,
+        concurrency=2,
+        answer_tokens=5,
+        firestore_latency=0,
+        storage_latency=0,
+        embedding_latency=0,
+        first_token_latency=0,
+        token_latency=0,
+        seed=0,
+    )
+
+    results = await run(args)
+
+    assert results["ingest"]["chunks"] > 2
+    assert results["retrieval"]["count"] == 5 and results["retrieval"]["empty"] == 0
+    assert results["chat"]["time_to_first_token"]["count"] == 2
+    assert results["chat"]["without_sources"] == 0
+    assert results["peak_rss_mib"]["chat"] > 0
@@ -0,0 +1,111 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from google.api_core import exceptions as gexc
+
+from app.core import bulk_writer
+from app.core.bulk_writer import BulkWriter, estimate_write_size
+
+
+class _Ref:
+    def __init__(self, path: str):
+        self.path = path
+
+
+class _FakeDb:
+    """Records committed batches; ``failures`` lists errors to raise on successive commits."""
+
+    def __init__(self, failures: list[Exception] | None = None, delay: float = 0.0):
+        self.failures = failures or []
+        self.delay = delay
+        self.committed: list[list[tuple[str, dict | None]]] = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def batch(self):
+        return _FakeBatch(self)
+
+
+class _FakeBatch:
+    def __init__(self, db: _FakeDb):
+        self.db = db
+        self.writes: list[tuple[str, dict | None]] = []
+
+    def set(self, ref, data):
+        self.writes.append((ref.path, data))
+
+    def delete(self, ref):
+        self.writes.append((ref.path, None))
+
+    async def commit(self):
+        self.db.in_flight += 1
+        self.db.peak_in_flight = max(self.db.peak_in_flight, self.db.in_flight)
+        try:
+            await asyncio.sleep(self.db.delay)
+            if self.db.failures:
+                raise self.db.failures.pop(0)
+            self.db.committed.append(self.writes)
+        finally:
+            self.db.in_flight -= 1
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay():
+    with patch.object(bulk_writer.settings, "FIRESTORE_WRITE_RETRY_BASE_DELAY", 0.0):
+        yield
+
+
+async def test_batches_split_on_op_count():
+    db = _FakeDb()
+    async with BulkWriter(db, max_ops=3) as writer:
+        for i in range(7):
+            await writer.set(_Ref(f"chunks/{i}"), {"n": i})
+        await writer.delete(_Ref("chunks/old"))
+
+    assert sorted(len(batch) for batch in db.committed) == [2, 3, 3]
+    assert writer.committed == 8
+    assert ("chunks/old", None) in [write for batch in db.committed for write in batch]
+
+
+async def test_batches_split_on_request_size():
+    db = _FakeDb()
+    data = {"content": "x" * 1000}
+    size = estimate_write_size("chunks/0", data)
+    async with BulkWriter(db, max_bytes=size * 2) as writer:
+        for i in range(5):
+            await writer.set(_Ref(f"chunks/{i}"), data)
+
+    assert sorted(len(batch) for batch in db.committed) == [1, 2, 2]
+
+
+async def test_commits_run_in_parallel_up_to_limit():
+    db = _FakeDb(delay=0.02)
+    async with BulkWriter(db, max_ops=1, max_in_flight=3) as writer:
+        for i in range(10):
+            await writer.set(_Ref(f"chunks/{i}"), {"n": i})
+
+    assert len(db.committed) == 10
+    assert db.peak_in_flight == 3
+
+
+async def test_transient_failure_retries_the_batch():
+    db = _FakeDb(failures=[gexc.ServiceUnavailable("busy"), gexc.Aborted("contention")])
+    async with BulkWriter(db, max_ops=2) as writer:
+        for i in range(4):
+            await writer.set(_Ref(f"chunks/{i}"), {"n": i})
+
+    assert sorted(path for batch in db.committed for path, _ in batch) == [
+        f"chunks/{i}" for i in range(4)
+    ]
+
+
+async def test_permanent_failure_is_raised_from_flush():
+    db = _FakeDb(failures=[gexc.PermissionDenied("nope")])
+    writer = BulkWriter(db, max_ops=2, max_in_flight=1)
+    for i in range(4):
+        await writer.set(_Ref(f"chunks/{i}"), {"n": i})
+    with pytest.raises(gexc.PermissionDenied):
+        await writer.flush()
+    # The batch that didn't fail still went through
+    assert len(db.committed) == 1
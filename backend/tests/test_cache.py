@@ -0,0 +1,74 @@
+from unittest.mock import patch
+
+from app.services import retrieval_service
+from app.utils.cache import LRUCache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+async def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    await cache.set("a", 1)
+    await cache.set("b", 2)
+    assert await cache.get("a") == 1  # "b" is now least recently used
+    await cache.set("c", 3)
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") == 1
+    assert await cache.get("c") == 3
+    assert cache.stats.evictions == 1
+    assert len(cache) == 2
+
+
+async def test_lru_cache_expires_entries():
+    clock = _Clock()
+    cache = LRUCache(max_size=10, ttl_seconds=60, clock=clock)
+    await cache.set("a", 1)
+    clock.now = 59
+    assert await cache.get("a") == 1
+    clock.now = 60
+    assert await cache.get("a") is None
+    assert cache.stats.expirations == 1
+
+
+async def test_lru_cache_hit_rate():
+    cache = LRUCache(max_size=10)
+    await cache.set("a", 1)
+    await cache.get("a")
+    await cache.get("a")
+    await cache.get("missing")
+    assert cache.stats.hits == 2
+    assert cache.stats.misses == 1
+    assert cache.stats.hit_rate == 2 / 3
+
+
+class _CountingEmbeddingModel:
+    calls = 0
+
+    def get_embeddings(self, inputs):
+        type(self).calls += 1
+        return [type("Embedding", (), {"values": [0.1, 0.2]})() for _ in inputs]
+
+
+async def test_embed_query_reuses_normalized_queries():
+    retrieval_service.set_query_embedding_cache(LRUCache(max_size=10))
+    _CountingEmbeddingModel.calls = 0
+    with patch("app.services.embedding_batcher.get_embedding_model", _CountingEmbeddingModel):
+        first = await retrieval_service.embed_query("What is  RAG?")
+        second = await retrieval_service.embed_query("  what is rag? ")
+        await retrieval_service.embed_query("What is Vertex?")
+
+    assert first == second == [0.1, 0.2]
+    assert _CountingEmbeddingModel.calls == 2
+
+
+def test_query_cache_key_depends_on_model():
+    key = retrieval_service._query_cache_key("hello")
+    with patch.object(retrieval_service.settings, "EMBEDDING_MODEL", "other-model"):
+        assert retrieval_service._query_cache_key("hello") != key
@@ -0,0 +1,62 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+EMBEDDING_LATENCY = 0.3
+CONCURRENT_REQUESTS = 5
+
+
+class _FakeEmbedding:
+    def __init__(self, values: list[float]):
+        self.values = values
+
+
+class _SlowEmbeddingModel:
+    """Mimics the blocking Vertex SDK: sleeps on the calling thread."""
+
+    def get_embeddings(self, inputs):
+        time.sleep(EMBEDDING_LATENCY)
+        return [_FakeEmbedding([0.0] * 8) for _ in inputs]
+
+
+@pytest.fixture
+def app_client(fake_firestore):
+    from app.api.dependencies import get_current_user
+    from app.main import app
+    from app.services import retrieval_service
+    from app.services.embedding_batcher import EmbeddingCoalescer
+    from app.utils.cache import LRUCache
+
+    retrieval_service.set_query_embedding_cache(LRUCache(max_size=100))
+
+    app.dependency_overrides[get_current_user] = lambda: "test-user-123"
+    with (
+        patch("app.services.embedding_batcher.get_embedding_model", _SlowEmbeddingModel),
+        # One request per embedding call, so overlap comes from the executor alone
+        patch.object(
+            retrieval_service,
+            "_query_coalescer",
+            EmbeddingCoalescer("RETRIEVAL_QUERY", max_batch_size=1, max_wait_seconds=0),
+        ),
+    ):
+        yield AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+    app.dependency_overrides.clear()
+
+
+async def test_concurrent_chat_requests_overlap(app_client):
+    async def send(i: int):
+        payload = {"message": f"question {i}"}
+        async with app_client.stream("POST", "/api/chat", json=payload) as response:
+            assert response.status_code == 200
+            return await response.aread()
+
+    start = time.perf_counter()
+    bodies = await asyncio.gather(*(send(i) for i in range(CONCURRENT_REQUESTS)))
+    elapsed = time.perf_counter() - start
+
+    assert all(b'"type": "done"' in body for body in bodies)
+    # Serialized on the event loop this would take CONCURRENT_REQUESTS * EMBEDDING_LATENCY
+    assert elapsed < EMBEDDING_LATENCY * CONCURRENT_REQUESTS / 2
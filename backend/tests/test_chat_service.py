@@ -0,0 +1,59 @@
+import json
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+from httpx import ASGITransport, AsyncClient
+
+from app.services.chat_service import get_recent_messages, save_message
+
+USER = "users/test-user-123"
+
+
+async def test_recent_messages_are_the_last_n_oldest_first(fake_firestore, test_user_id):
+    fake_firestore.put(f"{USER}/chats/chat-1", {"title": "t", "updated_at": 0})
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for i in range(40):
+        fake_firestore.put(
+            f"{USER}/chats/chat-1/messages/m{i:02d}",
+            {
+                "role": "user" if i % 2 == 0 else "assistant",
+                "content": f"message {i}",
+                "created_at": start + timedelta(seconds=i),
+            },
+        )
+
+    recent = await get_recent_messages(test_user_id, "chat-1", 6)
+
+    assert [m["content"] for m in recent] == [f"message {i}" for i in range(34, 40)]
+
+    msg_id = await save_message(test_user_id, "chat-1", "user", "newest")
+    recent = await get_recent_messages(test_user_id, "chat-1", 2)
+    assert [m["id"] for m in recent] == ["m39", msg_id]
+
+
+async def test_off_topic_question_is_not_told_to_upload_documents(
+    fake_firestore, test_user_id, monkeypatch
+):
+    from app.api.dependencies import get_current_user
+    from app.api.routes import chat
+    from app.main import app
+
+    monkeypatch.setattr("app.api.routes.chat.settings.ANSWER_CACHE_ENABLED", False)
+    app.dependency_overrides[get_current_user] = lambda: test_user_id
+
+    async def ask() -> str:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as http:
+            response = await http.post("/api/chat", json={"message": "What's the weather?"})
+        events = [json.loads(line[6:]) for line in response.text.splitlines() if line]
+        return events[0]["content"]
+
+    try:
+        with patch.object(chat, "retrieve_relevant_chunks", AsyncMock(return_value=[])):
+            no_documents = await ask()
+            fake_firestore.put(f"{USER}/documents/d1", {"status": "ready"})
+            no_match = await ask()
+    finally:
+        app.dependency_overrides.clear()
+
+    assert no_documents == chat.NO_DOCUMENTS_MESSAGE
+    assert no_match == chat.NO_MATCH_MESSAGE
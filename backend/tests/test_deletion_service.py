@@ -0,0 +1,147 @@
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services import document_service, retrieval_service
+from app.services.chat_service import list_chat_sessions
+from app.services.deletion_service import get_background_deleter
+from app.services.document_service import DELETING, get_document, list_documents
+
+USER = "users/test-user-123"
+
+
+@pytest.fixture
+def bucket():
+    bucket = MagicMock()
+    bucket.blob.return_value.exists.return_value = True
+    with patch.object(document_service, "get_bucket", lambda: bucket):
+        yield bucket
+
+
+def _seed_document(db, doc_id: str, status: str = "ready", chunks: int = 3) -> None:
+    db.put(
+        f"{USER}/documents/{doc_id}",
+        {
+            "filename": f"{doc_id}.txt",
+            "gcs_path": f"{USER}/documents/{doc_id}/{doc_id}.txt",
+            "status": status,
+            "created_at": 0,
+        },
+    )
+    for i in range(chunks):
+        db.put(
+            f"{USER}/chunks/{doc_id}_{i}",
+            {
+                "document_id": doc_id,
+                "document_name": f"{doc_id}.txt",
+                "content": f"{doc_id} chunk {i}",
+                "chunk_index": i,
+                "embedding": [1.0, float(i)],
+            },
+        )
+
+
+def _paths(db, prefix: str) -> list[str]:
+    return [path for path in db.docs if path.startswith(prefix)]
+
+
+async def test_delete_document_returns_before_chunks_are_purged(
+    fake_firestore, bucket, test_user_id
+):
+    _seed_document(fake_firestore, "doc-1")
+    deleter = get_background_deleter()
+
+    assert await deleter.delete_document(test_user_id, "doc-1")
+    # Hidden straight away, while the purge is still pending
+    assert fake_firestore.docs[f"{USER}/documents/doc-1"]["status"] == DELETING
+    assert await get_document(test_user_id, "doc-1") is None
+    assert (await list_documents(test_user_id, 50)).items == []
+
+    await deleter.stop()
+    assert _paths(fake_firestore, f"{USER}/chunks/") == []
+    assert f"{USER}/documents/doc-1" not in fake_firestore.docs
+    bucket.blob.return_value.delete.assert_called_once()
+
+
+async def test_delete_missing_document_returns_false(fake_firestore, test_user_id):
+    assert not await get_background_deleter().delete_document(test_user_id, "nope")
+
+
+async def test_retrieval_skips_documents_being_deleted(fake_firestore, test_user_id):
+    _seed_document(fake_firestore, "doc-keep")
+    _seed_document(fake_firestore, "doc-gone", status=DELETING)
+
+    async def embed_query(query):
+        return [1.0, 0.0]
+
+    with patch.object(retrieval_service, "embed_query", embed_query):
+        chunks = await retrieval_service.retrieve_relevant_chunks(test_user_id, "q", top_k=3)
+        scoped = await retrieval_service.retrieve_relevant_chunks(
+            test_user_id, "q", document_ids=["doc-gone"]
+        )
+
+    assert len(chunks) == 3
+    assert {c["document_id"] for c in chunks} == {"doc-keep"}
+    assert scoped == []
+
+
+async def test_interrupted_deletes_resume_on_start(fake_firestore, bucket, test_user_id):
+    _seed_document(fake_firestore, "doc-1", status=DELETING)
+    fake_firestore.put(f"{USER}/chats/chat-1", {"title": "t", "status": DELETING})
+    for i in range(5):
+        fake_firestore.put(f"{USER}/chats/chat-1/messages/m{i}", {"content": str(i)})
+    fake_firestore.put(f"{USER}/chats/chat-2", {"title": "kept", "updated_at": 0})
+
+    deleter = get_background_deleter()
+    await deleter.start()
+    await deleter.stop()
+
+    assert _paths(fake_firestore, f"{USER}/chunks/") == []
+    assert _paths(fake_firestore, f"{USER}/chats/chat-1") == []
+    assert [s["id"] for s in (await list_chat_sessions(test_user_id, 50)).items] == ["chat-2"]
+
+
+async def test_deleted_chat_is_hidden_immediately(fake_firestore, test_user_id):
+    fake_firestore.put(f"{USER}/chats/chat-1", {"title": "t", "updated_at": 0})
+    fake_firestore.put(f"{USER}/chats/chat-1/messages/m0", {"content": "hi"})
+    deleter = get_background_deleter()
+
+    assert await deleter.delete_chat(test_user_id, "chat-1")
+    assert (await list_chat_sessions(test_user_id, 50)).items == []
+    await deleter.stop()
+    assert _paths(fake_firestore, f"{USER}/chats/") == []
+
+
+async def test_purge_waits_for_running_ingestion_and_removes_its_chunks(
+    fake_firestore, bucket, test_user_id, monkeypatch
+):
+    monkeypatch.setattr(document_service, "INGESTION_STOP_POLL_SECONDS", 0.01)
+    _seed_document(fake_firestore, "doc-1", status=DELETING)
+    job = {"user_id": test_user_id, "doc_id": "doc-1", "status": "running", "attempts": 1}
+    fake_firestore.put("ingestion_jobs/doc-1", job)
+
+    async def ingestion_finishing_its_batch() -> None:
+        await asyncio.sleep(0.05)
+        fake_firestore.put(
+            f"{USER}/chunks/doc-1_7",
+            {"document_id": "doc-1", "content": "late", "chunk_index": 7, "embedding": [1.0, 0.0]},
+        )
+        fake_firestore.put("ingestion_jobs/doc-1", {**job, "status": "succeeded"})
+
+    ingestion = asyncio.create_task(ingestion_finishing_its_batch())
+    await document_service.purge_document(test_user_id, "doc-1")
+    await ingestion
+
+    assert _paths(fake_firestore, f"{USER}/chunks/") == []
+    assert _paths(fake_firestore, "ingestion_jobs/") == []
+    assert _paths(fake_firestore, f"{USER}/documents/") == []
+
+
+async def test_status_update_does_not_clear_the_deleting_flag(fake_firestore, test_user_id):
+    _seed_document(fake_firestore, "doc-1", status=DELETING)
+
+    updated = await document_service.update_document_status(test_user_id, "doc-1", "ready", 3)
+
+    assert updated is False
+    assert fake_firestore.docs[f"{USER}/documents/doc-1"]["status"] == DELETING
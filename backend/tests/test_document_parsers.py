@@ -1,4 +1,24 @@
-from app.utils.document_parsers import ALLOWED_EXTENSIONS, EXTENSION_TO_CONTENT_TYPE, parse_text
+import asyncio
+import io
+import os
+import time
+from unittest.mock import patch
+
+import fitz
+import pytest
+from docx import Document
+
+from app.utils import document_parsers
+from app.utils.document_parsers import (
+    ALLOWED_EXTENSIONS,
+    EXTENSION_TO_CONTENT_TYPE,
+    TEXT_BLOCK_SIZE,
+    DocumentParseError,
+    parse_text,
+    stream_document,
+)
+
+DOCX = EXTENSION_TO_CONTENT_TYPE[".docx"]
 
 
 def test_parse_text():
@@ -24,3 +44,136 @@ def test_allowed_extensions():
 def test_extension_to_content_type():
     assert EXTENSION_TO_CONTENT_TYPE[".pdf"] == "application/pdf"
     assert EXTENSION_TO_CONTENT_TYPE[".txt"] == "text/plain"
+
+
+def _make_pdf(pages: int) -> bytes:
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"Page number {i}")
+    data: bytes = doc.tobytes()
+    doc.close()
+    return data
+
+
+async def _collect(source, content_type: str) -> list[str]:
+    return [section async for section in stream_document(source, content_type)]
+
+
+async def test_stream_text_decodes_across_block_boundaries():
+    # A two-byte character straddling the block boundary must not be mangled
+    content = ("a" * (TEXT_BLOCK_SIZE - 1) + "é" + "b" * 10).encode("utf-8")
+    sections = await _collect(content, "text/plain")
+    assert len(sections) == 2
+    assert "".join(sections) == content.decode("utf-8")
+
+
+async def test_stream_pdf_yields_pages_in_order():
+    sections = await _collect(_make_pdf(3), "application/pdf")
+    assert [s.strip() for s in sections] == ["Page number 0", "Page number 1", "Page number 2"]
+
+
+async def test_stream_pdf_parses_page_ranges_in_worker_processes():
+    with (
+        patch.object(document_parsers.settings, "PARSER_PAGES_PER_TASK", 2),
+        patch.object(document_parsers.settings, "PARSER_WORKERS", 2),
+    ):
+        sections = await _collect(_make_pdf(7), "application/pdf")
+    assert [s.strip() for s in sections] == [f"Page number {i}" for i in range(7)]
+
+
+async def test_stream_pdf_rejects_too_many_pages():
+    with patch.object(document_parsers.settings, "PARSER_MAX_PAGES", 2):
+        with pytest.raises(DocumentParseError, match="3 pages"):
+            await _collect(_make_pdf(3), "application/pdf")
+
+
+def _hanging_extract(source, start, end) -> list[str]:
+    # Module level so the spawned parser processes can unpickle it
+    time.sleep(60)
+    return []
+
+
+def _docx(text: str) -> bytes:
+    docx = Document()
+    docx.add_paragraph(text)
+    buffer = io.BytesIO()
+    docx.save(buffer)
+    return buffer.getvalue()
+
+
+def _exited(pid: int, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.fixture
+def parsers():
+    """Every parser process checked out, with a clean idle list before and after."""
+    document_parsers.shutdown_parsers()
+    checked_out = []
+    checkout = document_parsers._checkout_parsers
+
+    async def recording_checkout(count):
+        taken = await checkout(count)
+        checked_out.extend(taken)
+        return taken
+
+    with patch.object(document_parsers, "_checkout_parsers", recording_checkout):
+        yield checked_out
+    document_parsers.shutdown_parsers()
+
+
+async def test_stream_document_reuses_warm_parser_processes(parsers):
+    assert await _collect(_docx("First"), DOCX) == ["First"]
+    assert await _collect(_docx("Second"), DOCX) == ["Second"]
+
+    assert parsers[0] is parsers[1]
+    assert document_parsers._idle_parsers == [parsers[0]]
+
+
+async def test_stream_pdf_timeout_kills_only_its_own_parser_process(parsers):
+    with (
+        patch.object(document_parsers.settings, "PARSER_TIMEOUT_SECONDS", 2),
+        patch.object(document_parsers, "_extract_pdf_pages", _hanging_extract),
+    ):
+        stuck = asyncio.create_task(_collect(_make_pdf(1), "application/pdf"))
+        while not parsers:
+            await asyncio.sleep(0.01)
+        sections = await _collect(_docx("Still parsed"), DOCX)
+        with pytest.raises(DocumentParseError, match="time limit"):
+            await stuck
+
+    # The Word file was parsed in another process while the PDF's hung
+    assert sections == ["Still parsed"]
+    hung, healthy = parsers
+    assert _exited(hung.pid)
+    assert document_parsers._idle_parsers == [healthy]
+
+
+async def test_stream_text_closes_the_file_when_abandoned(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_bytes(b"a" * (TEXT_BLOCK_SIZE * 3))
+    opened = []
+    real_open = open
+
+    def tracking_open(*args, **kwargs):
+        opened.append(real_open(*args, **kwargs))
+        return opened[-1]
+
+    with patch("builtins.open", tracking_open):
+        sections = stream_document(str(path), "text/plain")
+        assert len(await anext(sections)) == TEXT_BLOCK_SIZE
+        await sections.aclose()
+
+    assert opened and opened[0].closed
+
+
+async def test_stream_corrupt_pdf_raises_parse_error():
+    with pytest.raises(DocumentParseError):
+        await _collect(b"not a pdf", "application/pdf")
@@ -0,0 +1,273 @@
+import hashlib
+import tempfile
+import tracemalloc
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.services import document_service
+from app.services.document_service import FileTooLargeError, upload_document
+from app.utils.multipart_upload import MultipartError, MultipartFileReader
+
+CHUNK_SIZE = 256 * 1024
+
+
+class _FakeStream:
+    """UploadFile stand-in that produces ``size`` bytes lazily."""
+
+    def __init__(self, size: int):
+        self.remaining = size
+        self.position = 0
+
+    async def read(self, size: int = -1) -> bytes:
+        n = self.remaining if size < 0 else min(size, self.remaining)
+        self.remaining -= n
+        data = bytes((self.position + i) % 251 for i in range(min(n, 251))) * (n // 251 + 1)
+        self.position += n
+        return data[:n]
+
+
+class _FakeBlob:
+    def __init__(self, bucket: "_FakeBucket", name: str):
+        self.bucket = bucket
+        self.name = name
+
+    def open(self, mode: str, chunk_size: int, content_type: str):
+        assert mode == "wb"
+        writer = _FakeWriter(self.bucket, self.name)
+        self.bucket.files[self.name] = writer.handle
+        return writer
+
+
+class _FakeWriter:
+    """BlobWriter stand-in with a resumable session, as after its first chunk is sent."""
+
+    def __init__(self, bucket: "_FakeBucket", name: str):
+        self.handle = tempfile.TemporaryFile()
+        session = SimpleNamespace(resumable_url=f"https://upload/{name}")
+        self._upload_and_transport = (session, SimpleNamespace(delete=bucket.cancelled.append))
+
+    def write(self, data: bytes) -> int:
+        return self.handle.write(data)
+
+    def close(self) -> None:
+        self.handle.close()
+
+
+class _FakeBucket:
+    """Local bucket whose blobs are written to temp files on disk."""
+
+    name = "test-bucket"
+
+    def __init__(self):
+        self.files: dict = {}
+        self.cancelled: list[str] = []
+
+    def blob(self, name: str) -> _FakeBlob:
+        return _FakeBlob(self, name)
+
+
+class _FakeDocRef:
+    async def set(self, data):
+        pass
+
+    def document(self, _id):
+        return self
+
+
+@pytest.fixture
+def bucket():
+    fake = _FakeBucket()
+    with (
+        patch.object(document_service, "get_bucket", lambda: fake),
+        patch.object(document_service, "_get_docs_ref", lambda _user_id: _FakeDocRef()),
+        patch.object(document_service.settings, "UPLOAD_CHUNK_SIZE_BYTES", CHUNK_SIZE),
+    ):
+        yield fake
+
+
+async def _peak_upload_memory(size: int) -> int:
+    tracemalloc.start()
+    try:
+        await upload_document("user-1", "big.txt", _FakeStream(size), max_size=size)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+async def test_upload_records_size_and_hash(bucket):
+    stream = _FakeStream(1_000_000)
+    expected = hashlib.sha256(await _FakeStream(1_000_000).read()).hexdigest()
+    doc = await upload_document("user-1", "notes.txt", stream, max_size=2_000_000)
+
+    assert doc["file_size"] == 1_000_000
+    assert doc["content_hash"] == expected
+    assert doc["status"] == "processing"
+
+
+async def test_upload_peak_memory_is_flat(bucket):
+    small = await _peak_upload_memory(2 * 1024 * 1024)
+    large = await _peak_upload_memory(16 * 1024 * 1024)
+    assert large < 6 * CHUNK_SIZE
+    assert large < small * 1.5
+
+
+async def test_upload_document_stops_copying_past_the_limit(bucket):
+    # A backstop: the route has already refused bodies whose Content-Length is too large
+    stream = _FakeStream(10 * CHUNK_SIZE)
+    with pytest.raises(FileTooLargeError):
+        await upload_document("user-1", "big.txt", stream, max_size=2 * CHUNK_SIZE)
+    # Stopped reading right after crossing the limit
+    assert stream.remaining == 7 * CHUNK_SIZE
+    # The resumable session is cancelled, not left holding the parts already sent
+    (name,) = bucket.files
+    assert bucket.cancelled == [f"https://upload/{name}"]
+
+
+def _multipart(file: bytes, filename: str = "notes.txt") -> tuple[str, bytes]:
+    body = (
+        b'--b\r\nContent-Disposition: form-data; name="note"\r\n\r\nignored\r\n'
+        b'--b\r\nContent-Disposition: form-data; name="file"; filename="'
+        + filename.encode()
+        + b'"\r\nContent-Type: text/plain\r\n\r\n'
+        + file
+        + b"\r\n--b--\r\n"
+    )
+    return "multipart/form-data; boundary=b", body
+
+
+async def _chunked(body: bytes, size: int, sent: list[int]):
+    for i in range(0, len(body), size):
+        sent.append(size)
+        yield body[i : i + size]
+
+
+async def test_multipart_reader_streams_the_file_part():
+    content = bytes(range(256)) * 40
+    content_type, body = _multipart(content)
+    reader = MultipartFileReader(content_type, _chunked(body, 7, []))
+
+    assert await reader.open() == "notes.txt"
+    parts = []
+    while part := await reader.read(1000):
+        parts.append(part)
+    assert b"".join(parts) == content
+    assert max(len(p) for p in parts) == 1000
+
+
+async def test_multipart_reader_rejects_a_truncated_upload():
+    content_type, body = _multipart(b"x" * 100)
+    reader = MultipartFileReader(content_type, _chunked(body[:-30], 16, []))
+
+    assert await reader.open() == "notes.txt"
+    with pytest.raises(MultipartError):
+        await reader.read(1000)
+
+
+async def test_upload_stops_receiving_the_body_past_the_limit(bucket):
+    content_type, body = _multipart(b"x" * (10 * CHUNK_SIZE))
+    sent: list[int] = []
+    reader = MultipartFileReader(content_type, _chunked(body, 64 * 1024, sent))
+    await reader.open()
+
+    with pytest.raises(FileTooLargeError):
+        await upload_document("user-1", "notes.txt", reader, max_size=2 * CHUNK_SIZE)
+
+    # Only about the limit's worth of the body was pulled off the connection
+    assert sum(sent) <= 3 * CHUNK_SIZE + 64 * 1024
+    assert len(bucket.cancelled) == 1
+
+
+@pytest.fixture
+def upload_client(monkeypatch):
+    from app.api.dependencies import get_current_user
+    from app.api.routes import documents
+    from app.main import app
+
+    monkeypatch.setattr(documents.settings, "MAX_FILE_SIZE_MB", 1)
+    queue = SimpleNamespace(pending_count=AsyncMock(return_value=0))
+    upload = AsyncMock(
+        return_value={
+            "id": "doc-1",
+            "filename": "notes.txt",
+            "file_type": ".txt",
+            "file_size": 5,
+            "status": "processing",
+            "created_at": datetime.now(timezone.utc),
+        }
+    )
+    app.dependency_overrides[get_current_user] = lambda: "user-1"
+    with (
+        patch.object(documents, "get_job_queue", lambda: queue),
+        patch.object(documents, "upload_document", upload),
+        patch.object(documents, "enqueue_ingestion", AsyncMock()),
+    ):
+        yield AsyncClient(transport=ASGITransport(app=app), base_url="http://test"), upload
+    app.dependency_overrides.clear()
+
+
+async def test_route_refuses_oversized_body_before_receiving_it(upload_client):
+    http, upload = upload_client
+    received = []
+
+    async def body():
+        received.append(True)
+        yield b"x" * 1024
+
+    response = await http.post(
+        "/api/documents/upload",
+        content=body(),
+        headers={
+            "content-type": "multipart/form-data; boundary=b",
+            "content-length": str(2 * 1024 * 1024),
+        },
+    )
+
+    assert response.status_code == 413
+    assert received == []
+    upload.assert_not_called()
+
+
+async def test_route_accepts_a_multipart_file(upload_client):
+    http, upload = upload_client
+
+    response = await http.post(
+        "/api/documents/upload", files={"file": ("notes.txt", b"hello", "text/plain")}
+    )
+
+    assert response.status_code == 201
+    assert upload.await_args.args[1] == "notes.txt"
+
+
+async def test_route_requires_a_file_part(upload_client):
+    http, upload = upload_client
+
+    response = await http.post("/api/documents/upload", data={"note": "no file here"}, files={})
+
+    assert response.status_code == 400
+    upload.assert_not_called()
+
+
+async def test_upload_rejects_unsupported_extension(bucket):
+    with pytest.raises(ValueError):
+        await upload_document("user-1", "virus.exe", _FakeStream(10), max_size=100)
+
+
+async def test_route_backpressure_is_per_user(upload_client, monkeypatch):
+    from app.api.routes import documents
+
+    http, upload = upload_client
+    monkeypatch.setattr(documents.settings, "INGESTION_QUEUE_MAX_PENDING_PER_USER", 3)
+    queue = documents.get_job_queue()
+    queue.pending_count.return_value = 3
+
+    response = await http.post(
+        "/api/documents/upload", files={"file": ("notes.txt", b"hello", "text/plain")}
+    )
+
+    assert response.status_code == 429
+    queue.pending_count.assert_awaited_with("user-1")
+    upload.assert_not_called()
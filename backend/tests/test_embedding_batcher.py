@@ -0,0 +1,126 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from google.api_core.exceptions import InvalidArgument, ResourceExhausted
+
+from app.services import embedding_batcher
+from app.services.embedding_batcher import EmbeddingCoalescer, embed_texts, pack_batches
+
+
+class _FakeEmbeddingModel:
+    """Returns each text's length as its embedding; can fail the first calls."""
+
+    def __init__(self, failures: list[Exception] | None = None, latency: float = 0.0):
+        self.failures = list(failures or [])
+        self.latency = latency
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def get_embeddings(self, inputs):
+        with self._lock:
+            self.calls += 1
+            if self.failures:
+                raise self.failures.pop(0)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.latency)
+        with self._lock:
+            self.in_flight -= 1
+        return [type("Embedding", (), {"values": [float(len(i.text))]})() for i in inputs]
+
+
+@pytest.fixture
+def fast_retries():
+    with (
+        patch.object(embedding_batcher.settings, "EMBEDDING_RETRY_BASE_DELAY", 0.0),
+        patch.object(embedding_batcher.settings, "EMBEDDING_MAX_RETRIES", 3),
+    ):
+        yield
+
+
+def _use_model(model):
+    return patch.object(embedding_batcher, "get_embedding_model", lambda: model)
+
+
+def test_pack_batches_respects_item_and_token_limits():
+    texts = ["x" * 400] * 5 + ["y" * 4000] + ["z"] * 3  # ~101, ~1001 and 1 tokens
+    batches = pack_batches(texts, max_items=3, max_tokens=1000)
+    assert batches == [[0, 1, 2], [3, 4], [5], [6, 7, 8]]
+
+
+async def test_embed_texts_preserves_order_across_concurrent_batches():
+    model = _FakeEmbeddingModel(latency=0.05)
+    texts = ["a" * n for n in range(1, 41)]
+    with (
+        _use_model(model),
+        patch.object(embedding_batcher.settings, "EMBEDDING_MAX_BATCH_SIZE", 5),
+        patch.object(embedding_batcher.settings, "EMBEDDING_MAX_CONCURRENCY", 3),
+    ):
+        embeddings = await embed_texts(texts, "RETRIEVAL_DOCUMENT")
+
+    assert embeddings == [[float(n)] for n in range(1, 41)]
+    assert model.calls == 8
+    assert model.max_in_flight == 3
+
+
+async def test_embed_texts_retries_throttling(fast_retries):
+    model = _FakeEmbeddingModel(failures=[ResourceExhausted("quota"), ResourceExhausted("quota")])
+    with _use_model(model):
+        embeddings = await embed_texts(["abc"], "RETRIEVAL_DOCUMENT")
+    assert embeddings == [[3.0]]
+    assert model.calls == 3
+
+
+async def test_embed_texts_does_not_retry_client_errors(fast_retries):
+    model = _FakeEmbeddingModel(failures=[InvalidArgument("bad input")])
+    with _use_model(model), pytest.raises(InvalidArgument):
+        await embed_texts(["abc"], "RETRIEVAL_DOCUMENT")
+    assert model.calls == 1
+
+
+class _RecordingModel(_FakeEmbeddingModel):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.batches: list[list[str]] = []
+
+    def get_embeddings(self, inputs):
+        self.batches.append([i.text for i in inputs])
+        return super().get_embeddings(inputs)
+
+
+async def test_coalescer_merges_concurrent_requests():
+    model = _RecordingModel()
+    coalescer = EmbeddingCoalescer("RETRIEVAL_QUERY", max_batch_size=32, max_wait_seconds=0.01)
+    texts = ["a", "bb", "a", "cccc"]
+    with _use_model(model):
+        results = await asyncio.gather(*(coalescer.embed(t) for t in texts))
+
+    assert results == [[1.0], [2.0], [1.0], [4.0]]
+    assert model.batches == [["a", "bb", "cccc"]]
+
+
+async def test_coalescer_flushes_when_batch_is_full():
+    model = _RecordingModel()
+    coalescer = EmbeddingCoalescer("RETRIEVAL_QUERY", max_batch_size=2, max_wait_seconds=10)
+    with _use_model(model):
+        results = await asyncio.wait_for(
+            asyncio.gather(*(coalescer.embed(t) for t in ["a", "bb", "ccc", "dddd"])), 1
+        )
+
+    assert results == [[1.0], [2.0], [3.0], [4.0]]
+    assert model.batches == [["a", "bb"], ["ccc", "dddd"]]
+
+
+async def test_coalescer_propagates_errors_to_every_waiter():
+    model = _FakeEmbeddingModel(failures=[InvalidArgument("bad input")])
+    coalescer = EmbeddingCoalescer("RETRIEVAL_QUERY", max_batch_size=32, max_wait_seconds=0.01)
+    with _use_model(model):
+        results = await asyncio.gather(
+            coalescer.embed("a"), coalescer.embed("b"), return_exceptions=True
+        )
+    assert all(isinstance(r, InvalidArgument) for r in results)
@@ -0,0 +1,71 @@
+from unittest.mock import patch
+
+import pytest
+
+from app.services import ingestion_service
+from app.services.embedding_store import EmbeddingStore, FirestoreEmbeddingStore, embedding_key
+
+
+class _InMemoryEmbeddingStore(EmbeddingStore):
+    def __init__(self):
+        self.entries: dict[str, list[float]] = {}
+
+    async def get_many(self, user_id, keys):
+        return {key: self.entries[key] for key in keys if key in self.entries}
+
+    async def put_many(self, user_id, doc_id, embeddings):
+        self.entries.update(embeddings)
+
+    async def delete_document(self, user_id, doc_id):
+        pass
+
+
+class _RecordingEmbeddingModel:
+    embedded: list[str] = []
+
+    def get_embeddings(self, inputs):
+        type(self).embedded.extend(i.text for i in inputs)
+        return [type("Embedding", (), {"values": [float(len(i.text))]})() for i in inputs]
+
+
+@pytest.fixture
+def embedding_store():
+    store = _InMemoryEmbeddingStore()
+    _RecordingEmbeddingModel.embedded = []
+    with (
+        patch.object(ingestion_service, "get_embedding_store", lambda: store),
+        patch("app.services.embedding_batcher.get_embedding_model", _RecordingEmbeddingModel),
+    ):
+        yield store
+
+
+def test_embedding_key_is_content_addressed():
+    key = embedding_key("same text", "RETRIEVAL_DOCUMENT")
+    assert key == embedding_key("same text", "RETRIEVAL_DOCUMENT")
+    assert key != embedding_key("same text", "RETRIEVAL_QUERY")
+    assert key != embedding_key("other text", "RETRIEVAL_DOCUMENT")
+
+
+async def test_embed_chunks_only_sends_misses(embedding_store, test_user_id):
+    first, hits = await ingestion_service._embed_chunks(test_user_id, "doc-1", ["a", "bb", "a"])
+    assert first == [[1.0], [2.0], [1.0]]
+    assert hits == 1
+    assert _RecordingEmbeddingModel.embedded == ["a", "bb"]
+
+    second, hits = await ingestion_service._embed_chunks(test_user_id, "doc-2", ["bb", "ccc"])
+    assert second == [[2.0], [3.0]]
+    assert hits == 1
+    assert _RecordingEmbeddingModel.embedded == ["a", "bb", "ccc"]
+    assert len(embedding_store.entries) == 3
+
+
+async def test_stored_embeddings_expire_and_go_with_their_document(fake_firestore, test_user_id):
+    store = FirestoreEmbeddingStore()
+    await store.put_many(test_user_id, "doc-1", {"k1": [1.0], "k2": [2.0]})
+    await store.put_many(test_user_id, "doc-2", {"k3": [3.0]})
+    entry = fake_firestore.docs[f"users/{test_user_id}/embedding_cache/k1"]
+    assert entry["expires_at"] > entry["created_at"]
+
+    await store.delete_document(test_user_id, "doc-1")
+
+    assert set(await store.get_many(test_user_id, ["k1", "k2", "k3"])) == {"k3"}
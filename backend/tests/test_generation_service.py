@@ -0,0 +1,76 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from app.services import generation_service
+from app.services.generation_service import GenerationResult, generate_sse_stream
+
+
+class _Response:
+    def __init__(self, text: str | None, finish_reason: str | None = None, usage=None):
+        self._text = text
+        reason = SimpleNamespace(name=finish_reason) if finish_reason else None
+        self.candidates = [SimpleNamespace(finish_reason=reason)]
+        self.usage_metadata = usage
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            raise ValueError("no text part")
+        return self._text
+
+
+class _FakeModel:
+    def __init__(self, responses: list[_Response]):
+        self.responses = responses
+        self.closed = False
+        self.served = 0
+
+    async def generate_content_async(self, contents, generation_config=None, stream=False):
+        async def stream_responses():
+            try:
+                for response in self.responses:
+                    self.served += 1
+                    yield response
+            finally:
+                self.closed = True
+
+        return stream_responses()
+
+
+def _events(raw: list[str]) -> list[dict]:
+    return [json.loads(event.removeprefix("data: ")) for event in raw]
+
+
+async def test_stream_reports_a_structured_result():
+    usage = SimpleNamespace(prompt_token_count=120, candidates_token_count=7)
+    model = _FakeModel(
+        [_Response("Pumps "), _Response("need priming."), _Response(None, "STOP", usage)]
+    )
+    result = GenerationResult()
+
+    with patch.object(generation_service, "get_generation_model", lambda _: model):
+        events = _events([e async for e in generate_sse_stream("q", "ctx", [], result=result)])
+
+    assert [e["type"] for e in events] == ["content", "content", "sources", "done"]
+    assert events[-1]["full_response"] == "Pumps need priming."
+    assert result == GenerationResult(
+        text="Pumps need priming.", finish_reason="STOP", prompt_tokens=120, output_tokens=7
+    )
+    assert model.closed
+
+
+async def test_closing_the_stream_early_cancels_generation():
+    model = _FakeModel([_Response(f"token{i} ") for i in range(100)])
+    result = GenerationResult()
+
+    with patch.object(generation_service, "get_generation_model", lambda _: model):
+        stream = generate_sse_stream("q", "ctx", [], result=result)
+        await anext(stream)
+        await anext(stream)
+        await stream.aclose()
+
+    assert result.cancelled
+    assert result.text == "token0 token1 "
+    assert model.closed
+    assert model.served == 2
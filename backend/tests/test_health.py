@@ -18,3 +18,24 @@ async def test_health_check(mock_firebase):
         response = await client.get("/api/health")
     assert response.status_code == 200
     assert response.json() == {"status": "healthy"}
+
+
+async def test_metrics_require_an_admin(mock_firebase, monkeypatch):
+    from app.api.dependencies import get_current_user
+    from app.main import app
+
+    monkeypatch.setattr("app.api.dependencies.settings.ADMIN_UIDS", "admin-1, admin-2")
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        anonymous = await client.get("/api/metrics")
+        try:
+            app.dependency_overrides[get_current_user] = lambda: "someone"
+            user = await client.get("/api/metrics")
+            app.dependency_overrides[get_current_user] = lambda: "admin-2"
+            admin = await client.get("/api/metrics")
+        finally:
+            app.dependency_overrides.clear()
+
+    assert anonymous.status_code in (401, 403)
+    assert user.status_code == 403
+    assert admin.status_code == 200
+    assert "counters" in admin.json()
@@ -0,0 +1,204 @@
+import asyncio
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from google.api_core import exceptions as gexc
+
+from app.services import snapshot_store
+from app.services.answer_cache import get_corpus_versions
+from app.services.snapshot_store import SnapshotStore
+from app.services.vector_store import FirestoreVectorStore, InMemoryVectorStore
+from app.utils.index_snapshot import IndexSnapshot, SnapshotFormatError, write_snapshot
+
+DIM = 16
+USER = "users/test-user-123"
+
+
+def _vectors(n: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(n, DIM)).astype(np.float32)
+
+
+def _chunks(doc_id: str, vectors: np.ndarray) -> list[dict]:
+    return [
+        {
+            "chunk_id": f"{doc_id}-{i}",
+            "document_id": doc_id,
+            "document_name": f"{doc_id}.txt",
+            "content": f"{doc_id} chunk {i}",
+            "chunk_index": i,
+            "embedding": vector.tolist(),
+        }
+        for i, vector in enumerate(vectors)
+    ]
+
+
+def _write(path: Path, storage: str = "float32") -> np.ndarray:
+    vectors = _vectors(30)
+    rows = [{k: v for k, v in c.items() if k != "embedding"} for c in _chunks("doc", vectors)]
+    for i, row in enumerate(rows):
+        row["document_id"] = f"doc-{i % 3}"
+    write_snapshot(
+        str(path),
+        version=7,
+        synced_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        storage=storage,
+        rows=rows,
+        vectors=vectors,
+    )
+    return vectors
+
+
+@pytest.mark.parametrize("storage", ["float32", "int8"])
+def test_snapshot_is_mapped_and_searched_in_place(tmp_path, storage):
+    vectors = _write(tmp_path / "u.idx", storage)
+
+    snapshot = IndexSnapshot(str(tmp_path / "u.idx"))
+
+    assert (snapshot.version, len(snapshot), snapshot.storage) == (7, 30, storage)
+    assert not snapshot.codes.flags.owndata
+    assert snapshot.row(4) == {
+        "chunk_id": "doc-4",
+        "document_id": "doc-1",
+        "document_name": "doc.txt",
+        "content": "doc chunk 4",
+        "chunk_index": 4,
+    }
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = np.argsort(-(normed @ normed[9]))[:3].tolist()
+    assert [row for row, _ in snapshot.search(vectors[9], 3)] == expected
+
+    deleted = np.zeros(30, dtype=bool)
+    deleted[9] = True
+    scope = snapshot.rows_for_documents(["doc-0"])
+    hits = snapshot.search(vectors[9], 5, rows=scope, deleted=deleted)
+    assert {row for row, _ in hits} <= set(range(0, 30, 3)) - {9}
+
+
+def test_corrupt_snapshot_is_rejected(tmp_path):
+    path = tmp_path / "u.idx"
+    path.write_bytes(b"not a snapshot at all")
+
+    with pytest.raises(SnapshotFormatError):
+        IndexSnapshot(str(path))
+
+
+class _FakeBlob:
+    def __init__(self, objects: dict[str, bytes], name: str):
+        self.objects = objects
+        self.name = name
+
+    def upload_from_filename(self, path: str) -> None:
+        self.objects[self.name] = Path(path).read_bytes()
+
+    def download_to_filename(self, path: str) -> None:
+        if self.name not in self.objects:
+            raise gexc.NotFound(self.name)
+        Path(path).write_bytes(self.objects[self.name])
+
+
+class _FakeBucket:
+    def __init__(self):
+        self.objects: dict[str, bytes] = {}
+
+    def blob(self, name: str) -> _FakeBlob:
+        return _FakeBlob(self.objects, name)
+
+
+@pytest.fixture
+def bucket():
+    fake = _FakeBucket()
+    with patch.object(snapshot_store, "get_bucket", lambda: fake):
+        yield fake
+
+
+def _instance(tmp_path: Path, name: str) -> InMemoryVectorStore:
+    """A fresh process: its own empty index and local snapshot directory."""
+    return InMemoryVectorStore(
+        FirestoreVectorStore(), snapshots=SnapshotStore(str(tmp_path / name))
+    )
+
+
+async def _settle(store: InMemoryVectorStore) -> None:
+    await asyncio.gather(*store._tasks)
+
+
+def _same_results(actual: list[dict], expected: list[dict]) -> bool:
+    return [r["chunk_id"] for r in actual] == [r["chunk_id"] for r in expected] and np.allclose(
+        [r["distance"] for r in actual], [r["distance"] for r in expected], atol=1e-5
+    )
+
+
+async def test_cold_start_loads_snapshot_and_catches_up(
+    fake_firestore, bucket, tmp_path, test_user_id, monkeypatch
+):
+    monkeypatch.setattr("app.services.vector_store.settings.EMBEDDING_DIMENSION", DIM)
+    vectors = _vectors(30)
+    for doc_id in ("doc-a", "doc-b", "doc-c"):
+        fake_firestore.put(f"{USER}/documents/{doc_id}", {"status": "ready"})
+    durable = FirestoreVectorStore()
+    await durable.add_chunks(test_user_id, _chunks("doc-a", vectors[:10]))
+    await durable.add_chunks(test_user_id, _chunks("doc-b", vectors[10:20]))
+
+    first = _instance(tmp_path, "first")
+    expected = await first.search(test_user_id, vectors[3].tolist(), 5)
+    await _settle(first)
+    assert bucket.objects
+
+    # A new instance maps the snapshot instead of streaming the chunks
+    queries = fake_firestore.queries
+    second = _instance(tmp_path, "second")
+    assert _same_results(await second.search(test_user_id, vectors[3].tolist(), 5), expected)
+    assert fake_firestore.queries == queries
+    assert second._indexes[test_user_id].base is not None
+
+    # The corpus moves on: doc-c is ingested and doc-b is being deleted
+    await durable.add_chunks(test_user_id, _chunks("doc-c", vectors[20:]))
+    fake_firestore.put(f"{USER}/documents/doc-b", {"status": "deleting"})
+    await get_corpus_versions().bump(test_user_id)
+
+    third = _instance(tmp_path, "second")
+    results = await third.search(test_user_id, vectors[25].tolist(), 30)
+    await _settle(third)
+    assert results[0]["chunk_id"] == "doc-c-5"
+    assert {r["document_id"] for r in results} == {"doc-a", "doc-c"}
+
+    # The caught-up snapshot was saved, so the next instance needs no refresh
+    fourth = _instance(tmp_path, "fourth")
+    assert _same_results(await fourth.search(test_user_id, vectors[25].tolist(), 30), results)
+    assert fourth._indexes[test_user_id].rows == {}
+
+
+async def test_quantized_snapshot_rescores_from_its_exact_vectors(
+    fake_firestore, bucket, tmp_path, test_user_id, monkeypatch
+):
+    monkeypatch.setattr("app.services.vector_store.settings.EMBEDDING_DIMENSION", DIM)
+    vectors = _vectors(60)
+    fake_firestore.put(f"{USER}/documents/doc", {"status": "ready"})
+    durable = FirestoreVectorStore()
+    await durable.add_chunks(test_user_id, _chunks("doc", vectors))
+    first = InMemoryVectorStore(
+        durable, storage="int8", snapshots=SnapshotStore(str(tmp_path / "first"))
+    )
+    await first.save_snapshot(test_user_id)
+    await _settle(first)
+
+    async def no_durable_reads(*args, **kwargs):
+        raise AssertionError("rescoring read from the durable store")
+
+    monkeypatch.setattr(durable, "get_chunks", no_durable_reads)
+    second = InMemoryVectorStore(
+        durable, storage="int8", snapshots=SnapshotStore(str(tmp_path / "second"))
+    )
+    query = _vectors(1, seed=5)[0]
+    results = await second.search(test_user_id, query.tolist(), 5)
+
+    base = second._indexes[test_user_id].base
+    assert base is not None and base.exact is not None
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    similarities = normed @ (query / np.linalg.norm(query))
+    expected = np.argsort(-similarities)[:5]
+    assert [r["chunk_id"] for r in results] == [f"doc-{i}" for i in expected]
+    assert np.allclose([r["distance"] for r in results], 1 - similarities[expected], atol=1e-5)
@@ -0,0 +1,135 @@
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.services import ingestion_service
+from app.utils.document_parsers import DocumentParseError
+
+USER_ID = "user-1"
+DOC_ID = "doc-1"
+
+
+class FakeVectorStore:
+    def __init__(self, events: list[str]):
+        self.events = events
+        self.batches: list[list[dict]] = []
+
+    async def add_chunks(self, user_id: str, chunks: list[dict]) -> None:
+        self.events.append("write")
+        self.batches.append(chunks)
+
+    async def save_snapshot(self, user_id: str) -> None:
+        pass
+
+
+class FakeBlob:
+    def __init__(self, content: bytes, downloads: list[str]):
+        self.content = content
+        self.downloads = downloads
+
+    def download_to_filename(self, path: str) -> None:
+        self.downloads.append(path)
+        Path(path).write_bytes(self.content)
+
+
+async def fake_embed_texts(texts: list[str], task_type: str) -> list[list[float]]:
+    return [[float(len(text)), 1.0] for text in texts]
+
+
+@pytest.fixture
+def env():
+    """Run ``ingest_document`` against in-memory fakes; yields the recorded state."""
+    events: list[str] = []
+    downloads: list[str] = []
+    state = {
+        "events": events,
+        "downloads": downloads,
+        "content": b"",
+        "vector_store": FakeVectorStore(events),
+        "status": AsyncMock(),
+        "document": AsyncMock(return_value={"id": DOC_ID, "status": "processing"}),
+    }
+    snapshot = MagicMock(exists=True)
+    snapshot.to_dict.return_value = {
+        "gcs_path": "users/user-1/documents/doc-1/notes.txt",
+        "filename": "notes.txt",
+        "content_type": "text/plain",
+    }
+    db = MagicMock()
+    doc_ref = db.collection.return_value.document.return_value.collection.return_value.document
+    doc_ref.return_value.get = AsyncMock(return_value=snapshot)
+    bucket = MagicMock()
+    bucket.blob.side_effect = lambda path: FakeBlob(state["content"], downloads)
+
+    with (
+        patch.object(ingestion_service, "get_firestore_client", lambda: db),
+        patch.object(ingestion_service, "get_bucket", lambda: bucket),
+        patch.object(ingestion_service, "embed_texts", fake_embed_texts),
+        patch.object(ingestion_service, "get_vector_store", lambda: state["vector_store"]),
+        patch.object(ingestion_service, "update_document_status", state["status"]),
+        patch.object(ingestion_service, "get_document", state["document"]),
+        patch.object(ingestion_service, "bump_corpus_version", AsyncMock()),
+        patch.object(ingestion_service.settings, "CHUNK_EMBEDDING_CACHE_ENABLED", False),
+        patch.object(ingestion_service.settings, "INGESTION_PIPELINE_BATCH_SIZE", 4),
+        patch.object(ingestion_service.settings, "INGESTION_PIPELINE_QUEUE_SIZE", 1),
+    ):
+        yield state
+
+
+async def test_pipeline_writes_all_chunks_in_batches(env):
+    env["content"] = " ".join(f"word{i}" for i in range(5000)).encode()
+    await ingestion_service.ingest_document(USER_ID, DOC_ID)
+
+    batches = env["vector_store"].batches
+    assert len(batches) > 1
+    assert all(len(batch) <= 4 for batch in batches)
+    indices = sorted(chunk["chunk_index"] for batch in batches for chunk in batch)
+    assert indices == list(range(len(indices)))
+    assert all(
+        chunk["chunk_id"] == f"{DOC_ID}_{chunk['chunk_index']}" for b in batches for chunk in b
+    )
+    env["status"].assert_awaited_once_with(USER_ID, DOC_ID, "ready", chunk_count=len(indices))
+    # The downloaded copy is removed once ingestion finishes
+    assert not Path(env["downloads"][0]).exists()
+
+
+async def test_first_chunks_are_written_before_parsing_finishes(env):
+    async def slow_pages(source, content_type):
+        for page in range(30):
+            yield " ".join(f"page{page}word{w}" for w in range(200))
+        env["events"].append("parsed")
+
+    with patch.object(ingestion_service, "stream_document", slow_pages):
+        await ingestion_service.ingest_document(USER_ID, DOC_ID)
+
+    assert env["events"].index("write") < env["events"].index("parsed")
+
+
+async def test_unparseable_document_is_marked_error_without_retry(env):
+    async def broken(source, content_type):
+        raise DocumentParseError("Could not open PDF")
+        yield  # pragma: no cover
+
+    with patch.object(ingestion_service, "stream_document", broken):
+        await ingestion_service.ingest_document(USER_ID, DOC_ID)
+
+    env["status"].assert_awaited_once_with(USER_ID, DOC_ID, "error")
+    assert env["vector_store"].batches == []
+
+
+async def test_empty_document_is_marked_error(env):
+    env["content"] = b"   \n  "
+    await ingestion_service.ingest_document(USER_ID, DOC_ID)
+    env["status"].assert_awaited_once_with(USER_ID, DOC_ID, "error")
+
+
+async def test_ingestion_stops_writing_once_the_document_is_deleted(env):
+    env["content"] = " ".join(f"word{i}" for i in range(5000)).encode()
+    # Deleted after the first two write batches
+    env["document"].side_effect = [{"id": DOC_ID}, {"id": DOC_ID}] + [None] * 1000
+
+    await ingestion_service.ingest_document(USER_ID, DOC_ID)
+
+    assert len(env["vector_store"].batches) == 2
+    env["status"].assert_not_awaited()
@@ -0,0 +1,121 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.services.ingestion_worker import IngestionWorkerPool
+from app.services.job_queue import FAILED, QUEUED, RUNNING, SUCCEEDED, SQLiteJobQueue
+
+
+@pytest.fixture
+def queue():
+    return SQLiteJobQueue(":memory:", lease_seconds=60)
+
+
+@pytest.fixture
+def mark_document():
+    with patch(
+        "app.services.ingestion_worker.update_document_status", new_callable=AsyncMock
+    ) as mock:
+        yield mock
+
+
+async def _wait_for_status(queue, job_id: str, status: str, timeout: float = 2.0) -> None:
+    async def poll():
+        while (await queue.get(job_id)).status != status:
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(poll(), timeout)
+
+
+def _pool(queue, handler, **kwargs) -> IngestionWorkerPool:
+    options = {"concurrency": 2, "retry_base_delay": 0.0, "poll_interval": 0.01, **kwargs}
+    return IngestionWorkerPool(queue, handler=handler, **options)
+
+
+async def test_job_runs_to_completion(queue, mark_document):
+    handler = AsyncMock()
+    pool = _pool(queue, handler)
+    await queue.enqueue("user-1", "doc-1")
+    await pool.start()
+    try:
+        await _wait_for_status(queue, "doc-1", SUCCEEDED)
+    finally:
+        await pool.stop()
+    handler.assert_awaited_once_with("user-1", "doc-1")
+    mark_document.assert_not_awaited()
+
+
+async def test_failed_job_is_retried(queue, mark_document):
+    handler = AsyncMock(side_effect=[RuntimeError("transient"), None])
+    pool = _pool(queue, handler)
+    await queue.enqueue("user-1", "doc-1")
+    await pool.start()
+    try:
+        await _wait_for_status(queue, "doc-1", SUCCEEDED)
+    finally:
+        await pool.stop()
+    job = await queue.get("doc-1")
+    assert job.attempts == 2
+    assert job.last_error == "RuntimeError: transient"
+
+
+async def test_job_fails_after_max_attempts(queue, mark_document):
+    handler = AsyncMock(side_effect=RuntimeError("broken"))
+    pool = _pool(queue, handler, max_attempts=3)
+    await queue.enqueue("user-1", "doc-1")
+    await pool.start()
+    try:
+        await _wait_for_status(queue, "doc-1", FAILED)
+    finally:
+        await pool.stop()
+    assert handler.await_count == 3
+    mark_document.assert_awaited_once_with("user-1", "doc-1", "error")
+
+
+async def test_concurrency_is_bounded(queue, mark_document):
+    in_flight = 0
+    peak = 0
+
+    async def handler(user_id, doc_id):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+
+    pool = _pool(queue, handler, concurrency=2)
+    for i in range(6):
+        await queue.enqueue("user-1", f"doc-{i}")
+    await pool.start()
+    try:
+        for i in range(6):
+            await _wait_for_status(queue, f"doc-{i}", SUCCEEDED)
+    finally:
+        await pool.stop()
+    assert peak == 2
+
+
+async def test_expired_lease_is_recovered(mark_document):
+    queue = SQLiteJobQueue(":memory:", lease_seconds=0)
+    await queue.enqueue("user-1", "doc-1")
+    # A worker claims the job and then dies without renewing its lease
+    [job] = await queue.claim(1)
+    assert (await queue.get("doc-1")).status == RUNNING
+
+    assert await queue.recover() == 1
+    job = await queue.get("doc-1")
+    assert job.status == QUEUED
+    assert job.attempts == 1
+    assert await queue.pending_count() == 1
+
+
+async def test_pending_count_is_per_user():
+    queue = SQLiteJobQueue(":memory:", lease_seconds=60)
+    for i in range(3):
+        await queue.enqueue("bulk-user", f"doc-{i}")
+    await queue.enqueue("user-2", "doc-x")
+
+    assert await queue.pending_count() == 4
+    assert await queue.pending_count("bulk-user") == 3
+    assert await queue.pending_count("user-2") == 1
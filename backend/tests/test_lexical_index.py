@@ -0,0 +1,213 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.services import retrieval_service
+from app.services.answer_cache import bump_corpus_version
+from app.services.lexical_index import get_lexical_index, reciprocal_rank_fusion
+from app.utils.bm25 import BM25Index, tokenize
+
+USER = "users/test-user-123"
+
+
+def test_tokenize_keeps_identifiers_and_their_parts():
+    assert tokenize("Error E-1042 in v2.3") == [
+        "error",
+        "e-1042",
+        "in",
+        "v2.3",
+        "e",
+        "1042",
+        "v2",
+        "3",
+    ]
+
+
+def test_bm25_ranks_rarer_terms_higher():
+    index = BM25Index()
+    index.add_batch(
+        [
+            ("a", "d1", "the pump failed with error E-1042"),
+            ("b", "d1", "the pump runs fine"),
+            ("c", "d2", "the valve is closed"),
+        ]
+    )
+
+    result = index.search("pump E-1042", k=3)
+
+    assert [key for key, _ in result.hits] == ["a", "b"]
+    assert result.all_terms_known
+    assert result.exact_matches == 1
+    assert result.query_terms == 2
+    assert result.confidence == 1.0
+    assert index.search("pump valve", k=3).confidence < 1.0
+    assert [key for key, _ in index.search("pump", k=3, groups=["d2"]).hits] == []
+
+
+def test_bm25_remove_group_and_compact():
+    index = BM25Index()
+    index.add_batch([(f"d1_{i}", "d1", f"alpha {i}") for i in range(3)])
+    index.add_batch([("d2_0", "d2", "alpha beta")])
+    index.add("d2_0", "d2", "beta only")  # replaces the earlier entry
+
+    index.remove_group("d1")
+
+    assert len(index) == 1
+    assert index.search("alpha", k=5).hits == []
+    assert [key for key, _ in index.search("beta", k=5).hits] == ["d2_0"]
+    index.compact()
+    assert [key for key, _ in index.search("beta", k=5).hits] == ["d2_0"]
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a"]], k=60)
+    assert [key for key, _ in fused] == ["a", "c", "b"]
+
+
+def _seed(db):
+    rows = {
+        "d1_0": ("manual.pdf", "Reset the controller after fault E-1042 appears.", [0.0, 1.0]),
+        "d1_1": ("manual.pdf", "Routine maintenance of the intake filter.", [1.0, 0.0]),
+        "d2_0": ("notes.txt", "The intake filter should be cleaned monthly.", [0.9, 0.1]),
+    }
+    for chunk_id, (name, content, embedding) in rows.items():
+        db.put(
+            f"{USER}/chunks/{chunk_id}",
+            {
+                "document_id": chunk_id.split("_")[0],
+                "document_name": name,
+                "content": content,
+                "chunk_index": int(chunk_id.split("_")[1]),
+                "embedding": embedding,
+            },
+        )
+
+
+async def test_exact_identifier_query_skips_embedding(fake_firestore, test_user_id):
+    _seed(fake_firestore)
+    await get_lexical_index().load(test_user_id)
+    embed = AsyncMock()
+
+    with patch.object(retrieval_service, "embed_query", embed):
+        chunks = await retrieval_service.retrieve_relevant_chunks(test_user_id, "E-1042", top_k=2)
+
+    embed.assert_not_called()
+    assert [c["chunk_id"] for c in chunks] == ["d1_0"]
+    assert chunks[0]["distance"] is None
+    assert chunks[0]["lexical_score"] > 0
+    assert chunks[0]["score"] == 1.0
+
+
+async def test_keyword_lookup_predicts_the_fast_path(fake_firestore, test_user_id):
+    _seed(fake_firestore)
+    await get_lexical_index().load(test_user_id)
+
+    keyword = await retrieval_service.search_lexical(test_user_id, "E-1042")
+    question = await retrieval_service.search_lexical(
+        test_user_id, "how do I clear fault E-1042 on the intake"
+    )
+
+    assert retrieval_service.is_keyword_lookup(keyword)
+    assert not retrieval_service.is_keyword_lookup(question)
+
+
+async def test_retrieval_reuses_the_lexical_hits_it_is_given(fake_firestore, test_user_id):
+    _seed(fake_firestore)
+    index = get_lexical_index()
+    await index.load(test_user_id)
+    search = AsyncMock(wraps=index.search)
+
+    with (
+        patch.object(index, "search", search),
+        patch.object(retrieval_service, "embed_query", AsyncMock()),
+    ):
+        lexical = await retrieval_service.search_lexical(test_user_id, "E-1042")
+        chunks = await retrieval_service.retrieve_relevant_chunks(
+            test_user_id, "E-1042", lexical=lexical
+        )
+
+    assert search.await_count == 1
+    assert [c["chunk_id"] for c in chunks] == ["d1_0"]
+
+
+async def test_hybrid_search_fuses_lexical_only_hits(fake_firestore, test_user_id):
+    _seed(fake_firestore)
+    await get_lexical_index().load(test_user_id)
+    # Points away from the E-1042 chunk, which only BM25 finds
+    embed = AsyncMock(return_value=[1.0, 0.0])
+
+    with patch.object(retrieval_service, "embed_query", embed):
+        chunks = await retrieval_service.retrieve_relevant_chunks(
+            test_user_id, "how do I clear fault E-1042 on the intake", top_k=2
+        )
+
+    embed.assert_awaited_once()
+    # Plain vector search would return d1_1 and d2_0
+    ids = [c["chunk_id"] for c in chunks]
+    assert "d1_0" in ids
+    # Scored against the query after fusion, and kept below the score threshold
+    lexical_only = next(c for c in chunks if c["chunk_id"] == "d1_0")
+    assert lexical_only["distance"] == pytest.approx(1.0)
+    assert lexical_only["lexical_score"] > 0
+    assert "embedding" not in lexical_only
+
+
+async def test_ingested_chunks_update_a_loaded_index(fake_firestore, test_user_id):
+    _seed(fake_firestore)
+    await get_lexical_index().load(test_user_id)
+    store = get_lexical_index()
+    assert (await store.search(test_user_id, "gasket", 5)).hits == []
+
+    await store.add_chunks(
+        test_user_id,
+        [{"chunk_id": "d3_0", "document_id": "d3", "content": "Replace the gasket yearly."}],
+    )
+    assert [k for k, _ in (await store.search(test_user_id, "gasket", 5)).hits] == ["d3_0"]
+
+    await store.delete_document(test_user_id, "d3")
+    assert (await store.search(test_user_id, "gasket", 5)).hits == []
+
+
+async def test_index_is_built_off_the_request_path(fake_firestore, test_user_id):
+    _seed(fake_firestore)
+    store = get_lexical_index()
+
+    # The first search doesn't wait for the build; it just has no BM25 hits
+    assert (await store.search(test_user_id, "E-1042", 5)).hits == []
+    await store.load(test_user_id)
+    assert [k for k, _ in (await store.search(test_user_id, "E-1042", 5)).hits] == ["d1_0"]
+
+
+async def test_index_catches_up_with_changes_from_other_instances(
+    fake_firestore, test_user_id, monkeypatch
+):
+    _seed(fake_firestore)
+    for doc_id in ("d1", "d2"):
+        fake_firestore.put(f"{USER}/documents/{doc_id}", {"status": "ready"})
+    store = get_lexical_index()
+    await store.load(test_user_id)
+    monkeypatch.setattr(store, "max_age_seconds", 0)
+
+    # Another instance ingests d3 and deletes d2
+    await retrieval_service.get_vector_store().add_chunks(
+        test_user_id,
+        [
+            {
+                "chunk_id": "d3_0",
+                "document_id": "d3",
+                "document_name": "gaskets.txt",
+                "content": "Replace the gasket yearly.",
+                "chunk_index": 0,
+                "embedding": [0.5, 0.5],
+            }
+        ],
+    )
+    fake_firestore.put(f"{USER}/documents/d3", {"status": "ready"})
+    del fake_firestore.docs[f"{USER}/documents/d2"]
+    await bump_corpus_version(test_user_id)
+
+    await store.search(test_user_id, "gasket", 5)
+    await store.load(test_user_id)
+
+    assert [k for k, _ in (await store.search(test_user_id, "gasket", 5)).hits] == ["d3_0"]
+    assert (await store.search(test_user_id, "monthly", 5)).hits == []
@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services.chat_service import get_chat_messages
+from app.services.document_service import DELETING, list_documents
+from app.utils.pagination import InvalidPageTokenError, decode_page_token, encode_page_token
+
+USER = "users/test-user-123"
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _put_document(db, doc_id: str, created_at: datetime, status: str = "ready") -> None:
+    db.put(
+        f"{USER}/documents/{doc_id}",
+        {
+            "filename": f"{doc_id}.txt",
+            "file_type": "txt",
+            "file_size": 1,
+            "status": status,
+            "chunk_count": 1,
+            "created_at": created_at,
+        },
+    )
+
+
+def test_page_token_round_trip():
+    token = encode_page_token(START, "doc-1")
+
+    assert decode_page_token(token) == (START, "doc-1")
+
+
+@pytest.mark.parametrize("token", ["not-a-token", "", "W10", encode_page_token(START, "x")[:-3]])
+def test_malformed_page_token_is_rejected(token):
+    with pytest.raises(InvalidPageTokenError):
+        decode_page_token(token)
+
+
+async def test_documents_page_newest_first_without_gaps(fake_firestore, test_user_id):
+    # Ties on created_at are broken by document id, so none are skipped or repeated
+    for i in range(7):
+        _put_document(fake_firestore, f"doc-{i}", START + timedelta(seconds=i // 2))
+
+    seen = []
+    token = None
+    while True:
+        page = await list_documents(test_user_id, 3, token)
+        seen.extend(d["id"] for d in page.items)
+        token = page.next_page_token
+        if token is None:
+            break
+
+    assert seen == ["doc-6", "doc-5", "doc-4", "doc-3", "doc-2", "doc-1", "doc-0"]
+
+
+async def test_documents_being_deleted_are_skipped(fake_firestore, test_user_id):
+    _put_document(fake_firestore, "doc-0", START)
+    _put_document(fake_firestore, "doc-1", START + timedelta(seconds=1), status=DELETING)
+    _put_document(fake_firestore, "doc-2", START + timedelta(seconds=2))
+
+    first = await list_documents(test_user_id, 2)
+    second = await list_documents(test_user_id, 2, first.next_page_token)
+
+    assert [d["id"] for d in first.items] == ["doc-2"]
+    assert [d["id"] for d in second.items] == ["doc-0"]
+    assert second.next_page_token is None
+
+
+async def test_messages_page_oldest_first(fake_firestore, test_user_id):
+    for i in range(5):
+        fake_firestore.put(
+            f"{USER}/chats/chat-1/messages/m{i}",
+            {"role": "user", "content": f"message {i}", "created_at": START + timedelta(seconds=i)},
+        )
+
+    first = await get_chat_messages(test_user_id, "chat-1", 4)
+    second = await get_chat_messages(test_user_id, "chat-1", 4, first.next_page_token)
+
+    assert [m["content"] for m in first.items] == [f"message {i}" for i in range(4)]
+    assert [m["content"] for m in second.items] == ["message 4"]
+    assert second.next_page_token is None
+
+
+async def test_messages_page_newest_first(fake_firestore, test_user_id):
+    for i in range(5):
+        fake_firestore.put(
+            f"{USER}/chats/chat-1/messages/m{i}",
+            {"role": "user", "content": f"message {i}", "created_at": START + timedelta(seconds=i)},
+        )
+
+    latest = await get_chat_messages(test_user_id, "chat-1", 3, newest_first=True)
+    earlier = await get_chat_messages(
+        test_user_id, "chat-1", 3, latest.next_page_token, newest_first=True
+    )
+
+    assert [m["content"] for m in latest.items] == ["message 2", "message 3", "message 4"]
+    assert [m["content"] for m in earlier.items] == ["message 0", "message 1"]
+    assert earlier.next_page_token is None
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from app.services.vector_store import FirestoreVectorStore, InMemoryVectorStore
+from app.utils.ivf import IVFIndex
+from app.utils.quantization import dequantize, quantize
+
+DIM = 32
+USER = "users/test-user-123"
+
+
+def _vectors(n: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(n, DIM)).astype(np.float32)
+
+
+def _chunks(doc_id: str, vectors: np.ndarray) -> list[dict]:
+    return [
+        {
+            "chunk_id": f"{doc_id}-{i}",
+            "document_id": doc_id,
+            "document_name": f"{doc_id}.txt",
+            "content": f"chunk {i}",
+            "chunk_index": i,
+            "embedding": vector.tolist(),
+        }
+        for i, vector in enumerate(vectors)
+    ]
+
+
+@pytest.mark.parametrize("fmt, tolerance", [("float32", 0), ("float16", 1e-3), ("int8", 1e-2)])
+def test_quantize_round_trip(fmt, tolerance):
+    vectors = _vectors(4)
+
+    decoded = dequantize(*quantize(vectors, fmt))
+
+    assert decoded.dtype == np.float32
+    assert np.max(np.abs(decoded - vectors)) <= tolerance * np.max(np.abs(vectors))
+
+
+def test_quantize_keeps_zero_vectors():
+    codes, scales = quantize(np.zeros((2, DIM), dtype=np.float32), "int8")
+
+    assert not dequantize(codes, scales).any()
+
+
+def test_int8_index_recall_and_memory():
+    vectors = _vectors(2000)
+    exact = IVFIndex(DIM, min_train_size=10**6)
+    quantized = IVFIndex(DIM, min_train_size=10**6, storage="int8")
+    exact.add_batch(vectors)
+    quantized.add_batch(vectors)
+
+    hits = 0
+    for query in _vectors(50, seed=1):
+        expected = {label for label, _ in exact.search(query, 10)}
+        hits += len(expected & {label for label, _ in quantized.search(query, 10)})
+
+    assert hits / 500 > 0.9
+    assert quantized.nbytes < exact.nbytes / 2
+
+
+def _expected(vectors: np.ndarray, query: np.ndarray, k: int) -> tuple[list[str], np.ndarray]:
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    similarities = normed @ (query / np.linalg.norm(query))
+    top = np.argsort(-similarities)[:k]
+    names = [f"old-{i}" if i < 50 else f"new-{i - 50}" for i in top]
+    return names, 1 - similarities[top]
+
+
+async def _no_durable_reads(*args, **kwargs):
+    raise AssertionError("rescoring read from the durable store")
+
+
+async def test_quantized_memory_store_rescores_exactly(fake_firestore, test_user_id, monkeypatch):
+    monkeypatch.setattr("app.services.vector_store.settings.EMBEDDING_DIMENSION", DIM)
+    vectors = _vectors(200)
+    durable = FirestoreVectorStore()
+    await durable.add_chunks(test_user_id, _chunks("old", vectors[:50]))
+    store = InMemoryVectorStore(durable, storage="int8", rescore_multiplier=4)
+    await store.search(test_user_id, vectors[0].tolist(), 1)
+    await store.add_chunks(test_user_id, _chunks("new", vectors[50:]))
+    monkeypatch.setattr(durable, "get_chunks", _no_durable_reads)
+
+    query = _vectors(1, seed=5)[0]
+    results = await store.search(test_user_id, query.tolist(), 5)
+
+    names, distances = _expected(vectors, query, 5)
+    assert [r["chunk_id"] for r in results] == names
+    assert np.allclose([r["distance"] for r in results], distances, atol=1e-5)
+    assert "embedding" not in results[0]
+    # Firestore holds just the full vector; no packed copy alongside it
+    assert set(fake_firestore.docs[f"{USER}/chunks/new-0"]) == {
+        "document_id",
+        "document_name",
+        "content",
+        "embedding",
+        "chunk_index",
+        "created_at",
+    }
@@ -0,0 +1,106 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.services import retrieval_service
+from app.services.retrieval_service import build_context
+from app.utils.mmr import mmr_select
+
+USER = "users/test-user-123"
+
+
+def test_mmr_skips_near_duplicates():
+    candidates = [[1.0, 0.0, 0.0], [0.99, 0.01, 0.0], [0.7, 0.0, 0.7]]
+
+    assert mmr_select([1.0, 0.0, 0.0], candidates, k=2, lambda_mult=0.3) == [0, 2]
+    assert mmr_select([1.0, 0.0, 0.0], candidates, k=2, lambda_mult=1.0) == [0, 1]
+    assert mmr_select([1.0, 0.0, 0.0], [], k=2) == []
+
+
+@pytest.fixture
+def seeded(fake_firestore):
+    rows = {
+        "a_0": [1.0, 0.0, 0.0],
+        "a_1": [0.99, 0.02, 0.0],  # overlaps a_0 almost entirely
+        "b_0": [0.8, 0.0, 0.6],
+        "c_0": [0.0, 1.0, 0.0],  # unrelated to the query
+    }
+    for chunk_id, embedding in rows.items():
+        fake_firestore.put(
+            f"{USER}/chunks/{chunk_id}",
+            {
+                "document_id": chunk_id[0],
+                "document_name": f"{chunk_id[0]}.txt",
+                "content": f"text {chunk_id}",
+                "chunk_index": int(chunk_id[-1]),
+                "embedding": embedding,
+            },
+        )
+    with (
+        patch.object(retrieval_service, "embed_query", AsyncMock(return_value=[1.0, 0.0, 0.0])),
+        patch.object(retrieval_service.settings, "HYBRID_SEARCH_ENABLED", False),
+    ):
+        yield fake_firestore
+
+
+async def test_results_carry_similarity_scores_above_threshold(seeded, test_user_id):
+    with patch.object(retrieval_service.settings, "MMR_ENABLED", False):
+        chunks = await retrieval_service.retrieve_relevant_chunks(test_user_id, "q", top_k=4)
+
+    assert [c["chunk_id"] for c in chunks] == ["a_0", "a_1", "b_0"]
+    assert chunks[0]["score"] == pytest.approx(1.0)
+    assert chunks[2]["score"] == pytest.approx(0.8)
+    assert all(c["score"] == pytest.approx(1 - c["distance"]) for c in chunks)
+
+
+async def test_mmr_prefers_diverse_chunks(seeded, test_user_id):
+    with patch.object(retrieval_service.settings, "MMR_LAMBDA", 0.3):
+        chunks = await retrieval_service.retrieve_relevant_chunks(test_user_id, "q", top_k=2)
+
+    assert [c["chunk_id"] for c in chunks] == ["a_0", "b_0"]
+    assert all("embedding" not in c for c in chunks)
+
+
+def _chunk(doc_id: str, index: int, content: str, score: float) -> dict:
+    return {
+        "chunk_id": f"{doc_id}_{index}",
+        "document_id": doc_id,
+        "document_name": f"{doc_id}.txt",
+        "content": content,
+        "chunk_index": index,
+        "score": score,
+    }
+
+
+def test_build_context_merges_adjacent_chunks_and_numbers_by_score():
+    chunks = [
+        _chunk("a", 1, "the pump must be primed before starting the motor.", 0.7),
+        _chunk("b", 4, "Valves are inspected yearly.", 0.8),
+        _chunk("a", 0, "Before first use, the pump must be primed", 0.9),
+    ]
+
+    context = build_context(chunks, max_tokens=1000)
+
+    assert [s["chunk_id"] for s in context.sources] == ["a_0", "b_4"]
+    assert context.sources[0]["content"] == (
+        "Before first use, the pump must be primed before starting the motor."
+    )
+    assert context.sources[0]["score"] == 0.9
+    assert context.text.startswith("[Source 1 - a.txt]\nBefore first use")
+    assert "[Source 2 - b.txt]\nValves" in context.text
+
+
+def test_build_context_truncates_lowest_scored_sources_first():
+    chunks = [
+        _chunk("a", 0, "alpha " * 200, 0.9),
+        _chunk("b", 0, "beta " * 200, 0.8),
+        _chunk("c", 0, "gamma " * 200, 0.7),
+    ]
+
+    context = build_context(chunks, max_tokens=450)
+
+    assert [s["document_id"] for s in context.sources] == ["a", "b"]
+    assert context.sources[0]["content"] == chunks[0]["content"]
+    assert context.sources[1]["content"].endswith("…")
+    assert context.tokens <= 450
+    assert "gamma" not in context.text
@@ -0,0 +1,65 @@
+import asyncio
+import subprocess
+import sys
+
+from httpx import ASGITransport, AsyncClient
+
+from app.api.routes import health
+from app.services.warmup import Warmup
+
+
+def test_importing_app_defers_heavy_sdks():
+    code = (
+        "import sys, app.main\n"
+        "heavy = ('vertexai', 'fitz', 'docx', 'langchain_text_splitters')\n"
+        "print(sorted(m for m in heavy if m in sys.modules))\n"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert proc.stdout.strip() == "[]"
+
+
+async def test_ready_reports_starting_until_warm(monkeypatch):
+    from app.main import app
+
+    release = asyncio.Event()
+
+    async def slow() -> None:
+        await release.wait()
+
+    async def broken() -> None:
+        raise RuntimeError("no credentials")
+
+    warmup = Warmup({"slow": slow, "broken": broken}, timeout=5)
+    monkeypatch.setattr(health, "get_warmup", lambda: warmup)
+    await warmup.start()
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        starting = await client.get("/api/ready")
+        assert (await client.get("/api/health")).status_code == 200
+        release.set()
+        await warmup.wait()
+        ready = await client.get("/api/ready")
+
+    assert starting.status_code == 503
+    assert starting.json() == {"status": "starting"}
+    assert ready.status_code == 200
+    body = ready.json()
+    assert body["status"] == "degraded"
+    assert body["steps"]["slow"]["ok"] is True
+    assert body["steps"]["broken"] == {
+        "ok": False,
+        "seconds": body["steps"]["broken"]["seconds"],
+        "error": "no credentials",
+    }
+
+
+async def test_timed_out_step_does_not_block_readiness():
+    async def hangs() -> None:
+        await asyncio.sleep(60)
+
+    warmup = Warmup({"hangs": hangs}, timeout=0.05)
+    await warmup.start()
+    await warmup.wait()
+
+    assert warmup.finished and not warmup.ok
@@ -1,4 +1,4 @@
-from app.utils.text_processing import chunk_text
+from app.utils.text_processing import IncrementalChunker, chunk_text, join_overlapping
 
 
 def test_chunk_text_basic():
@@ -29,3 +29,43 @@ def test_chunk_text_preserves_content():
     # All original sentences should appear in the combined output
     assert "Sentence one" in combined
     assert "Sentence three" in combined
+
+
+def test_incremental_chunker_matches_chunk_limits():
+    pages = [" ".join(f"page{p}word{w}" for w in range(150)) for p in range(20)]
+    chunker = IncrementalChunker()
+    chunks = []
+    for page in pages:
+        chunks.extend(chunker.feed(page))
+    chunks.extend(chunker.finish())
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 1000 for chunk in chunks)
+    combined = " ".join(chunks)
+    for p in range(20):
+        assert f"page{p}word0 " in combined
+        assert f"page{p}word149" in combined
+
+
+def test_incremental_chunker_holds_back_incomplete_tail():
+    chunker = IncrementalChunker()
+    assert chunker.feed("Short page.") == []
+    assert chunker.finish() == ["Short page."]
+
+
+def test_join_overlapping_drops_the_repeated_span():
+    assert join_overlapping("one two three four", "three four five six") == (
+        "one two three four five six"
+    )
+    assert join_overlapping("no overlap here", "completely new") == (
+        "no overlap here\ncompletely new"
+    )
+
+
+def test_adjacent_chunks_rejoin_to_the_original_text():
+    text = " ".join(f"word{i}" for i in range(1000))
+    chunks = chunk_text(text)
+    joined = chunks[0]
+    for chunk in chunks[1:]:
+        joined = join_overlapping(joined, chunk)
+    assert joined == text
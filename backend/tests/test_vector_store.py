@@ -0,0 +1,234 @@
+import numpy as np
+import pytest
+
+from app.services.answer_cache import bump_corpus_version
+from app.services.vector_store import FirestoreVectorStore, InMemoryVectorStore
+from app.utils.ivf import IVFIndex
+
+DIM = 32
+
+
+def _random_vectors(n: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(n, DIM)).astype(np.float32)
+
+
+def _brute_force(vectors: np.ndarray, query: np.ndarray, k: int) -> list[int]:
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return list(np.argsort(-(normed @ (query / np.linalg.norm(query))))[:k])
+
+
+def _clustered_vectors(n: int, clusters: int = 20, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, DIM))
+    points = centers[rng.integers(clusters, size=n)] + 0.3 * rng.normal(size=(n, DIM))
+    return points.astype(np.float32)
+
+
+def test_ivf_recall_against_brute_force():
+    vectors = _clustered_vectors(3000)
+    index = IVFIndex(DIM, n_probe=8, min_train_size=256)
+    index.add_batch(vectors)
+
+    queries = _clustered_vectors(50, seed=1)
+    hits = 0
+    for query in queries:
+        expected = set(_brute_force(vectors, query, 10))
+        hits += len(expected & {label for label, _ in index.search(query, 10)})
+    assert hits / (50 * 10) > 0.9
+
+
+def test_ivf_exact_below_train_size():
+    vectors = _random_vectors(100)
+    index = IVFIndex(DIM)
+    for vector in vectors:
+        index.add(vector)
+    query = _random_vectors(1, seed=3)[0]
+    results = index.search(query, 5)
+    distances = [d for _, d in results]
+    assert [label for label, _ in results] == _brute_force(vectors, query, 5)
+    assert distances == sorted(distances)
+    assert all(0.0 <= d <= 2.0 for d in distances)
+
+
+def test_ivf_remove_excludes_label():
+    vectors = _random_vectors(50)
+    index = IVFIndex(DIM)
+    index.add_batch(vectors)
+    index.remove(7)
+    assert 7 not in {label for label, _ in index.search(vectors[7], 5)}
+    assert len(index) == 49
+
+
+def test_ivf_labels_survive_retraining():
+    vectors = _clustered_vectors(600)
+    index = IVFIndex(DIM, min_train_size=64, retrain_factor=2.0)
+    labels = [index.add(vector) for vector in vectors]
+    assert labels == list(range(600))
+    assert index.search(vectors[321], 1)[0][0] == 321
+
+
+def test_ivf_filtered_search_skips_labels_dropped_by_retraining():
+    vectors = _random_vectors(164)
+    index = IVFIndex(DIM, n_probe=64, min_train_size=64, retrain_factor=2.0)
+    labels = index.add_batch(vectors[:64])
+    for label in labels[:32]:
+        index.remove(label)
+    # Growing past twice the trained size retrains and drops the tombstoned labels for good
+    index.add_batch(vectors[64:])
+
+    results = index.search(vectors[0], 5, allowed=labels[:40])
+
+    assert len(results) == 5
+    assert {label for label, _ in results} <= set(labels[32:40])
+    assert len(index) == 132
+
+
+def test_ivf_selective_filter_returns_k_in_scope():
+    vectors = _clustered_vectors(3000)
+    index = IVFIndex(DIM, n_probe=4, min_train_size=256)
+    index.add_batch(vectors)
+    allowed = list(range(0, 3000, 300))  # 10 labels scattered across cells
+
+    results = index.search(vectors[5], 5, allowed=allowed)
+    assert len(results) == 5
+    assert {label for label, _ in results} <= set(allowed)
+    expected = [allowed[i] for i in _brute_force(vectors[allowed], vectors[5], 5)]
+    assert [label for label, _ in results] == expected
+
+
+def test_ivf_broad_filter_widens_probe_until_k_found():
+    vectors = _clustered_vectors(3000)
+    index = IVFIndex(DIM, n_probe=1, min_train_size=256)
+    index.add_batch(vectors)
+    allowed = list(range(1500))
+    for label in allowed[:100]:
+        index.remove(label)
+
+    results = index.search(vectors[2999], 10, allowed=allowed)
+    assert len(results) == 10
+    assert all(100 <= label < 1500 for label, _ in results)
+
+
+class _InMemoryDurableStore(FirestoreVectorStore):
+    def __init__(self):
+        self.chunks: dict[str, list[dict]] = {}
+
+    async def add_chunks(self, user_id, chunks):
+        self.chunks.setdefault(user_id, []).extend(chunks)
+
+    async def delete_document(self, user_id, doc_id):
+        self.chunks[user_id] = [c for c in self.chunks[user_id] if c["document_id"] != doc_id]
+
+    async def iter_chunks(self, user_id, with_embeddings=True, created_after=None):
+        for chunk in self.chunks.get(user_id, []):
+            yield chunk
+
+
+def _chunks(doc_id: str, vectors: np.ndarray) -> list[dict]:
+    return [
+        {
+            "chunk_id": f"{doc_id}-{i}",
+            "document_id": doc_id,
+            "document_name": f"{doc_id}.txt",
+            "content": f"chunk {i}",
+            "chunk_index": i,
+            "embedding": vector.tolist(),
+        }
+        for i, vector in enumerate(vectors)
+    ]
+
+
+@pytest.fixture
+def memory_store(fake_firestore, monkeypatch):
+    monkeypatch.setattr("app.services.vector_store.settings.EMBEDDING_DIMENSION", DIM)
+    return InMemoryVectorStore(_InMemoryDurableStore())
+
+
+async def test_memory_store_builds_from_durable_and_tracks_writes(memory_store, test_user_id):
+    vectors = _random_vectors(20)
+    await memory_store.add_chunks(test_user_id, _chunks("doc-a", vectors[:10]))
+
+    results = await memory_store.search(test_user_id, vectors[3].tolist(), 1)
+    assert results[0]["chunk_id"] == "doc-a-3"
+    assert "embedding" not in results[0]
+
+    # Index is now loaded; later writes and deletes are mirrored into it
+    await memory_store.add_chunks(test_user_id, _chunks("doc-b", vectors[10:]))
+    results = await memory_store.search(test_user_id, vectors[15].tolist(), 1)
+    assert results[0]["chunk_id"] == "doc-b-5"
+
+    results = await memory_store.search(
+        test_user_id, vectors[15].tolist(), 3, document_ids=["doc-a"]
+    )
+    assert len(results) == 3
+    assert all(r["document_id"] == "doc-a" for r in results)
+
+    await memory_store.delete_document(test_user_id, "doc-b")
+    results = await memory_store.search(test_user_id, vectors[15].tolist(), 5)
+    assert all(r["document_id"] == "doc-a" for r in results)
+
+
+async def test_memory_store_follows_corpus_changes_from_other_instances(
+    memory_store, fake_firestore, test_user_id
+):
+    user = f"users/{test_user_id}"
+    vectors = _random_vectors(20)
+    fake_firestore.put(f"{user}/documents/doc-a", {"status": "ready"})
+    await memory_store.add_chunks(test_user_id, _chunks("doc-a", vectors[:10]))
+    await memory_store.search(test_user_id, vectors[0].tolist(), 1)
+
+    # The ingestion worker writes doc-b straight to the durable store
+    fake_firestore.put(f"{user}/documents/doc-b", {"status": "ready"})
+    await memory_store.durable.add_chunks(test_user_id, _chunks("doc-b", vectors[10:]))
+    await bump_corpus_version(test_user_id)
+    results = await memory_store.search(test_user_id, vectors[15].tolist(), 1)
+    assert results[0]["chunk_id"] == "doc-b-5"
+
+    # Another instance starts deleting doc-a
+    fake_firestore.put(f"{user}/documents/doc-a", {"status": "deleting"})
+    await bump_corpus_version(test_user_id)
+    results = await memory_store.search(test_user_id, vectors[3].tolist(), 20)
+    assert {r["document_id"] for r in results} == {"doc-b"}
+
+
+async def test_memory_store_returns_embeddings_on_request(memory_store, test_user_id):
+    vectors = _random_vectors(5)
+    await memory_store.add_chunks(test_user_id, _chunks("doc-a", vectors))
+
+    results = await memory_store.search(test_user_id, vectors[2].tolist(), 2, with_embeddings=True)
+    fetched = await memory_store.get_chunks(test_user_id, ["doc-a-4"], with_embeddings=True)
+
+    expected = vectors[2] / np.linalg.norm(vectors[2])
+    assert np.allclose(results[0]["embedding"], expected, atol=1e-5)
+    assert fetched[0]["chunk_id"] == "doc-a-4"
+    assert len(fetched[0]["embedding"]) == DIM
+
+
+async def test_readding_chunks_keeps_filtered_search_working(
+    memory_store, test_user_id, monkeypatch
+):
+    new_index = memory_store._new_index
+
+    def small_index():
+        user_index = new_index()
+        user_index.index.min_train_size = 256
+        user_index.index.retrain_factor = 1.0
+        return user_index
+
+    monkeypatch.setattr(memory_store, "_new_index", small_index)
+    # A probe this wide scores any filtered label set exactly
+    memory_store.n_probe = 64
+    vectors = _random_vectors(500)
+    await memory_store.add_chunks(test_user_id, _chunks("doc-a", vectors[:200]))
+    await memory_store.search(test_user_id, vectors[0].tolist(), 1)
+    # A retried ingestion writes the same chunk ids again, then the index retrains
+    await memory_store.add_chunks(test_user_id, _chunks("doc-a", vectors[:200]))
+    await memory_store.add_chunks(test_user_id, _chunks("doc-b", vectors[200:]))
+
+    results = await memory_store.search(
+        test_user_id, vectors[3].tolist(), 3, document_ids=["doc-a"]
+    )
+
+    assert len(results) == 3
+    assert results[0]["chunk_id"] == "doc-a-3"
+    assert all(r["document_id"] == "doc-a" for r in results)
@@ -1,7 +1,7 @@
 import { auth } from "../utils/firebase";
 import { API_URL } from "../utils/constants";
-import apiClient from "./client";
-import type { ChatSession, ChatMessage, SSEEvent } from "../types";
+import apiClient, { getPage } from "./client";
+import type { ChatSession, ChatMessage, Page, SSEEvent } from "../types";
 
 export async function sendMessage(
   message: string,
@@ -58,14 +58,23 @@ export async function sendMessage(
   }
 }
 
-export async function getChatHistory(): Promise<ChatSession[]> {
-  const response = await apiClient.get("/api/chat/history");
-  return response.data.sessions;
+export async function getChatHistory(
+  pageToken?: string | null
+): Promise<Page<ChatSession>> {
+  return getPage<ChatSession>("/api/chat/history", "sessions", pageToken);
 }
 
-export async function getChatMessages(chatId: string): Promise<ChatMessage[]> {
-  const response = await apiClient.get(`/api/chat/${chatId}/messages`);
-  return response.data.messages;
+// The latest messages first; each following page holds the ones before it
+export async function getChatMessages(
+  chatId: string,
+  pageToken?: string | null
+): Promise<Page<ChatMessage>> {
+  return getPage<ChatMessage>(
+    `/api/chat/${chatId}/messages`,
+    "messages",
+    pageToken,
+    { newest_first: true }
+  );
 }
 
 export async function deleteChat(chatId: string): Promise<void> {
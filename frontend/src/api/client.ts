@@ -1,6 +1,7 @@
 import axios from "axios";
 import { auth } from "../utils/firebase";
 import { API_URL } from "../utils/constants";
+import type { Page } from "../types";
 
 const apiClient = axios.create({
   baseURL: API_URL,
@@ -15,4 +16,20 @@ apiClient.interceptors.request.use(async (config) => {
   return config;
 });
 
+// One page of a listing; pass nextPageToken back to fetch the page after it
+export async function getPage<T>(
+  url: string,
+  key: string,
+  pageToken?: string | null,
+  params?: Record<string, string | boolean>
+): Promise<Page<T>> {
+  const response = await apiClient.get(url, {
+    params: { ...params, ...(pageToken ? { page_token: pageToken } : {}) },
+  });
+  return {
+    items: response.data[key],
+    nextPageToken: response.data.next_page_token ?? null,
+  };
+}
+
 export default apiClient;
@@ -1,5 +1,5 @@
-import apiClient from "./client";
-import type { Document } from "../types";
+import apiClient, { getPage } from "./client";
+import type { Document, Page } from "../types";
 
 export async function uploadDocument(file: File): Promise<Document> {
   const formData = new FormData();
@@ -11,9 +11,10 @@ export async function uploadDocument(file: File): Promise<Document> {
   return response.data;
 }
 
-export async function listDocuments(): Promise<Document[]> {
-  const response = await apiClient.get("/api/documents");
-  return response.data.documents;
+export async function listDocuments(
+  pageToken?: string | null
+): Promise<Page<Document>> {
+  return getPage<Document>("/api/documents", "documents", pageToken);
 }
 
 export async function getDocument(docId: string): Promise<Document> {
@@ -7,6 +7,7 @@ import {
   IconButton,
   Box,
   Paper,
+  Button,
 } from "@mui/material";
 import {
   Delete as DeleteIcon,
@@ -29,17 +30,34 @@ export default function ChatHistory({
   refreshTrigger,
 }: ChatHistoryProps) {
   const [sessions, setSessions] = useState<ChatSession[]>([]);
+  const [nextPageToken, setNextPageToken] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     let cancelled = false;
-    getChatHistory().then((data) => {
-      if (!cancelled) setSessions(data);
+    getChatHistory().then((page) => {
+      if (cancelled) return;
+      setSessions(page.items);
+      setNextPageToken(page.nextPageToken);
     }).catch(() => {
       // Silently fail - user may not have any chats yet
     });
     return () => { cancelled = true; };
   }, [refreshTrigger]);
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const page = await getChatHistory(nextPageToken);
+      setSessions((prev) => [...prev, ...page.items]);
+      setNextPageToken(page.nextPageToken);
+    } catch {
+      // Handle error silently
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleDelete = async (e: React.MouseEvent, chatId: string) => {
     e.stopPropagation();
     try {
@@ -97,6 +115,13 @@ export default function ChatHistory({
             </ListItemButton>
           ))
         )}
+        {nextPageToken && (
+          <Box display="flex" justifyContent="center" py={1}>
+            <Button size="small" onClick={loadMore} disabled={loadingMore}>
+              {loadingMore ? "Loading..." : "Load more"}
+            </Button>
+          </Box>
+        )}
       </List>
     </Paper>
   );
@@ -1,5 +1,11 @@
 import { useState, useEffect, useRef } from "react";
-import { Box, Paper, Typography, CircularProgress } from "@mui/material";
+import {
+  Box,
+  Paper,
+  Typography,
+  CircularProgress,
+  Button,
+} from "@mui/material";
 import MessageBubble from "./MessageBubble";
 import MessageInput from "./MessageInput";
 import { sendMessage, getChatMessages } from "../../api/chat";
@@ -19,25 +25,35 @@ export default function ChatInterface({
   const [streamingSources, setStreamingSources] = useState<SourceChunk[]>([]);
   const [isStreaming, setIsStreaming] = useState(false);
   const [loading, setLoading] = useState(false);
+  const [earlierPageToken, setEarlierPageToken] = useState<string | null>(null);
+  const [loadingEarlier, setLoadingEarlier] = useState(false);
   const messagesEndRef = useRef<HTMLDivElement>(null);
+  // Prepending earlier messages must not jump to the bottom of the chat
+  const keepScroll = useRef(false);
 
   useEffect(() => {
     if (chatId) {
       loadMessages(chatId);
     } else {
       setMessages([]);
+      setEarlierPageToken(null);
     }
   }, [chatId]);
 
   useEffect(() => {
+    if (keepScroll.current) {
+      keepScroll.current = false;
+      return;
+    }
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
   }, [messages, streamingContent]);
 
   const loadMessages = async (id: string) => {
     setLoading(true);
     try {
-      const data = await getChatMessages(id);
-      setMessages(data);
+      const page = await getChatMessages(id);
+      setMessages(page.items);
+      setEarlierPageToken(page.nextPageToken);
     } catch {
       // Handle silently
     } finally {
@@ -45,6 +61,21 @@ export default function ChatInterface({
     }
   };
 
+  const loadEarlierMessages = async () => {
+    if (!chatId) return;
+    setLoadingEarlier(true);
+    try {
+      const page = await getChatMessages(chatId, earlierPageToken);
+      keepScroll.current = true;
+      setMessages((prev) => [...page.items, ...prev]);
+      setEarlierPageToken(page.nextPageToken);
+    } catch {
+      // Handle silently
+    } finally {
+      setLoadingEarlier(false);
+    }
+  };
+
   const handleSend = async (message: string) => {
     const userMessage: ChatMessage = {
       id: `temp-${Date.now()}`,
@@ -131,6 +162,17 @@ export default function ChatInterface({
           </Box>
         ) : (
           <>
+            {earlierPageToken && (
+              <Box display="flex" justifyContent="center" mb={2}>
+                <Button
+                  size="small"
+                  onClick={loadEarlierMessages}
+                  disabled={loadingEarlier}
+                >
+                  {loadingEarlier ? "Loading..." : "Load earlier messages"}
+                </Button>
+              </Box>
+            )}
             {messages.map((msg) => (
               <MessageBubble key={msg.id} message={msg} />
             ))}
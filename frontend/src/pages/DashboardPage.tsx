@@ -14,18 +14,22 @@ import {
 import { useNavigate } from "react-router-dom";
 import { listDocuments } from "../api/documents";
 import { getChatHistory } from "../api/chat";
+import type { Page } from "../types";
 
 export default function DashboardPage() {
   const navigate = useNavigate();
-  const [docCount, setDocCount] = useState(0);
-  const [chatCount, setChatCount] = useState(0);
+  const [docCount, setDocCount] = useState("0");
+  const [chatCount, setChatCount] = useState("0");
 
   useEffect(() => {
+    // Only the first page is fetched; "20+" says there are more
+    const count = (page: Page<unknown>) =>
+      `${page.items.length}${page.nextPageToken ? "+" : ""}`;
     listDocuments()
-      .then((docs) => setDocCount(docs.length))
+      .then((page) => setDocCount(count(page)))
       .catch(() => {});
     getChatHistory()
-      .then((sessions) => setChatCount(sessions.length))
+      .then((page) => setChatCount(count(page)))
       .catch(() => {});
   }, []);
 
@@ -1,5 +1,5 @@
-import { useEffect, useState } from "react";
-import { Typography, Box } from "@mui/material";
+import { useEffect, useRef, useState } from "react";
+import { Typography, Box, Button } from "@mui/material";
 import DocumentUploader from "../components/documents/DocumentUploader";
 import DocumentList from "../components/documents/DocumentList";
 import LoadingSpinner from "../components/common/LoadingSpinner";
@@ -8,7 +8,10 @@ import type { Document } from "../types";
 
 export default function DocumentsPage() {
   const [documents, setDocuments] = useState<Document[]>([]);
+  const [nextPageToken, setNextPageToken] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const loadedMore = useRef(false);
 
   useEffect(() => {
     loadDocuments();
@@ -23,10 +26,18 @@ export default function DocumentsPage() {
     return () => clearInterval(interval);
   }, [documents]);
 
+  // Refreshes the first (newest) page, keeping any older pages already loaded
   const loadDocuments = async () => {
     try {
-      const docs = await listDocuments();
-      setDocuments(docs);
+      const page = await listDocuments();
+      const oldest = page.items[page.items.length - 1]?.created_at;
+      setDocuments((prev) => [
+        ...page.items,
+        ...(page.nextPageToken && oldest
+          ? prev.filter((d) => d.created_at < oldest)
+          : []),
+      ]);
+      if (!loadedMore.current) setNextPageToken(page.nextPageToken);
     } catch {
       // Handle error
     } finally {
@@ -34,6 +45,20 @@ export default function DocumentsPage() {
     }
   };
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const page = await listDocuments(nextPageToken);
+      loadedMore.current = true;
+      setDocuments((prev) => [...prev, ...page.items]);
+      setNextPageToken(page.nextPageToken);
+    } catch {
+      // Handle error
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleDelete = async (docId: string) => {
     try {
       await deleteDocument(docId);
@@ -59,7 +84,16 @@ export default function DocumentsPage() {
       {loading ? (
         <LoadingSpinner message="Loading documents..." />
       ) : (
-        <DocumentList documents={documents} onDelete={handleDelete} />
+        <>
+          <DocumentList documents={documents} onDelete={handleDelete} />
+          {nextPageToken && (
+            <Box display="flex" justifyContent="center" mt={2}>
+              <Button onClick={loadMore} disabled={loadingMore}>
+                {loadingMore ? "Loading..." : "Load more"}
+              </Button>
+            </Box>
+          )}
+        </>
       )}
     </Box>
   );
@@ -38,3 +38,8 @@ export interface SSEEvent {
   full_response?: string;
   chat_id?: string;
 }
+
+export interface Page<T> {
+  items: T[];
+  nextPageToken: string | null;
+}